@@ -10,9 +10,11 @@ query = Query(grades_table)
 keys = []
 
 insert_time_0 = process_time()
+rows = []
 for i in range(0, 10000):
-    query.insert(906659671 + i, 93, 0, 0, 0)
+    rows.append([906659671 + i, 93, 0, 0, 0])
     keys.append(906659671 + i)
+query.insert_batch(rows)
 insert_time_1 = process_time()
 
 print("Inserting 10k records took:  \t\t\t", insert_time_1 - insert_time_0)
@@ -0,0 +1,52 @@
+from lstore.db import Database
+from lstore.query import Query
+from lstore.page import readPageFileHeader, PAGE_CAPACITY
+from lstore import encoding
+
+import os
+import shutil
+
+# Full table pages are compressed when they are written out (see BufferPool._writeOut) and summed straight from
+# their files once they are cold (see BufferPool.sumPage)
+shutil.rmtree('./CompressionTest', ignore_errors=True)
+try:
+    db = Database()
+    db.open('./CompressionTest')
+    grades_table = db.create_table('Grades', 5, 0)
+    query = Query(grades_table)
+
+    number_of_records = 2048 #four full pages per column
+    records = {}
+    for i in range(0, number_of_records):
+        key = 92106429 + i
+        records[key] = [key, i % 20, 7, i, 0]
+    query.insert_batch(list(records.values()))
+    db.close()
+
+    path = './CompressionTest/Grades/'
+    full = 0
+    for name in sorted(os.listdir(path)):
+        if not name.endswith('.page'):
+            continue
+        header = readPageFileHeader(path + name)
+        if header[4] == PAGE_CAPACITY // header[1]: #records == slots: a full page
+            full += 1
+            if header[5] == encoding.RAW:
+                print('full page written uncompressed:', name)
+    if full == 0:
+        print('no full page was written')
+    print("Compression check finished:", full, "full pages")
+
+    db = Database()
+    db.open('./CompressionTest')
+    grades_table = db.get_table('Grades')
+    query = Query(grades_table)
+    keys = sorted(records)
+    for c in range(0, grades_table.num_columns):
+        result = query.sum(keys[0], keys[-1], c)
+        if result != sum(records[key][c] for key in keys):
+            print('sum error on column', c, ':', result, ', correct:', sum(records[key][c] for key in keys))
+    print("Aggregate of compressed pages finished")
+    db.close()
+finally:
+    shutil.rmtree('./CompressionTest', ignore_errors=True) #don't leave the test database behind
@@ -0,0 +1,110 @@
+from lstore.db import Database
+from lstore.query import Query
+
+from random import Random
+import shutil
+import threading
+
+# Deletes, re-inserts and updates race selects, aggregates and selects by value while the background merger merges
+# and vacuums (reclaiming the deleted records and moving records out of sparse blocks). No query may crash, and
+# queries on records that no other query touches may never fail because of the background work.
+number_of_records = 8000
+number_of_writers = 4
+number_of_readers = 3
+seconds = 5
+
+try:
+    for flushRate in (0, 200):
+        shutil.rmtree('./ConcurrentTest', ignore_errors=True)
+        db = Database(flushRate=flushRate, mergeInterval=0.02)
+        db.open('./ConcurrentTest')
+        grades_table = db.create_table('Grades', 3, 0)
+        query = Query(grades_table)
+        query.insert_batch([[key, key % 100, 7] for key in range(0, number_of_records)])
+
+        selected = list(range(0, number_of_records, 10)) #only selected by the readers
+        updated = list(range(5, number_of_records, 10)) #only updated (to the same values) by one thread
+        sparse = [key for key in range(0, number_of_records // 2) if key % 5 != 0] #deleted up front: the vacuum moves the rest
+        churned = [key for key in range(number_of_records // 2, number_of_records) if key % 5 != 0] #deleted and re-inserted by the writers
+        for key in sparse:
+            query.delete(key)
+        errors = []
+        stop = threading.Event()
+
+        def writer(seed):
+            rng = Random(seed)
+            keys = churned[seed::number_of_writers]
+            while not stop.is_set():
+                key = rng.choice(keys)
+                try:
+                    if not query.delete(key):
+                        errors.append(f"delete of {key} failed")
+                    elif rng.random() < 0.5: #reuses a free slot
+                        while not query.insert(key, key % 100, 7):
+                            pass
+                    elif not query.insert_batch([[key, key % 100, 7]]): #a new slot: leaves free ones for the vacuum to move records to
+                        errors.append(f"insert of {key} failed")
+                except Exception as e:
+                    errors.append(f"writer: {e!r}")
+                    return
+
+        def updater():
+            rng = Random(99)
+            while not stop.is_set():
+                key = rng.choice(updated)
+                try:
+                    if not query.update(key, None, key % 100, 7):
+                        errors.append(f"update of {key} failed")
+                except Exception as e:
+                    errors.append(f"updater: {e!r}")
+                    return
+
+        def reader(seed):
+            rng = Random(100 + seed)
+            while not stop.is_set():
+                key = rng.choice(selected)
+                try:
+                    result = query.select(key, 0, [1, 1, 1])
+                    if result is False or result[0].columns != [key, key % 100, 7]:
+                        errors.append(f"select of {key} returned {result if result is False else result[0].columns}")
+                    query.sum(0, number_of_records - 1, 1)
+                    query.sum_version(0, number_of_records - 1, 2, -1)
+                    query.select(42, 1, [1, 0, 0])
+                except Exception as e:
+                    errors.append(f"reader: {e!r}")
+                    return
+
+        threads = [threading.Thread(target=writer, args=(i,)) for i in range(number_of_writers)]
+        threads += [threading.Thread(target=reader, args=(i,)) for i in range(number_of_readers)]
+        threads.append(threading.Thread(target=updater))
+        for thread in threads:
+            thread.start()
+        stop.wait(seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        vacuumed = grades_table.merger.recordsVacuumed
+        for error in errors[:10]:
+            print(error)
+        print(f"Concurrent queries (flushRate {flushRate}) finished: {len(errors)} errors, {vacuumed} records vacuumed")
+        moved = sum(1 for key in range(0, number_of_records // 2, 5) if grades_table.index.pkl_index[key] != key) #inserted at RID <key>
+        if moved == 0:
+            print('the vacuum moved no record out of the sparse blocks')
+        query.insert_batch([[key, key % 100, 7] for key in sparse])
+
+        # Every record is back: check them after the last vacuum
+        grades_table.stopMerger()
+        for _ in range(3):
+            grades_table.vacuum()
+        for key in range(0, number_of_records):
+            result = query.select(key, 0, [1, 1, 1])
+            if not result or result[0].columns != [key, key % 100, 7]:
+                print('select error on', key, ':', result and result[0].columns, ', correct:', [key, key % 100, 7])
+        if query.sum(0, number_of_records - 1, 1) != sum(key % 100 for key in range(0, number_of_records)):
+            print('sum error:', query.sum(0, number_of_records - 1, 1))
+        if len(query.select(42, 1, [1, 1, 1])) != number_of_records // 100:
+            print('select by value error:', len(query.select(42, 1, [1, 1, 1])))
+        print("Check after vacuum finished")
+        db.close()
+finally:
+    shutil.rmtree('./ConcurrentTest', ignore_errors=True) #don't leave the test database behind
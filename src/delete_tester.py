@@ -0,0 +1,92 @@
+from lstore.db import Database
+from lstore.query import Query
+
+from random import randint, sample, seed
+import shutil
+
+# Deletes leave tombstones that the vacuum reclaims: deleted records are gone right away, their slots and pages
+# are reused or freed by the vacuum, and tombstones that weren't vacuumed yet survive a close and reopen.
+shutil.rmtree('./DeleteTest', ignore_errors=True)
+try:
+    db = Database(mergeInterval=0) #vacuumed by hand below
+    db.open('./DeleteTest')
+    grades_table = db.create_table('Grades', 5, 0)
+    query = Query(grades_table)
+
+    number_of_records = 5000
+    seed(3562901)
+
+    records = {}
+    for i in range(0, number_of_records):
+        key = 92106429 + i
+        records[key] = [key, randint(0, 20), randint(0, 20), randint(0, 20), randint(0, 20)]
+    query.insert_batch(list(records.values()))
+    for key in sample(sorted(records), 1000):
+        records[key][2] = randint(0, 20)
+        query.update(key, None, None, records[key][2], None, None)
+    grades_table.merge()
+
+    def check(query, label):
+        keys = sorted(records)
+        for key in keys:
+            record = query.select(key, 0, [1, 1, 1, 1, 1])
+            if not record or record[0].columns != records[key]:
+                print('select error', label, 'on', key, ':', record and record[0].columns, ', correct:', records[key])
+        for key in deleted:
+            if query.select(key, 0, [1, 1, 1, 1, 1]) != []:
+                print('deleted record', key, 'still selects', label)
+        for column in range(0, grades_table.num_columns):
+            result = query.sum(92106429, 92106429 + 2 * number_of_records, column)
+            if result != sum(records[key][column] for key in keys):
+                print('sum error', label, 'on column', column, ':', result)
+        found = sorted(record.columns[0] for record in query.select(7, 1, [1, 1, 1, 1, 1]))
+        if found != [key for key in keys if records[key][1] == 7]:
+            print('select by value error', label)
+
+    # Delete most of the first half (so the vacuum compacts it) and some of the rest
+    deleted = [key for i, key in enumerate(sorted(records)) if (i < number_of_records // 2 and i % 5) or i % 11 == 0]
+    for key in deleted:
+        if not query.delete(key):
+            print('delete error on', key)
+        del records[key]
+    if query.delete(deleted[0]):
+        print('second delete of', deleted[0], 'succeeded')
+    check(query, 'after delete')
+    print("Delete finished")
+
+    pages = len(grades_table.bufferPool.frames)
+    for _ in range(3):
+        grades_table.vacuum()
+    if len(grades_table.bufferPool.frames) >= pages:
+        print('vacuum freed no pages:', len(grades_table.bufferPool.frames), 'of', pages)
+    check(query, 'after vacuum')
+    print("Vacuum finished")
+
+    # Re-inserted records reuse the freed slots
+    next_RID = grades_table.nextBaseRID
+    for key in deleted[:500]:
+        records[key] = [key, 1, 2, 3, 4]
+        query.insert(*records[key])
+    deleted = deleted[500:]
+    if grades_table.nextBaseRID != next_RID:
+        print('inserts did not reuse freed slots')
+    check(query, 'after insert')
+
+    # Tombstones that weren't vacuumed are saved with the table
+    for key in sorted(records)[::13]:
+        query.delete(key)
+        del records[key]
+        deleted.append(key)
+    db.close()
+
+    db = Database(mergeInterval=0)
+    db.open('./DeleteTest')
+    grades_table = db.get_table('Grades')
+    query = Query(grades_table)
+    check(query, 'after reopen')
+    grades_table.vacuum()
+    check(query, 'after vacuum after reopen')
+    db.close()
+    print("Reopen finished")
+finally:
+    shutil.rmtree('./DeleteTest', ignore_errors=True) #don't leave the test database behind
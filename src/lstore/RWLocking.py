@@ -6,7 +6,7 @@ class RWLockManager:
         self.locks = {}
     
     def addLock(self, key):
-        self.locks[key] = RWLock()
+        self.locks.setdefault(key, RWLock()) #two threads adding the same key's lock get the same one
 
     def hasLock(self, key):
         return key in self.locks
@@ -28,45 +28,45 @@ class RWLockManager:
 
 
 class RWLock:
+    """
+    No-wait shared/exclusive record lock: acquire_r/acquire_w return False instead of blocking when the lock is
+    held in the other mode (or by another writer), so the caller can abort. <lock> only guards the counters.
+    """
     def __init__(self):
         self.lock = Lock()
         self._activeReaders = 0
         self._activeWriters = False
 
     def acquire_r(self):
-        if(self._activeWriters == False):
-            self.lock.acquire()
+        with self.lock:
+            if(self._activeWriters):
+                return False
             self._activeReaders += 1
             return True
-        else:
-            return False
 
     def release_r(self):
-        if(self._activeReaders > 1):
+        with self.lock:
+            if(self._activeReaders == 0):
+                return False
             self._activeReaders -= 1
             return True
-        elif(self._activeReaders == 1):
-            self._activeReaders = 0
-            return True
-        else:
-            return False
 
 
     def acquire_w(self):
-        if(self._activeReaders > 0):
-            return False
-        elif(self._activeWriters): 
-            return False
-        else:   
-            self._activeWriters = True
-            self.lock.acquire()
-            return True
+        with self.lock:
+            if(self._activeReaders > 0):
+                return False
+            elif(self._activeWriters): 
+                return False
+            else:   
+                self._activeWriters = True
+                return True
 
     def release_w(self):
         """ Release a write lock. """
-        if(self._activeWriters):
-            self._activeWriters = False
-            self.lock.release()
-            return True
-        else:
-            return False
+        with self.lock:
+            if(self._activeWriters):
+                self._activeWriters = False
+                return True
+            else:
+                return False
@@ -0,0 +1,84 @@
+import logging
+import threading
+
+from lstore.setupLogging import *
+"""
+Documentation for the memory budget.
+Description:
+    The number of bytes of page frames the bufferpools of a database may keep in memory, shared by all of its
+    tables. Each BufferPool registers with a priority and charges/releases the bytes of the frames it loads and
+    writes out. When a pool needs room and the budget is used up, makeRoom() evicts from the pool that is furthest
+    over its fair share (capacity * priority / sum of the priorities of the pools), using that pool's own eviction
+    policy. So an idle table's frames go first, and no table can hold more than its share while others need frames.
+
+    Lock order: budget lock -> pool partition locks -> usage lock. Pools call makeRoom() before taking any of their
+    own locks and charge()/release() (which only take the usage lock) while holding them. Pools that load at the same
+    time can each overshoot the budget by the frame they made room for.
+"""
+
+class MemoryBudget:
+
+    log = setupLogger(False, LOG_LEVEL, logging.getLogger("MemoryBudget"), 4)
+
+    def __init__(self, capacityBytes):
+        """
+        Inputs:
+            capacityBytes (int): The total size of the page frames that may be in memory.
+        Internal Objects:
+            pools (dict): BufferPool -> priority.
+            used (dict): BufferPool -> bytes of frames it has in memory.
+        """
+        self.capacityBytes = capacityBytes
+        self.usedBytes = 0
+        self.pools = {}
+        self.used = {}
+        self.lock = threading.RLock() #serializes makeRoom()
+        self.usage = threading.Lock() #guards usedBytes and used
+
+    def register(self, pool, priority=1):
+        with self.lock, self.usage:
+            self.pools[pool] = priority
+            self.used.setdefault(pool, 0)
+
+    def unregister(self, pool):
+        """
+        Description: Removes a pool (e.g., its table was dropped) and returns the bytes it was charged to the budget.
+        """
+        with self.lock, self.usage:
+            self.pools.pop(pool, None)
+            self.usedBytes -= self.used.pop(pool, 0)
+
+    def charge(self, pool, nbytes):
+        with self.usage:
+            self.used[pool] = self.used.get(pool, 0) + nbytes
+            self.usedBytes += nbytes
+
+    def release(self, pool, nbytes):
+        with self.usage:
+            self.used[pool] = self.used.get(pool, 0) - nbytes
+            self.usedBytes -= nbytes
+
+    def hasRoom(self, nbytes):
+        return self.usedBytes + nbytes <= self.capacityBytes
+
+    def share(self, pool):
+        """
+        Description: The number of bytes <pool> is entitled to when every pool wants memory.
+        """
+        total = sum(self.pools.values())
+        return self.capacityBytes * self.pools.get(pool, 0) / total if(total) else self.capacityBytes
+
+    def makeRoom(self, nbytes):
+        """
+        Description: Evicts pages (from the pools most over their share first) until <nbytes> more fit.
+        Outputs:
+            True if there is room now, False if every page that could be evicted is pinned.
+        """
+        with self.lock:
+            while(not self.hasRoom(nbytes)):
+                candidates = sorted((pool for pool in self.pools if self.used.get(pool, 0) > 0),
+                                    key=lambda pool: self.used[pool] / max(1, self.share(pool)), reverse=True)
+                if(not any(pool.evict() for pool in candidates)): #any() stops at the first pool that evicted a page
+                    self.log.warning("Memory budget exceeded: every page in memory is pinned.")
+                    return False
+            return True
@@ -1,51 +1,170 @@
+import time
 import logging
-from lstore.page import Page
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from lstore.page import Page, sumPageFile, readPageHeader, readPageFileHeader, readPageFile, headerSize, PAGE_CAPACITY
+from lstore.segment import ColumnSegment
+from lstore.eviction import makePolicy
+from lstore.flusher import BackgroundFlusher
+from lstore.budget import MemoryBudget
+from lstore.metrics import BufferPoolMetrics
 from lstore.setupLogging import *
 from os import remove
 
+class Frame:
+    """
+    Description: One entry of the bufferpool's frame table. Tracks a page whether it is in memory or on disk.
+    Internal Objects:
+        pid (str): The page ID.
+        columnIdx (int): The column the page belongs to.
+        isFull (bool): True if the page has no free slots.
+        page (Page): The live page while it is in memory, None while it is on disk.
+        ring (BufferRing): The scan ring the page was loaded into, None if it belongs to the main pool.
+        assigned (bool): The page's slots are assigned by its owner (e.g., a table's record IDs, see allocatePage).
+                         Pages of tables saved before record IDs aren't (see Table._convertRecords).
+    """
+    __slots__ = ("pid", "columnIdx", "isFull", "page", "ring", "assigned")
+
+    def __init__(self, pid, columnIdx, isFull=False, page=None, assigned=False):
+        self.pid = pid
+        self.columnIdx = columnIdx
+        self.isFull = isFull
+        self.page = page
+        self.ring = None
+        self.assigned = assigned
+
+    def inMemory(self):
+        return self.page is not None
+
+#Page numbers are handed out in blocks of this size (and segment frames reserved for them a block at a time).
+PID_BLOCK = 64
+#The number of page table partitions. Each has its own lock, so threads fetching different pages rarely contend.
+LATCH_PARTITIONS = 16
+#The number of frames in a scan's ring (see BufferRing).
+RING_PAGES = 16
+
+class BufferRing:
+    """
+    Description: A bulk read access strategy (like a Postgres BufferAccessStrategy). The pages a large scan has to
+                 load go into this small private ring instead of the pool's eviction policy: once the ring is full
+                 each new page takes the frame of the ring's oldest page, so the scan recycles its own frames and
+                 never pushes the pool's working set out. Pages the scan finds already in memory are used in place
+                 and don't count as recently used. A ring page that another caller gets joins the main pool.
+                 Use it as a context manager; closing the ring drops the pages still in it.
+                     with bufferPool.scanRing() as ring:
+                         ... bufferPool.getPage(PID, ring=ring) ...
+    Internal Objects:
+        size (int): The number of frames the ring holds.
+        PIDs (deque): The ring's pages, oldest first. Pages that left the ring meanwhile are skipped.
+    """
+    def __init__(self, bufferPool, size=RING_PAGES):
+        self.bufferPool = bufferPool
+        self.size = size
+        self.PIDs = deque()
+
+    def close(self):
+        self.bufferPool._releaseRing(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
 class BufferPool:
 
-    def __init__(self, numColumns, path, maxPages=50):
+    log = setupLogger(False, LOG_LEVEL, logging.getLogger("BufferPool"), 8)
+
+    def __init__(self, numColumns, path, maxPages=50, useSegments=False, columnSizes=None, evictionPolicy="CLOCK", flushRate=0,
+                 readAhead=4, ioThreads=4, budget=None, priority=1):
         """
         Description: The BufferPool Memory Manager for a given table
         Inputs: 
             numColumns (int): The number of columns for this table.
             path (str): The path variable to the location on disk for storing files.
-            maxPages (int): The maximum number of pages that can be stored in memory for each column.
+            maxPages (int): The maximum number of pages this pool keeps in memory when it has its own budget.
+            useSegments (bool): Store each column in one mmap'ed segment file (C-<col>.seg) instead of one file per page.
+                                In this mode eviction only flushes dirty frames; the OS page cache holds the data.
+            columnSizes (list): The cell width (bytes) of each column, from the table schema. Defaults to 8 (int64).
+            evictionPolicy (str): The replacement policy: "LRU", "CLOCK", "LRU-K" or "ARC" (see eviction.py).
+            flushRate (int): Pages per second the background flusher writes out. 0 disables the flusher.
+            readAhead (int): How many pages to prefetch once a column is read sequentially. 0 disables read-ahead.
+            ioThreads (int): The size of the I/O thread pool that reads prefetched pages.
+            budget (MemoryBudget): The memory budget shared with the database's other pools (see budget.py).
+                                   If None the pool gets a budget of its own worth <maxPages> frames.
+            priority (int): This pool's weight when the shared budget is divided between pools.
         Outputs:
             N\A 
         
         Internal Objects:
-            pageDirectory (dict): Maps Page IDs to metadata about that page. 
-                                  Format: {<pid> : (isFull, inMem, columnIdx, pageIdx)}
+            frames (dict): The frame table. Maps every page ID (in memory or on disk) to its Frame.
+                           Format: {<pid> : Frame(pid, columnIdx, isFull, page)}
+            memFrames (dict): The frames whose page is in memory (the buffer itself). Format: {<pid> : Frame}
+            policy (EvictionPolicy): Tracks the pages in memory and picks the victim when the pool is full.
+            partitions (lst): The page table locks. A page's lock (see _partition) is held while it is looked up and
+                              pinned, loaded, written out or deleted, so a page can't be evicted while it's being
+                              pinned or loaded twice. Page contents are protected by each page's latch (page.py).
+            directoryLock (Lock): Guards the column page lists, segment creation and page number allocation.
+            policyLock (Lock): Guards the eviction policy (except access() of a policy with concurrentAccess set).
+            flusher (BackgroundFlusher): The write-behind thread, None if it isn't running.
+            columnPages (lst): The PIDs of each column in allocation order, i.e. the order a scan reads them in.
+                               Format: [colIdx_0, ...] -> colIdx_i: [<pid>, ...]
+            pagePosition (dict): Position of each PID in its column's columnPages list.
+            lastMiss (dict): columnIdx -> position of the column's last page miss (sequential access detection).
+            prefetched (dict): Reads in flight or done on the I/O pool. Format: {<pid> : Future(<raw page file bytes>)}
+            metrics (BufferPoolMetrics): Hit/miss, I/O and latency counters (see metrics.py).
             path (str) : The path for the bufferpool. Composed of: dbDir/tableDir/
-            partialMemPages (lst): [ColIdx_1, ColIdx_2, ..., colIndex_|numCol|] -> colIdx_i: [<PageRef_1>, ...]
-            fullMemPages (lst): [ColIdx_1, ColIdx_2, ..., colIndex_|numCol|] -> colIdx_i: [<PageRef_1>, ...]
-            colDiskPartial (lst): [ColIdx_1, ColIdx_2, ..., colIndex_|numCol|] -> colIdx_i: ["<PID>", ...]
-            colDiskFull (lst): [ColIdx_1, ColIdx_2, ..., colIndex_|numCol|] -> colIdx_i: ["<PID>", ...]
+            segments (dict): columnIdx -> ColumnSegment. Only used in segment mode, opened on first use.
+            zoneMaps (dict): Zone maps of pages that are on disk. Format: {<pid> : (numRecords, minValue, maxValue)}
+                             Filled when a page is written out (or lazily from the page header) and dropped when the
+                             page is loaded, since the in-memory page keeps its own.
+        Notes:
+            The frame table replaces the m2 pageDirectory and its four positional lists (partial/full x memory/disk):
+            every lookup, load, save and delete is a dict operation, and no entry refers to another by position.
         """
-        self.log = logging.getLogger(self.__class__.__name__)
-        self.log = setupLogger(False, "DEBUG", self.log, 8)
-
-        self.log.debug(f"BufferPool constructor called! Creating new bufferPool object with params - numColumns: {numColumns} - path: {path} - maxPages: {maxPages}")
-        self.pageDirectory = {} 
+        self.log.debug("BufferPool constructor called! Creating new bufferPool object with params - numColumns: %s - path: %s - maxPages: %s", numColumns, path, maxPages)
+        self.columnSizes = list(columnSizes) if(columnSizes is not None) else [8]*numColumns
+        self.frameBytes = max(headerSize(PAGE_CAPACITY, size) for size in self.columnSizes) + PAGE_CAPACITY #largest frame of this table
+        self.budget = budget if(budget is not None) else MemoryBudget(maxPages * self.frameBytes)
+        self.budget.register(self, priority)
+        maxPages = max(1, self.budget.capacityBytes // self.frameBytes)
+        self.frames = {}
+        self.memFrames = {}
         self.path = path
-        self.activePages = 0 #current number of active pages
-        self.pageCount = 0 #Total number of pages
-        self.capacity = maxPages
+        self.pageCount = 0 #High-water mark of the page numbers handed out (whole blocks)
+        self.pidBlock = iter(()) #the rest of the current block of page numbers
+        self.capacity = maxPages #frames of the largest size that fit in the budget
+        self.useSegments = useSegments
+        self.segments = {}
+        self.zoneMaps = {}
+        self.policy = makePolicy(evictionPolicy, maxPages)
+        self.partitions = [threading.Lock() for x in range(LATCH_PARTITIONS)]
+        self.directoryLock = threading.Lock()
+        self.policyLock = threading.Lock()
+        self.flusher = None
+        self.columnPages = [[] for x in range(numColumns)]
+        self.pagePosition = {}
+        self.lastMiss = {}
+        self.readAhead = readAhead
+        self.ioThreads = ioThreads
+        self.ioPool = None
+        self.prefetched = {}
+        self.metrics = BufferPoolMetrics(numColumns)
+        if(flushRate > 0):
+            self.startFlusher(flushRate)
 
-        # partialMemPages & fullMemPages make up the complete buffer(memory) pool of Page objects
-        self.partialMemPages = [[] for x in range(numColumns)]
-        self.fullMemPages = [[] for x in range(numColumns)]
+    def hasCapacity(self):
+        return self.budget.hasRoom(self.frameBytes)
 
-        # col-disk-partial & col-disk-full make up the pageIds of all the pages stored on disk 
-        self.partialDiskPages = [[] for x in range(numColumns)]
-        self.fullDiskPages = [[] for x in range(numColumns)]
-        self.log.debug(f"BufferPool created! Current bufferpool:\nself.partialMemPages: {self.partialMemPages}\nself.fullMemPages: {self.fullMemPages}\nself.partialDiskPages: {self.partialDiskPages}\nself.fullDiskPages:{self.fullDiskPages}")
+    @property
+    def activePages(self):
+        """The number of pages in memory."""
+        return len(self.memFrames)
 
-    def hasCapacity(self):
-        self.log.debug(f"Checking if the bufferpool has capacity for new pages: Number of active pages: {self.activePages} - capacity: {self.capacity} - conditional: {self.activePages < self.capacity}")
-        return self.activePages < self.capacity   
+    def _partition(self, PID):
+        return self.partitions[hash(PID) % LATCH_PARTITIONS]
 
     def getMemPages(self):
         """
@@ -54,132 +173,294 @@ class BufferPool:
         Inputs: 
             N/A
         Outputs:
-            Returns a list of tuples. Format: [(<page ref>, LFU, columnIdx, pageIdx), ...]
-        """
-        result = []
-        self.log.debug(f"getMemPages called! Creating list of all memory pages in the bufferpool...")
-        self.log.debug(f"Fetching partially filled pages and adding to list...")
-        for i, column in enumerate(self.partialMemPages):
-            self.log.debug(f"Fetching all mempages for column: {i}...")
-            for j, page in enumerate(column):
-                lfu = page.calculateLFU()
-                self.log.debug(f"Appending page {page.pageID} to the list: ({page.pageID}, {lfu}, {i}, {j})")
-                result.append((page, lfu, i, j))
-        self.log.debug(f"Complete! Fetching full memory pages and adding to list...")
-        for i, column in enumerate(self.fullMemPages):
-            self.log.debug(f"Fetching all mempages for column: {i}...")
-            for j, page in enumerate(column):
-                lfu = page.calculateLFU()
-                self.log.debug(f"Appending page {page.pageID} to the list: ({page.pageID}, {lfu}, {i}, {j})")
-                result.append((page, lfu, i, j))
-        self.log.debug(f"Complete! Returning list of pages:\n{result}")
-        return result   
-
-    def _createPage(self, columnIdx):
+            Returns a list of tuples. Format: [(<page ref>, LFU, columnIdx), ...]
+        """
+        self.log.debug("getMemPages called! Creating list of all memory pages in the bufferpool...")
+        frames = list(self.memFrames.values()) #a copy: other threads may load or evict pages meanwhile
+        return [(frame.page, frame.page.calculateLFU(), frame.columnIdx) for frame in frames if frame.page is not None]
+
+    def addDiskPage(self, PID, columnIdx, isFull, assigned=False):
+        """
+        Description: Registers a page that is already on disk (used when a table is loaded).
+        """
+        self.frames[PID] = Frame(PID, columnIdx, bool(isFull), assigned=bool(assigned))
+        self._addToColumn(PID, columnIdx)
+        if(int(PID[2:]) >= self.pageCount): #never hand out a PID that is already in use
+            self.pageCount = int(PID[2:]) + 1
+            self.pidBlock = iter(())
+
+    def getSegment(self, columnIdx):
+        """
+        Description: Returns the segment of a column, opening it the first time it is needed.
+        """
+        segment = self.segments.get(columnIdx)
+        if(segment is None):
+            with self.directoryLock:
+                segment = self.segments.get(columnIdx)
+                if(segment is None):
+                    segment = self.segments[columnIdx] = ColumnSegment(self.path, columnIdx, size=self.columnSizes[columnIdx])
+        return segment
+
+    def _newPage(self, PID, columnIdx):
+        """
+        Description: Builds the in-memory Page object for <PID>, backed by the column's segment in segment mode.
+        """
+        segment = self.getSegment(columnIdx) if(self.useSegments) else None
+        return Page(PID, self.path, size=self.columnSizes[columnIdx], columnIdx=columnIdx, segment=segment)
+
+    def close(self):
+        """
+        Description: Stops the background flusher and I/O threads and flushes and unmaps the segment files.
+        """
+        self.stopFlusher()
+        if(self.ioPool is not None):
+            self.ioPool.shutdown(wait=True)
+            self.ioPool = None
+        self.prefetched = {}
+        for segment in self.segments.values():
+            segment.close()
+        self.segments = {}
+
+    def allocatePage(self, columnIdx):
+        """
+        Description: Creates a new page of the column whose slots the caller assigns (with Page.writeAt or
+                     Page.writeRun). Tables address all of their pages this way (by record ID, see Table). Pinned,
+                     like getPage.
+        """
+        return self._createPage(columnIdx, assigned=True)
+
+    def _createPage(self, columnIdx, assigned=False):
         """
         Description: This function creates a new page and adds it to the specified column
 
         Inputs: 
             columnIdx (int): An integer entry of the column.
+            assigned (bool): Create a page whose slots the caller assigns (see allocatePage).
         Outputs:
-            Returns the page ID of the created page
-        Notes:
-            Page dir Format: {<pid> : (isFull, inMem, columnIdx, pageIdx)}
-        """
-        self.log.debug(f"createPage called! Building a new page and adding it to column: {columnIdx}...") 
-        PID = "P-" + str(self.pageCount)
-        self.log.debug(f"New PID: {PID}. Creating new page object!")
-        page = Page(PID, self.path)
-        self.log.debug(f"New Page object created! <page>.pageID: {page.pageID}")
-        self.log.debug(f"Saving initial version of the page....")
-        page.save("-partial") #initial save to create the files
-        self.log.debug(f"Page Saved! Creating new entry into the pageDirectory...")
-        entry = (0, 1, columnIdx, len(self.partialMemPages[columnIdx]))
-        self.log.debug(f"New entry: {PID} -> {entry}")
-        self.pageDirectory[PID] = entry
-        self.log.debug(f"Adding new page to memory! Entire Memory buffer pre-append: {self.partialMemPages}")
-        self.log.debug(f"Column pages pre-append: {self.partialMemPages[columnIdx]}")
-        self.partialMemPages[columnIdx].append(page)
-        self.log.debug(f"Adding new page to memory! Entire Memory buffer post-append: {self.partialMemPages}")
-        self.log.debug(f"Column pages post-append: {self.partialMemPages[columnIdx]}")
-        self.pageCount += 1
-        self.log.debug(f"pageCount: {self.pageCount}")
-        self.activePages += 1
-        self.log.debug(f"numPages: {self.activePages}")
-        self.log.debug(f"Complete! Returning page reference for new page: {page.pageID}")
+            Returns the created page, pinned
+        """
+        self.log.debug("createPage called! Building a new page and adding it to column: %s...", columnIdx)
+        self.budget.makeRoom(self.frameBytes)
+        with self.directoryLock:
+            PID = "P-" + str(self._nextPageNumber())
+        page = self._newPage(PID, columnIdx)
+        page.setDirty() #the page only exists in memory until it's first written out
+        frame = Frame(PID, columnIdx, False, page, assigned)
+        with self._partition(PID):
+            self.frames[PID] = frame
+            self.memFrames[PID] = frame
+            with self.policyLock:
+                self.policy.add(PID)
+            self.budget.charge(self, len(page.frame))
+            page.pin() #before anyone else can see it, so it can't be evicted before the caller gets it
+        with self.directoryLock:
+            self._addToColumn(PID, columnIdx)
         return page
 
-    def getPage(self, PID="default", columnIdx=-1):
+    def _nextPageNumber(self):
+        """
+        Description: Returns the next unused page number (the caller holds directoryLock). Numbers are allocated PID_BLOCK at a time; in segment mode
+                     each open column segment reserves frames for its part of the block when a new block starts.
+        """
+        number = next(self.pidBlock, None)
+        if(number is None):
+            self.pidBlock = iter(range(self.pageCount + 1, self.pageCount + PID_BLOCK))
+            number = self.pageCount
+            self.pageCount += PID_BLOCK
+            for segment in self.segments.values():
+                segment.reserve(PID_BLOCK // len(self.columnPages) + 1)
+        return number
+
+    def getPage(self, PID="default", columnIdx=-1, ring=None):
         """
         Description: This method returns a page reference when given a page ID.
                      If no page ID is given But a columnIdx is given then this method creates a new page, appends it to that column and returns the page reference.
-                     Automatically handles eviction if the page requested is from disk and the buffer is full.
+                     Automatically handles eviction (from whichever pool sharing the budget is furthest over its
+                     share) if the page requested is from disk or new and the budget is used up.
         Inputs: 
             PID (str): The string page-ID of the page you want to fetch.
             columnIdx (int): The entry of a column you want to add a new page to.
+            ring (BufferRing): The caller is a large scan (see scanRing): load the page into this ring.
         Outputs: 
-            <PageRef> : A python reference to the requested page.
-        Notes:
-            Page dir Format: {<pid> : (isFull, inMem, columnIdx, pageIdx)}
+            <PageRef> : A python reference to the requested page. The page is pinned: it can't be evicted until the
+                        caller unpins it, either with page.unpin() or by using it as a context manager:
+                            with bufferPool.getPage(PID) as page:
+                                value = page.read(offset)
+                        Writers also hold the page's latch exclusive while they write (see Page).
+        Notes: Thread safe. Only the page's partition lock is taken, so threads reading different resident pages
+               don't wait for each other and a thread waiting for a load only blocks its own partition.
         """
-        self.log.debug(f"getPage called! Params -> PID: {PID} - columnIdx: {columnIdx}")
-        if(PID == "default" and columnIdx == -1):
-            self.log.error(f"ERROR: getpage called without a pageID or column entry!")
-            return None
-        ret = None
-        self.log.debug(f"Checking getPage() mode...")
-        if(PID in self.pageDirectory): #if page exists
-            self.log.debug(f"The page with ID: {PID} exists! Fetching the page directory entry...")
-            entry = self.pageDirectory[PID]
-            self.log.debug(f"Complete! entry: {entry}")
-            self.log.debug(f"Entry format: (isFull, inMem, columnIdx, pageIdx)")
-            self.log.debug(f"Checking if the page is in memory...")
-            if(entry[1]): #if page in memory then return the page reference
-                self.log.debug(f"Page {PID} in memory! entry[1]: {entry[1]}")
-                self.log.debug(f"Checking if the page is full...")
-                if(entry[0]): #returning a full page
-                    self.log.debug(f"The page {PID} is full! entry[0]: {entry[0]}")
-                    self.log.debug(f"Fetching page from fullMemPages at column: {entry[2]} entry: {entry[3]}")
-                    self.log.debug(f"self.fullMemPages[{entry[2]}]: {[page.pageID for page in self.fullMemPages[entry[2]]]}")
-                    ret = self.fullMemPages[entry[2]][entry[3]]
-                    self.log.debug(f"Got page {ret.pageID}!")
-                else:
-                    self.log.debug(f"The page {PID} is partially filled! entry[0]: {entry[0]}")
-                    self.log.debug(f"Fetching page from partialMemPages at column: {entry[2]} entry: {entry[3]}")
-                    self.log.debug(f"self.partialMemPages[{entry[2]}]: {[page.pageID for page in self.partialMemPages[entry[2]]]}")
-                    ret = self.partialMemPages[entry[2]][entry[3]]
-                    self.log.debug(f"Got page {ret.pageID}!")
-            else: #else the page is in disk
-                self.log.debug(f"The page is not in memory! entry[1]: {entry[1]}")
-                self.log.debug(f"Checking if we have space to load a page from disk...")
-                if(not self.hasCapacity()): #if we don't have space then evict, nmw load new page once we have space
-                    self.log.debug(f"No space for new pages. Evicting the bottom 40% of the least frequently used pages!")
-                    self.evict()
-                    self.log.debug(f"Pages evicted! We now have more space...")
-                else:
-                    self.log.debug(f"We have the space to load new pages from disk!")
-                self.log.debug(f"Loading page from disk: {PID}")
-                self.loadPage(PID)
-                self.log.debug(f"Page loaded into memory!")
-                self.log.debug(f"Number of Pages in memory: {self.activePages}. Getting page entry for page {PID} ...")
-                entry = self.pageDirectory[PID] #new entry is created during loadPage so refetch it here
-                self.log.debug(f"New entry: {entry}")
-                self.log.debug(f"Entry format: (isFull, inMem, columnIdx, pageIdx)")
-                if(entry[0]): #returning a full page
-                    self.log.debug(f"self.fullMemPages[{entry[2]}]: {[page.pageID for page in self.fullMemPages[entry[2]]]}")
-                    ret = self.fullMemPages[entry[2]][entry[3]]
-                    self.log.debug(f"Got page: {ret.pageID}!")
+        frame = self.frames.get(PID)
+        if(frame is not None): #if page exists
+            if(frame.page is None): #the page is on disk
+                self.metrics.misses[frame.columnIdx] += 1
+                if(ring is None or not self._recycle(ring)): #a full ring gives up its oldest frame instead
+                    self.budget.makeRoom(self.frameBytes) #if we don't have space then evict, load new page once we have space
+            else:
+                self.metrics.hits[frame.columnIdx] += 1
+            with self.partitions[hash(PID) % LATCH_PARTITIONS]: #self._partition(PID), inlined on the hot path
+                if(frame.page is None): #still on disk (or evicted again since we looked)
+                    self._loadFrame(frame, ring)
+                elif(ring is not None): #a scan's hit doesn't make the page look hot
+                    pass
+                elif(frame.ring is not None): #a scan's page is needed elsewhere: it joins the main pool
+                    frame.ring = None
+                    with self.policyLock:
+                        self.policy.add(PID)
+                elif(self.policy.concurrentAccess):
+                    self.policy.access(PID)
                 else:
-                    self.log.debug(f"self.partialMemPages[{entry[2]}]: {[page.pageID for page in self.partialMemPages[entry[2]]]}")
-                    ret = self.partialMemPages[entry[2]][entry[3]]
-                    self.log.debug(f"Got page: {ret.pageID}!")
-        else: #page doesn't exist so create a new page and return it's reference.
-            self.log.debug(f"Get page called in create mode! Creating new page and appending to column: {columnIdx}")
-            ret = self._createPage(columnIdx)
-            self.log.debug(f"Created page: {ret.pageID}!")
-        self.log.debug(f"getPage Finished! Returning page with ID: {ret.pageID}")
-        return ret
+                    with self.policyLock:
+                        self.policy.access(PID)
+                return frame.page.pin()
+        if(columnIdx == -1):
+            self.log.error("ERROR: getpage called without a pageID or column entry!")
+            return None
+        return self._createPage(columnIdx) #page doesn't exist so create a new page and return it's reference.
     
+    def scanRing(self):
+        """
+        Description: Returns a new BufferRing for a large scan of this pool. The ring is at most an eighth of the
+                     pool so a scan never takes more than that from the other pages.
+        """
+        return BufferRing(self, max(1, min(RING_PAGES, self.capacity // 8)))
+
+    def _recycle(self, ring):
+        """
+        Description: If <ring> is full, writes out its oldest page so the scan's next page can take its frame.
+        Outputs:
+            True if a frame was freed - else False (the ring isn't full or its oldest page is pinned).
+        """
+        while(len(ring.PIDs) >= ring.size):
+            PID = ring.PIDs.popleft()
+            with self._partition(PID):
+                frame = self.memFrames.get(PID)
+                if(frame is None or frame.ring is not ring): #left the ring since it was loaded
+                    continue
+                if(frame.page.pinCount):
+                    ring.PIDs.appendleft(PID)
+                    return False
+                self.metrics.ringReuses += 1
+                return self._writeOut(frame)
+        return False
+
+    def _releaseRing(self, ring):
+        """
+        Description: Drops the pages still in <ring> (BufferRing.close). Pinned ones join the main pool instead.
+        """
+        while(ring.PIDs):
+            PID = ring.PIDs.popleft()
+            with self._partition(PID):
+                frame = self.memFrames.get(PID)
+                if(frame is None or frame.ring is not ring):
+                    continue
+                if(frame.page.pinCount):
+                    frame.ring = None
+                    with self.policyLock:
+                        self.policy.add(PID)
+                else:
+                    self._writeOut(frame)
+
+    def _addToColumn(self, PID, columnIdx):
+        self.pagePosition[PID] = len(self.columnPages[columnIdx])
+        self.columnPages[columnIdx].append(PID)
+
+    def prefetch(self, PIDs):
+        """
+        Description: Prefetch hint. Starts reading the pages in <PIDs> that are on disk on the I/O thread pool, so a
+                     later getPage/sumPage of them finds the file contents already read. Pages in memory, pages that
+                     are already being prefetched and unknown PIDs are ignored.
+                     In segment mode the hint is passed to the kernel instead (madvise WILLNEED on the frames).
+        """
+        for PID in PIDs:
+            frame = self.frames.get(PID)
+            if(frame is None or frame.page is not None or PID in self.prefetched):
+                continue
+            if(self.useSegments):
+                self.getSegment(frame.columnIdx).willNeed(PID)
+                continue
+            if(self.ioPool is None):
+                with self.directoryLock:
+                    if(self.ioPool is None):
+                        self.ioPool = ThreadPoolExecutor(max_workers=self.ioThreads, thread_name_prefix="BufferPoolIO")
+            self.prefetched[PID] = self.ioPool.submit(readPageFile, f"{self.path}{PID}.page")
+            self.metrics.prefetches += 1
+
+    def _takePrefetched(self, PID):
+        """
+        Description: Returns the prefetched contents of <PID>'s file (waiting for the read if it's still running),
+                     or None if it wasn't prefetched or the read failed.
+        """
+        future = self.prefetched.pop(PID, None)
+        if(future is None):
+            return None
+        try:
+            return future.result()
+        except OSError:
+            return None
+
+    def _noteMiss(self, PID, columnIdx):
+        """
+        Description: Sequential access detection. When the page after the column's previous miss is missed,
+                     the next <readAhead> pages of the column are prefetched.
+        """
+        position = self.pagePosition.get(PID)
+        if(position is None or self.readAhead <= 0):
+            return
+        if(self.lastMiss.get(columnIdx) == position - 1):
+            self.prefetch(self.columnPages[columnIdx][position + 1 : position + 1 + self.readAhead])
+        self.lastMiss[columnIdx] = position
+
+    def pageMayContain(self, PID, low, high):
+        """
+        Description: Zone map check. Returns False if no live value of page <PID> can be in [low, high].
+                     Pages on disk are checked from their zone map (at most one header read), never loaded.
+        """
+        frame = self.frames.get(PID)
+        if(frame is None):
+            return False
+        if(frame.page is not None):
+            return frame.page.mayContain(low, high)
+        if(PID not in self.zoneMaps):
+            if(self.useSegments):
+                segment = self.getSegment(frame.columnIdx)
+                header = readPageHeader(segment.frame(PID)) if(segment.hasPage(PID)) else None
+            else:
+                header = readPageFileHeader(f"{self.path}{PID}.page")
+            if(header is None):
+                return True #no zone map, the page has to be checked
+            self.zoneMaps[PID] = (header[4], header[7], header[8])
+        records, minValue, maxValue = self.zoneMaps[PID]
+        return records > 0 and minValue <= high and low <= maxValue
+
+    def sumPage(self, PID, columnIdx, offsets, ring=None):
+        """
+        Description: Sums the values at <offsets> of a page. Full pages that are on disk are summed straight from
+                     their (encoded) file instead of being loaded into the bufferpool, so aggregates over cold data
+                     don't evict anything.
+        Inputs:
+            PID (str): The page to aggregate.
+            columnIdx (int): The column of the page.
+            offsets (list): The data array offsets to add up.
+            ring (BufferRing): The scan ring to load the page into if it has to be loaded (see scanRing).
+        Outputs:
+            The sum (int).
+        """
+        frame = self.frames.get(PID)
+        total = None
+        if(frame is not None and frame.isFull and frame.page is None and not self.useSegments):
+            with self._partition(PID): #write-outs truncate and rewrite the file (see _writeOut): don't read it meanwhile
+                if(frame.page is None): #it may have been loaded (and be dirty) since
+                    self.metrics.misses[columnIdx] += 1
+                    self._noteMiss(PID, columnIdx)
+                    raw = self._takePrefetched(PID) or readPageFile(f"{self.path}{PID}.page")
+                    self.metrics.bytesRead += len(raw)
+                    total = sumPageFile(f"{self.path}{PID}.page", offsets, size=self.columnSizes[columnIdx], raw=raw)
+        if(total is not None):
+            return total
+        with self.getPage(PID, columnIdx, ring) as page:
+            return sum(page.readMany(offsets))
+
     def deletePage(self, PID):
         """
         Description: This function deletes a page and all of it's data including the data on disk.
@@ -189,189 +470,180 @@ class BufferPool:
         Outputs:
             True if successful - else False
         """
-        ret = True
-        self.log.debug(f"deletePage called! Deleting the page with PID: {PID}")
-        if(PID in self.pageDirectory): #if the page exists
-            self.log.debug(f"Page located in directory! Fetching directory entry...")
-            entry = self.pageDirectory[PID] #entry: (isFull, inMem, columnIdx, pageIdx)
-            self.log.debug(f"Complete! entry: {entry}")
-            self.log.debug(f"Entry format: (isFull, inMem, columnIdx, pageIdx)")
-            if(entry[1]): #if the page is in memory
-                self.log.debug(f"Page is in memory! entry[1]: {entry[1]}")
-                if(entry[0]): #if page is full
-                    self.log.debug(f"Page is full! Popping page at location: column: {entry[2]} - entry: {entry[1]}")
-                    page = self.fullMemPages[entry[2]].pop(entry[3])
-                    self.log.debug(f"Deleting page: {page.pageID}")
-                    page.delete() #remove any saved files
-                    self.log.debug(f"Page deleted! Removing entry from page directory...")
-                    del self.pageDirectory[PID] #remove from page directory
-                    self.log.debug(f"Page removed from directory and memory.")
-                else: #page is partially full
-                    self.log.debug(f"Page is full! Popping page at location: column: {entry[2]} - entry: {entry[1]}")
-                    page = self.partialMemPages[entry[2]].pop(entry[3])
-                    self.log.debug(f"Deleting page: {page.pageID}")
-                    page.delete() #remove any saved files
-                    self.log.debug(f"Page deleted! Removing entry from page directory...")
-                    del self.pageDirectory[PID] #remove from page directory
-                    self.log.debug(f"Page removed from directory and memory.")
-            else: #The page is on disk so just delete the files
-                self.log.debug(f"Deleting page files on disk...")
-                if(entry[0]): #if page is full
-                    self.log.debug(f"Deleting full page from disk...")
-                    page = self.fullDiskPages[entry[2]].pop(entry[3]) #remove from memory
-                    self.log.debug(f"Deleting page with ID: {page.pageID}! Removing offset: {self.path}{PID}-full.offsets")
-                    remove(f"{self.path}{PID}-full.offsets")
-                    self.log.debug(f"Complete! Removing data file: {self.path}{PID}-full.bin")
-                    remove(f"{self.path}{PID}-full.bin")
-                    self.log.debug(f"Complete! Removing entry from page directory...")
-                    del self.pageDirectory[PID] #remove from page directory
-                    self.log.debug(f"Entry removed!")
-                else: #page is partially full
-                    self.log.debug(f"Deleting partial page from disk...")
-                    page = self.partialDiskPages[entry[2]].pop(entry[3]) #remove from memory
-                    self.log.debug(f"Deleting page with ID: {page.pageID}! Removing offset: {self.path}{PID}-partial.offsets")
-                    remove(f"{self.path}{PID}-partial.offsets")
-                    self.log.debug(f"Complete! Removing data file: {self.path}{PID}-partial.bin")
-                    remove(f"{self.path}{PID}-partial.bin")
-                    self.log.debug(f"Complete! Removing entry from page directory...")
-                    del self.pageDirectory[PID] #remove from page directory
-                    self.log.debug(f"Entry removed!")
-        else:
-            self.log.debug(f"Page with ID {PID} not found! Returning False...")
-            ret = False
-        self.log.debug(f"Complete! Return Value: {ret}")
-        return ret
+        self.log.debug("deletePage called! Deleting the page with PID: %s", PID)
+        with self._partition(PID):
+            frame = self.frames.pop(PID, None)
+            if(frame is None):
+                self.log.debug("Page with ID %s not found! Returning False...", PID)
+                return False
+            self.zoneMaps.pop(PID, None)
+            self.prefetched.pop(PID, None)
+            if(frame.page is not None): #the page is in memory
+                del self.memFrames[PID]
+                with self.policyLock:
+                    self.policy.remove(PID)
+                self.budget.release(self, len(frame.page.frame))
+                return frame.page.delete() #remove the saved file
+            if(self.useSegments): #The page is on disk so just delete the files
+                self.getSegment(frame.columnIdx).free(PID)
+            else:
+                remove(f"{self.path}{PID}.page")
+            return True
 
     def savePage(self, PID):
         """
         Description: This method writes the page to disk and removes it from the active bufferpool.
         Inputs:
             pageID(str): The ID of the page we want to write to disk.
-        Notes:
-            Page dir Format: {<pid> : (isFull, inMem, columnIdx, pageIdx)}
-        """
-        ret = True
-        self.log.debug(f"savePage called! Writing the page with ID {PID} to disk...")
-        if(PID in self.pageDirectory): #if the page exists
-            self.log.debug(f"Page found! Fetching page directory entry...")
-            entry = self.pageDirectory[PID] #entry: (isFull, inMem, columnIdx, pageIdx)
-            self.log.debug(f"Entry found for page {PID}: {entry}")
-            self.log.debug(f"Page dir Format: PID -> (isFull, inMem, columnIdx, pageIdx)")
-            self.log.debug(f"Checking if the page is in memory...")
-            if(entry[1]): #the page is in memory, then save it else it's in disk, no save necessary.
-                self.log.debug(f"Page is in memory! Checking if it is full...")
-                if(entry[0]): #if the page is full
-                    self.log.debug(f"Full page detected! Saving to disk...")
-                    self.log.debug(f"fullMemPages pre-pop: {[page.pageID for page in self.fullMemPages[entry[2]]]}")
-                    page = self.fullMemPages[entry[2]].pop(entry[3]) #pop full page from memory
-                    self.log.debug(f"fullMemPages post-pop: {[page.pageID for page in self.fullMemPages[entry[2]]]}")
-                    self.log.debug(f"Popped page: {page.pageID}! Saving to disk if the page is dirty...")
-                    if(page.isDirty):
-                        self.log.debug(f"Dirty page detected! Saving to disk")
-                        page.save("-full") #Save the page
-                    self.log.debug(f"Page saved to disk! Creating new entry for page directory...")
-                    entry = (1, 0, entry[2], len(self.colDiskFull))
-                    self.log.debug(f"New entry: {entry}! Appending to fullDiskPages...")
-                    self.log.debug(f"fullDiskPages pre-append: {[page.pageID for page in self.fullDiskPages[entry[2]]]}")
-                    self.fullDiskPages[entry[2]].append(page.pageID)
-                    self.log.debug(f"fullDiskPages post-append: {[page.pageID for page in self.fullDiskPages[entry[2]]]}")
-                    self.log.debug(f"Updating page directory - old: {self.pageDirectory[PID]}")
-                    self.pageDirectory[PID] = entry
-                    self.log.debug(f"Updating page directory - new: {self.pageDirectory[PID]}")
-                else:
-                    self.log.debug(f"Partial page detected! Saving to disk...")
-                    self.log.debug(f"partialMemPages pre-pop: {[page.pageID for page in self.partialMemPages[entry[2]]]}")
-                    page = self.partialMemPages[entry[2]].pop(entry[3]) #pop partial page from memory
-                    self.log.debug(f"fullMemPages post-pop: {[page.pageID for page in self.partialMemPages[entry[2]]]}")
-                    self.log.debug(f"Popped page: {page.pageID}! Saving to disk...")
-                    if(page.isDirty):
-                        self.log.debug(f"Dirty page detected! Saving to disk")
-                        page.save("-partial") #Save the page
-                    self.log.debug(f"Page saved to disk! Creating new entry for page directory...")
-                    entry = (1, 0, entry[2], len(self.partialDiskPages))
-                    self.log.debug(f"New entry: {entry}! Appending to partialDiskPages...")
-                    self.log.debug(f"partialDiskPages pre-append: {[page.pageID for page in self.partialDiskPages[entry[2]]]}")
-                    self.partialDiskPages[entry[2]].append(page.pageID)
-                    self.log.debug(f"partialDiskPages post-append: {[page.pageID for page in self.partialDiskPages[entry[2]]]}")
-                    self.log.debug(f"Updating page directory - old: {self.pageDirectory[PID]}")
-                    self.pageDirectory[PID] = entry
-                    self.log.debug(f"Updating page directory - new: {self.pageDirectory[PID]}")
-            else:
-                self.log.debug(f"ERROR! Page is already on disk! No point saving. Exiting...")
-                ret = False
-        self.log.debug(f"Complete! Return Value: {ret}")
-        return ret
+        Outputs:
+            True if the page was in memory - else False
+        """
+        self.log.debug("savePage called! Writing the page with ID %s to disk...", PID)
+        with self._partition(PID):
+            frame = self.memFrames.get(PID)
+            if(frame is None): #the page is on disk (or doesn't exist), no save necessary.
+                return False
+            return self._writeOut(frame)
+
+    def _writeOut(self, frame):
+        """
+        Description: Saves the page of <frame> if it is dirty and drops it from memory (the caller holds the page's
+                     partition lock).
+        """
+        PID = frame.pid
+        page = frame.page
+        del self.memFrames[PID]
+        with self.policyLock:
+            self.policy.remove(PID)
+        self.prefetched.pop(PID, None) #can't be newer than the page we are writing
+        if(page.isDirty):
+            frame.isFull = not page.hasCapacity() #owners fill pages with Page.writeAt/writeRun, so it's checked before a save
+            start = time.perf_counter()
+            page.save(encode=frame.isFull) #full pages are compressed since they won't be written to again
+            self.metrics.recordSave(time.perf_counter() - start, page.ioBytes)
+        self.zoneMaps[PID] = (page.numRecords(), page.minValue, page.maxValue)
+        frame.page = None
+        frame.ring = None
+        self.budget.release(self, len(page.frame))
+        return True
     
     def loadPage(self, PID):
-        ret = True
-        self.log.debug(f"loadPage called! Loading page with PID: {PID} from disk...")
-        self.log.debug(f"checking if page in directory...")
-        if(PID in self.pageDirectory): #if the page exists
-            self.log.debug(f"Page found! Fetching page directory entry...")
-            entry = self.pageDirectory[PID] #entry: (isFull, inMem, columnIdx, pageIdx)
-            self.log.debug(f"Entry found for page {PID}: {entry}")
-            self.log.debug(f"Entry Format: PID -> (isFull, inMem, columnIdx, pageIdx)")
-            if(not entry[1]): #the page is in disk then load it else it's in memory, no load necessary.
-                self.log.debug(f"Page is located on disk! Loading into memory...")
-                if(entry[0]): #if the page is full
-                    self.log.debug(f"Full page detected! popping from disk full...")
-                    self.log.debug(f"fullDiskPages pre-pop: {[page for page in self.fullDiskPages[entry[2]]]}")
-                    PID = self.fullDiskPages[entry[2]].pop(entry[3]) #pop full page from disk
-                    self.log.debug(f"fullDiskPages post-pop: {[page for page in self.fullDiskPages[entry[2]]]}")
-                    self.log.debug(f"Creating live page for: {PID}")
-                    page = Page(PID, self.path)
-                    self.log.debug(f"Page object with ID {page.pageID} created! loading data from disk...")
-                    page.load('-full')
-                    self.log.debug(f"Data loaded! Creating new entry for page directory...")
-                    entry = (entry[0], 1, entry[2], len(self.fullMemPages))
-                    self.log.debug(f"New entry: {entry}! Appending to fullMemPages...")
-                    self.log.debug(f"fullMemPages pre-append: {[page.pageID for page in self.fullMemPages]}")
-                    self.fullMemPages[entry[2]].append(page)
-                    self.log.debug(f"fullMemPages post-append: {[page.pageID for page in self.fullMemPages]}")
-                    self.log.debug(f"Updating page directory - old: {self.pageDirectory[PID]}")
-                    self.pageDirectory[PID] = entry
-                    self.log.debug(f"Updating page directory - new: {self.pageDirectory[PID]}")
-                else:
-                    self.log.debug(f"Partial page detected! popping from disk full...")
-                    self.log.debug(f"partialDiskPages pre-pop: {[page for page in self.partialDiskPages[entry[2]]]}")
-                    PID = self.partialDiskPages[entry[2]].pop(entry[3]) #pop full page from disk
-                    self.log.debug(f"partialDiskPages post-pop: {[page for page in self.partialDiskPages[entry[2]]]}")
-                    self.log.debug(f"Creating live page for: {PID}")
-                    page = Page(PID, self.path)
-                    self.log.debug(f"Page object with ID {page.pageID} created! loading data from disk...")
-                    page.load('-partial')
-                    self.log.debug(f"Data loaded! Creating new entry for page directory...")
-                    entry = (entry[0], 1, entry[2], len(self.partialMemPages))
-                    self.log.debug(f"New entry: {entry}! Appending to fullMemPages...")
-                    self.log.debug(f"partialMemPages pre-append: {[page.pageID for page in self.partialMemPages]}")
-                    self.partialMemPages[entry[2]].append(page)
-                    self.log.debug(f"partialMemPages post-append: {[page.pageID for page in self.partialMemPages]}")
-                    self.log.debug(f"Updating page directory - old: {self.pageDirectory[PID]}")
-                    self.pageDirectory[PID] = entry
-                    self.log.debug(f"Updating page directory - new: {self.pageDirectory[PID]}")
-            else:
-                self.log.debug(f"Page is already in memory. No load necessary...")
-                ret = False
-        self.log.debug(f"Complete! Return value: {ret}")
-        return ret
+        """
+        Description: This method reads the page with ID <PID> from disk into the bufferpool.
+        Outputs:
+            True if the page was loaded - else False (it doesn't exist or is already in memory)
+        """
+        self.log.debug("loadPage called! Loading page with PID: %s from disk...", PID)
+        frame = self.frames.get(PID)
+        if(frame is None):
+            return False
+        with self._partition(PID):
+            if(frame.page is not None):
+                return False
+            self._loadFrame(frame)
+            return True
+
+    def _loadFrame(self, frame, ring=None):
+        """
+        Description: Reads the page of <frame> from disk (the caller holds the page's partition lock) into the main
+                     pool, or into <ring> if it is given. Raises IOError if the page file can't be read.
+        """
+        PID = frame.pid
+        self._noteMiss(PID, frame.columnIdx)
+        start = time.perf_counter()
+        page = self._newPage(PID, frame.columnIdx)
+        if(not page.load(self._takePrefetched(PID))): #don't cache an empty page as if it were the saved one
+            raise IOError(f"ERROR: Could not load page {PID} from {page.filename()}.")
+        self.metrics.recordLoad(time.perf_counter() - start, page.ioBytes)
+        self.zoneMaps.pop(PID, None)
+        frame.page = page
+        self.memFrames[PID] = frame
+        if(ring is not None):
+            frame.ring = ring
+            ring.PIDs.append(PID)
+        else:
+            with self.policyLock:
+                self.policy.add(PID)
+        self.budget.charge(self, len(page.frame))
     
+    def _isUnpinned(self, PID):
+        frame = self.memFrames.get(PID)
+        return frame is not None and frame.page.pinCount == 0
+
     def evict(self):
         """
-        Evicts 60% of the pages in memory using the LFU (Least Frequently Used) strategy.
-        Moves evicted pages to disk and updates metadata accordingly.
-        """
-        # Collect all pages and their LFU values
-        self.log.debug(f"evict called! Running eviction algorithm...")
-        self.log.debug(f"Building a list of all in-memory pages...")
-        memPages = self.getMemPages()
-        self.log.debug(f"Complete! memPages: {memPages}")
-        sorted_pages = sorted(memPages, key = lambda x: x[1]) # (page, LFU, columnIdx, pageIdx)
-        self.log.debug(f"Sorted memPages: {sorted_pages}")
-        num_to_evict = int(0.4 * len(sorted_pages))
-        self.log.debug(f"Evicting: {num_to_evict} lowest rated pages...")
-        for i in range(1, num_to_evict + 1):
-            tuple_to_evict = sorted_pages[-i]
-            page = tuple_to_evict[0]
-            self.log.debug(f"Evicting page: {page.pageID}")
-            self.savePage(page.pageID)
-        self.log.debug(f"evict complete!")
\ No newline at end of file
+        Description: Writes out the one page the eviction policy picks. Pinned pages are skipped.
+        Outputs:
+            True if a page was evicted - else False (every page in the pool is pinned).
+        """
+        while(True):
+            with self.policyLock:
+                PID = self.policy.victim(self._isUnpinned)
+            if(PID is None):
+                return False
+            with self._partition(PID):
+                frame = self.memFrames.get(PID)
+                if(frame is None or frame.page.pinCount): #another thread pinned or dropped it after it was picked
+                    continue
+                self.log.debug("Evicting page: %s", PID)
+                self.metrics.evictions += 1
+                return self._writeOut(frame)
+
+    def flushDirty(self, limit=None):
+        """
+        Description: Writes up to <limit> dirty, unpinned pages to disk and leaves them in memory (clean).
+                     Pages are written grouped by column and, in segment mode, each column's batch is synced
+                     with ColumnSegment.flushMany. Called by the BackgroundFlusher.
+        Outputs:
+            The number of pages written.
+        Notes: The pages are pinned while they are written, so they stay in memory and other threads can keep
+               reading them; writers wait for the page latch only while each page is saved.
+        """
+        byColumn = {}
+        count = 0
+        for frame in list(self.memFrames.values()):
+            if(limit is not None and count >= limit):
+                break
+            with self._partition(frame.pid):
+                page = frame.page
+                if(page is None or not page.isDirty or page.pinCount):
+                    continue
+                page.pin()
+            byColumn.setdefault(frame.columnIdx, []).append((frame, page))
+            count += 1
+        try:
+            for columnIdx, pages in byColumn.items():
+                if(self.useSegments):
+                    start = time.perf_counter()
+                    for frame, page in pages:
+                        with page.latch.shared:
+                            page.setClean()
+                            page.packHeader()
+                    self.getSegment(columnIdx).flushMany([frame.pid for frame, page in pages])
+                    elapsed = (time.perf_counter() - start) / len(pages)
+                    for frame, page in pages:
+                        self.metrics.recordSave(elapsed, len(page.frame))
+                else:
+                    for frame, page in pages:
+                        frame.isFull = not page.hasCapacity()
+                        start = time.perf_counter()
+                        page.save(encode=frame.isFull)
+                        self.metrics.recordSave(time.perf_counter() - start, page.ioBytes)
+        finally:
+            for pages in byColumn.values():
+                for frame, page in pages:
+                    page.unpin()
+        return count
+
+    def startFlusher(self, rate=200, interval=0.1):
+        """
+        Description: Starts a BackgroundFlusher that writes up to <rate> dirty pages per second (see flusher.py).
+        """
+        if(self.flusher is None):
+            self.flusher = BackgroundFlusher(self, rate, interval)
+            self.flusher.start()
+
+    def stopFlusher(self):
+        if(self.flusher is not None):
+            self.flusher.stop()
+            self.flusher = None
@@ -31,9 +31,10 @@ Format:
 
 """
 
-from lstore.table import Table
-from lstore.page import Page
+from lstore.table import Table, META_COLUMNS
+from lstore.page import Page, columnWidth
 from lstore.bufferpool import BufferPool
+from lstore.budget import MemoryBudget
 from os import remove
 import logging
 
@@ -41,12 +42,26 @@ from lstore.setupLogging import *
 
 class Database():
 
-    def __init__(self):
-        self.log = logging.getLogger(self.__class__.__name__)
-        self.log = setupLogger(False, "DEBUG", self.log, 4)
+    log = setupLogger(False, LOG_LEVEL, logging.getLogger("Database"), 4)
+
+    def __init__(self, useSegments=False, evictionPolicy="CLOCK", flushRate=0, bufferBytes=32*1024*1024, mergeInterval=1.0):
+        """
+        Inputs:
+            useSegments (bool): Store table columns in mmap'ed segment files instead of one file per page.
+            evictionPolicy (str): Default bufferpool replacement policy of the tables: "LRU", "CLOCK", "LRU-K" or "ARC".
+            flushRate (int): Dirty pages per second each table's background flusher writes out (0: no flusher).
+            bufferBytes (int): The memory budget for page frames, shared by the bufferpools of all tables.
+            mergeInterval (float): Seconds between the background merges and vacuums of each table (0: no merge thread,
+                                   call Table.merge and Table.vacuum yourself).
+        """
         self.tables = {} #Store name and tables as key:value
         self.path = './storage'
-        self.log.debug(f"Database constructor called. Database object created.")
+        self.useSegments = useSegments
+        self.evictionPolicy = evictionPolicy
+        self.flushRate = flushRate
+        self.mergeInterval = mergeInterval
+        self.budget = MemoryBudget(bufferBytes)
+        self.log.debug("Database constructor called. Database object created.")
 
     
     def open(self, path):
@@ -59,7 +74,7 @@ class Database():
         table data: key_rid locations map needs to be loaded 
         """
         self.path = path
-        self.log.debug(f"Open called: database path {self.path}")
+        self.log.debug("Open called: database path %s", self.path)
 
 
     def close(self):
@@ -69,33 +84,73 @@ class Database():
         save the colDisk indexes to disk to be used on reload 
         save the key_rid index to disk 
         """
-        self.log.debug(f"Close called! Saving all tables in the database...")
-        for tableName in self.tables:
+        self.log.debug("Close called! Saving all tables in the database...")
+        for tableName in list(self.tables):
             #Step-01: Write all memory to disk and close the table
-            self.log.debug(f"Saving database table: {tableName}")
-            table = self.tables[tableName]
-            table.save()
+            self.log.debug("Saving database table: %s", tableName)
+            self._closeTable(self.tables.pop(tableName))
+
+    def _closeTable(self, table):
+        """
+        Stops the table's merger and flusher, saves its pages and meta file and closes its bufferpool (its I/O
+        threads and segments), then gives its share of the memory budget back.
+        """
+        table.stopMerger()
+        table.bufferPool.stopFlusher() #the final save writes everything that's still dirty
+        table.save()
+        table.bufferPool.close()
+        self.budget.unregister(table.bufferPool)
 
     
-    def create_table(self, name, num_columns, key_index):
+    def create_table(self, name, num_columns, key_index, schema=None, evictionPolicy=None, priority=1):
         """
         Creates a new table
         :param name: string         #Table name
         :param num_columns: int     #Number of Columns: all columns are integer
         :param key: int             #Index of table key in columns
+        :param schema: list         #Type of each column: 'int8', 'int16', 'int32' or 'int64' (default: all 'int64')
+                                    #e.g., ['int64', 'int8', 'int8', 'int8', 'int8'] for a table of student IDs and grades
+        :param evictionPolicy: str  #Bufferpool replacement policy for this table (default: the database's)
+        :param priority: int        #Weight of the table's share of the database's memory budget
         """
-        self.log.debug(f"Create_table called! Creating table: {name} with {num_columns} columns. Primary Key index: {key_index}")
+        self.log.debug("Create_table called! Creating table: %s with %s columns. Primary Key index: %s", name, num_columns, key_index)
+        if schema is None:
+            schema = ["int64"]*num_columns
+        if len(schema) != num_columns:
+            raise TypeError(f"ERROR: The schema has {len(schema)} column types but the table has {num_columns} columns.")
+        if name in self.tables: #replacing an open table: save and close it first
+            self._closeTable(self.tables.pop(name))
         path = f"{self.path}/{name}/"
-        bufferpool = BufferPool(num_columns, path, 10*num_columns)
-        table = Table(name, num_columns, key_index, bufferpool, self.path)
+        #The table's columns, then its metadata columns (int64)
+        bufferpool = BufferPool(num_columns + META_COLUMNS, path, useSegments=self.useSegments,
+                                columnSizes=[columnWidth(t) for t in schema] + [columnWidth("int64")]*META_COLUMNS,
+                                evictionPolicy=evictionPolicy or self.evictionPolicy, flushRate=self.flushRate,
+                                budget=self.budget, priority=priority)
+        table = Table(name, num_columns, key_index, bufferpool, self.path, schema)
+        if self.mergeInterval > 0:
+            table.startMerger(self.mergeInterval)
         self.tables[name] = table #Store the table
         return table
 
+    def metrics(self):
+        """
+        Returns a snapshot of every table's bufferpool metrics and the memory budget usage:
+        {<table name>: {...}, ..., "budget": {"capacityBytes": ..., "usedBytes": ...}}
+        Compare two snapshots with lstore.metrics.diff(before, after).
+        """
+        snap = {name: table.metrics() for name, table in self.tables.items()}
+        snap["budget"] = {"capacityBytes": self.budget.capacityBytes, "usedBytes": self.budget.usedBytes}
+        return snap
+
     def drop_table(self, name):
         """
         Deletes the specified table
         """
         if name in self.tables: 
+            self.tables[name].stopMerger()
+            bufferPool = self.tables[name].bufferPool
+            bufferPool.close()
+            self.budget.unregister(bufferPool)
             del self.tables[name]
         else:
              raise Exception("Table not in database ")
@@ -105,11 +160,15 @@ class Database():
         """
         Returns table with the passed name
         """
+        if name in self.tables: #an open table: save and close it so its meta file is current
+            self._closeTable(self.tables.pop(name))
         numColumns = 0
         with open(f"{self.path}/{name}/{name}.meta", "r") as file:
             numColumns = int(file.readline().strip('\n'))
             key = int(file.readline())
-        table = self.create_table(name, numColumns, key)
+            line = file.readline()
+        schema = None if line.startswith("P-") or line == "Index\n" else line.strip('\n').split(',')
+        table = self.create_table(name, numColumns, key, schema)
         table.load()
         self.tables[name] = table
         return table 
\ No newline at end of file
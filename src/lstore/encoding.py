@@ -0,0 +1,164 @@
+import struct
+"""
+Documentation for the page encodings.
+Description:
+    Compressed on-disk encodings for full column pages. A page that is full when it is written to disk is
+    encoded with whichever of the encodings below gives the smallest payload (RAW if none of them helps).
+    Pages are always decoded back to plain cells (of the column's width) when they are loaded into the bufferpool, but
+    sumEncoded() can aggregate straight from an encoded payload without building the value array.
+
+Encodings:
+-----------------------------------------------------------------------------------------------------------------------
+    RAW (0): The data array as is (n little-endian cells of the column's width).
+    FOR (1): Frame of reference + bit-packing. Every value is stored as (value - base) in <width> bits.
+             Format: [base (int64), width (uint8), <packed offsets>]
+             Our grade columns (0-100) pack into 7 bits per value instead of 64.
+    DELTA (2): The first value followed by the bit-packed differences between neighbours (minus the smallest one).
+             Format: [first (int64), minDelta (int64), width (uint8), <packed (delta - minDelta)>]
+             Dense increasing keys (e.g., 906659671, 906659672, ...) have width 0, i.e. no packed data at all.
+    RLE (3): Runs of equal values. Format: [numRuns (uint32), (value (int64), length (uint32)) * numRuns]
+-----------------------------------------------------------------------------------------------------------------------
+"""
+
+RAW = 0
+FOR = 1
+DELTA = 2
+RLE = 3
+
+FOR_HEADER = struct.Struct('<qB')
+DELTA_HEADER = struct.Struct('<qqB')
+RLE_HEADER = struct.Struct('<I')
+RLE_RUN = struct.Struct('<qI')
+
+def pack(values, width):
+    """
+    Description: Bit-packs non-negative ints of at most <width> bits into bytes (little-endian, value 0 first).
+                 8 values take exactly <width> bytes, so they are packed a group of 8 at a time (small ints only).
+    """
+    chunks = []
+    for start in range(0, len(values), 8):
+        group = 0
+        for i, value in enumerate(values[start : start + 8]):
+            group |= value << (i * width)
+        chunks.append(group.to_bytes(width, 'little'))
+    return b''.join(chunks)[: (len(values) * width + 7) // 8]
+
+def unpack(raw, count, width):
+    """
+    Description: Yields <count> ints of <width> bits from bytes built by pack(), a group of 8 (<width> bytes) at a time.
+    """
+    if(width == 0):
+        yield from (0 for _ in range(count))
+        return
+    mask = (1 << width) - 1
+    for start in range(0, count, 8):
+        group = int.from_bytes(raw[start // 8 * width : (start // 8 + 1) * width], 'little')
+        for i in range(min(8, count - start)):
+            yield (group >> (i * width)) & mask
+
+def _encodeFOR(values):
+    base = min(values)
+    width = (max(values) - base).bit_length()
+    return FOR_HEADER.pack(base, width) + pack([value - base for value in values], width)
+
+def _encodeDelta(values):
+    deltas = [values[i] - values[i - 1] for i in range(1, len(values))]
+    minDelta = min(deltas) if deltas else 0
+    width = (max(deltas) - minDelta).bit_length() if deltas else 0
+    return DELTA_HEADER.pack(values[0], minDelta, width) + pack([delta - minDelta for delta in deltas], width)
+
+def _encodeRLE(values):
+    runs = []
+    start = 0
+    for i in range(1, len(values) + 1):
+        if(i == len(values) or values[i] != values[start]):
+            runs.append(RLE_RUN.pack(values[start], i - start))
+            start = i
+    return RLE_HEADER.pack(len(runs)) + b''.join(runs)
+
+def encode(values, width=8):
+    """
+    Description: Picks the smallest encoding for a page's values.
+    Inputs:
+        values (sequence): The cells of the page (e.g., Page.asArray()).
+        width (int): The cell width in bytes, i.e. the size of the RAW data array is len(values) * width.
+    Outputs:
+        (encoding, payload): payload is None for RAW, i.e. when no encoding is smaller than the raw cells.
+    """
+    values = list(values)
+    if(not values):
+        return RAW, None
+    best, payload = RAW, None
+    size = len(values) * width
+    for encoding, encoder in ((FOR, _encodeFOR), (DELTA, _encodeDelta), (RLE, _encodeRLE)):
+        candidate = encoder(values)
+        if(len(candidate) < size):
+            best, payload, size = encoding, candidate, len(candidate)
+    return best, payload
+
+def decode(encoding, payload, count):
+    """
+    Description: Decodes a payload built by encode() back into the list of <count> values.
+    """
+    if(encoding == FOR):
+        base, width = FOR_HEADER.unpack_from(payload, 0)
+        return [base + value for value in unpack(payload[FOR_HEADER.size:], count, width)]
+    if(encoding == DELTA):
+        value, minDelta, width = DELTA_HEADER.unpack_from(payload, 0)
+        values = [value]
+        for delta in unpack(payload[DELTA_HEADER.size:], count - 1, width):
+            value += delta + minDelta
+            values.append(value)
+        return values
+    if(encoding == RLE):
+        values = []
+        for value, length in _runs(payload):
+            values.extend([value] * length)
+        return values
+    raise ValueError(f"Unknown page encoding: {encoding}")
+
+def _runs(payload):
+    numRuns = RLE_HEADER.unpack_from(payload, 0)[0]
+    return RLE_RUN.iter_unpack(payload[RLE_HEADER.size : RLE_HEADER.size + numRuns * RLE_RUN.size])
+
+def sumEncoded(encoding, payload, count, slots=None):
+    """
+    Description: Sums values straight from an encoded payload without materializing the page's value array.
+    Inputs:
+        encoding (int), payload (bytes), count (int): As stored by the page.
+        slots (iterable): The slot numbers (offset // entrySize) to add up. None sums every value.
+    Outputs:
+        The sum (int).
+    """
+    if(slots is not None):
+        slots = set(slots)
+    if(encoding == FOR):
+        base, width = FOR_HEADER.unpack_from(payload, 0)
+        offsets = unpack(payload[FOR_HEADER.size:], count, width)
+        if(slots is None):
+            return count * base + sum(offsets)
+        return len(slots) * base + sum(value for i, value in enumerate(offsets) if i in slots)
+    if(encoding == DELTA):
+        first, minDelta, width = DELTA_HEADER.unpack_from(payload, 0)
+        if(slots is None):
+            #sum_i (first + d_1 + ... + d_i) = count*first + sum_j d_j*(count - j)
+            deltas = unpack(payload[DELTA_HEADER.size:], count - 1, width)
+            return count * first + sum((delta + minDelta) * (count - j) for j, delta in enumerate(deltas, 1))
+        total = first if 0 in slots else 0
+        value = first
+        for i, delta in enumerate(unpack(payload[DELTA_HEADER.size:], count - 1, width), 1):
+            value += delta + minDelta
+            if(i in slots):
+                total += value
+        return total
+    if(encoding == RLE):
+        total = 0
+        start = 0
+        for value, length in _runs(payload):
+            if(slots is None):
+                total += value * length
+            else:
+                total += value * sum(1 for i in slots if start <= i < start + length)
+            start += length
+        return total
+    raise ValueError(f"Unknown page encoding: {encoding}")
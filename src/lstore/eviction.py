@@ -0,0 +1,212 @@
+import heapq
+import itertools
+from collections import OrderedDict
+"""
+Documentation for the eviction policies.
+Description:
+    Replacement policies for the bufferpool. A policy only tracks page IDs: the bufferpool tells it when a page
+    enters memory (add), is used again (access) and leaves memory (remove), and asks it for one victim to write
+    out when the pool is full. victim() skips (but keeps tracking) the pages <canEvict> rejects, e.g. pinned ones.
+    The bufferpool serializes the calls with a lock, except access() on a policy with concurrentAccess set: those
+    run while other threads call victim(), so access() must be a single atomic operation (e.g., one dict store).
+
+Policies:
+-----------------------------------------------------------------------------------------------------------------------
+    LRU: Evicts the least recently used page. OrderedDict in recency order, O(1).
+    CLOCK: Second chance. Pages sit on a ring with a reference bit that access() sets; the hand clears set bits
+           and evicts the first page whose bit is already clear. O(1) amortized, access() is a single dict store.
+    LRU-K: Evicts the page whose K-th most recent access is the oldest (pages with fewer than K accesses first,
+           oldest first). Keeps a heap keyed by that time with lazy deletion, so victim() is O(log n) amortized.
+    ARC: Adaptive replacement cache. Balances a recency list (T1) and a frequency list (T2) using ghost lists of
+         recently evicted IDs (B1/B2) to adapt the target size of T1. O(1).
+-----------------------------------------------------------------------------------------------------------------------
+"""
+
+class EvictionPolicy:
+    """
+    Description: The interface every policy implements. <capacity> is the number of pages the pool holds.
+    """
+    concurrentAccess = False
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+
+    def add(self, PID):
+        """A page was created or loaded into memory."""
+        raise NotImplementedError
+
+    def access(self, PID):
+        """A page that is in memory was used."""
+        raise NotImplementedError
+
+    def remove(self, PID):
+        """A page left memory (evicted or deleted)."""
+        raise NotImplementedError
+
+    def victim(self, canEvict=None):
+        """
+        Description: Picks the page to evict next (the caller evicts it and then calls remove()).
+        Inputs:
+            canEvict (callable): PID -> bool. Pages it rejects are skipped. None accepts every page.
+        Outputs:
+            The PID of the victim, or None if no page can be evicted.
+        """
+        raise NotImplementedError
+
+class LRUPolicy(EvictionPolicy):
+
+    def __init__(self, capacity):
+        super().__init__(capacity)
+        self.pages = OrderedDict() #least recently used first
+
+    def add(self, PID):
+        self.pages[PID] = None
+
+    def access(self, PID):
+        self.pages.move_to_end(PID)
+
+    def remove(self, PID):
+        self.pages.pop(PID, None)
+
+    def victim(self, canEvict=None):
+        for PID in self.pages:
+            if(canEvict is None or canEvict(PID)):
+                return PID
+        return None
+
+class ClockPolicy(EvictionPolicy):
+
+    concurrentAccess = True #access() only sets the reference bit of a page that is already on the ring
+
+    def __init__(self, capacity):
+        super().__init__(capacity)
+        self.ring = OrderedDict() #PID -> reference bit. The front of the ring is under the hand.
+
+    def add(self, PID):
+        self.ring[PID] = True
+
+    def access(self, PID):
+        self.ring[PID] = True
+
+    def remove(self, PID):
+        self.ring.pop(PID, None)
+
+    def victim(self, canEvict=None):
+        #two sweeps: the first one may only clear reference bits
+        for _ in range(2 * len(self.ring)):
+            PID, referenced = next(iter(self.ring.items()))
+            self.ring.move_to_end(PID) #advance the hand
+            if(referenced):
+                self.ring[PID] = False
+            elif(canEvict is None or canEvict(PID)):
+                return PID
+        return None
+
+class LRUKPolicy(EvictionPolicy):
+
+    def __init__(self, capacity, k=2):
+        super().__init__(capacity)
+        self.k = k
+        self.clock = itertools.count()
+        self.history = {} #PID -> its last k access times (oldest first)
+        self.heap = [] #(k-th most recent access time or -1, last access time, PID). Stale entries are skipped.
+
+    def _push(self, PID):
+        history = self.history[PID]
+        key = history[0] if(len(history) == self.k) else -1
+        heapq.heappush(self.heap, (key, history[-1], PID))
+        if(len(self.heap) > 4 * len(self.history) + 64): #drop stale entries so the heap stays O(pages)
+            self.heap = [entry for entry in self.heap if self._current(entry)]
+            heapq.heapify(self.heap)
+
+    def _current(self, entry):
+        history = self.history.get(entry[2])
+        return history is not None and history[-1] == entry[1]
+
+    def add(self, PID):
+        self.history[PID] = [next(self.clock)]
+        self._push(PID)
+
+    def access(self, PID):
+        history = self.history[PID]
+        history.append(next(self.clock))
+        if(len(history) > self.k):
+            del history[0]
+        self._push(PID)
+
+    def remove(self, PID):
+        self.history.pop(PID, None)
+
+    def victim(self, canEvict=None):
+        skipped = []
+        ret = None
+        while(self.heap):
+            entry = heapq.heappop(self.heap)
+            if(not self._current(entry)):
+                continue
+            skipped.append(entry)
+            if(canEvict is None or canEvict(entry[2])):
+                ret = entry[2]
+                break
+        for entry in skipped: #the victim's entry goes back too; remove() makes it stale
+            heapq.heappush(self.heap, entry)
+        return ret
+
+class ARCPolicy(EvictionPolicy):
+
+    def __init__(self, capacity):
+        super().__init__(capacity)
+        self.p = 0 #target size of T1
+        self.t1 = OrderedDict() #resident, seen once recently
+        self.t2 = OrderedDict() #resident, seen at least twice
+        self.b1 = OrderedDict() #ghosts evicted from T1
+        self.b2 = OrderedDict() #ghosts evicted from T2
+
+    def add(self, PID):
+        if(PID in self.b1): #T1 was too small
+            self.p = min(self.capacity, self.p + max(1, len(self.b2) // max(1, len(self.b1))))
+            del self.b1[PID]
+            self.t2[PID] = None
+        elif(PID in self.b2): #T2 was too small
+            self.p = max(0, self.p - max(1, len(self.b1) // max(1, len(self.b2))))
+            del self.b2[PID]
+            self.t2[PID] = None
+        else:
+            self.t1[PID] = None
+        for ghosts in (self.b1, self.b2):
+            while(len(ghosts) > self.capacity):
+                ghosts.popitem(last=False)
+
+    def access(self, PID):
+        if(PID in self.t1):
+            del self.t1[PID]
+            self.t2[PID] = None
+        else:
+            self.t2.move_to_end(PID)
+
+    def remove(self, PID):
+        if(PID in self.t1):
+            del self.t1[PID]
+            self.b1[PID] = None
+        elif(PID in self.t2):
+            del self.t2[PID]
+            self.b2[PID] = None
+
+    def victim(self, canEvict=None):
+        lists = (self.t1, self.t2) if(self.t1 and len(self.t1) > self.p) else (self.t2, self.t1)
+        for pages in lists:
+            for PID in pages:
+                if(canEvict is None or canEvict(PID)):
+                    return PID
+        return None
+
+POLICIES = {"LRU": LRUPolicy, "CLOCK": ClockPolicy, "LRU-K": LRUKPolicy, "ARC": ARCPolicy}
+
+def makePolicy(name, capacity):
+    """
+    Description: Builds the eviction policy called <name> (see POLICIES) for a pool of <capacity> pages.
+    """
+    if(name not in POLICIES):
+        err = f"ERROR: Unknown eviction policy: {name}. Expected one of: {', '.join(POLICIES)}."
+        raise TypeError(err)
+    return POLICIES[name](capacity)
@@ -0,0 +1,45 @@
+import logging
+import threading
+
+from lstore.setupLogging import *
+"""
+Documentation for the background flusher.
+Description:
+    A write-behind thread for one bufferpool. Every <interval> seconds it writes out up to rate*interval dirty,
+    unpinned pages (see BufferPool.flushDirty), so by the time eviction picks a victim it is usually clean and can
+    be dropped without a write, and closing the database has little left to flush. Pages are written grouped by
+    column; in segment mode each column's batch is one msync per run of adjacent frames.
+"""
+
+class BackgroundFlusher(threading.Thread):
+
+    log = setupLogger(False, LOG_LEVEL, logging.getLogger("BackgroundFlusher"), 8)
+
+    def __init__(self, bufferPool, rate=200, interval=0.1):
+        """
+        Inputs:
+            bufferPool (BufferPool): The pool to flush.
+            rate (int): The maximum number of pages written per second.
+            interval (float): Seconds between flushes.
+        """
+        super().__init__(name="BackgroundFlusher", daemon=True)
+        self.bufferPool = bufferPool
+        self.interval = interval
+        self.batchSize = max(1, int(rate * interval))
+        self.stopEvent = threading.Event()
+        self.pagesFlushed = 0
+
+    def run(self):
+        while(not self.stopEvent.wait(self.interval)):
+            try:
+                self.pagesFlushed += self.bufferPool.flushDirty(self.batchSize)
+            except Exception as e:
+                self.log.error("ERROR: An exception occured while flushing: %s", e)
+
+    def stop(self):
+        """
+        Description: Stops the thread after its current batch and waits for it.
+        """
+        self.stopEvent.set()
+        if(self.is_alive()):
+            self.join()
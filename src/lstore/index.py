@@ -13,15 +13,15 @@ Notes:
 
 Indexes:
 -----------------------------------------------------------------------------------------------------------------------
-    Index (PKL): Primary Keys -> Physical Locations (records)
-    Description: This index maps primary keys to the physical locations in the page where the data is stored.
-                 Takes the form of a dictionary of lists where the key is the PK and the value is the record in tuple format.
-                 Tuple format: (col_1, col_2, ..., col_|columns|), where each column (e.g., col_1) is represented by a tuple (<PID>, <idx>).
-                 <PID> is ID of the specific page where the data is stored, <idx> is the index of the data in the data array
-                 The list is in sorted format: [br, tr, tr, tr, .., latest_tr]
+    Index (PKL): Primary Keys -> Record IDs
+    Description: This index maps primary keys to the RID of their base record. The table computes the page and slot of
+                 each of the record's cells from the RID (see Table.baseLocation) and finds its other versions through
+                 the record's indirection column, so one int per record is all the index keeps.
+                 Tables saved before RIDs stored a list of record tuples per key: [((<PID>, <idx>), ...), ...].
+                 load() still reads that format and Table converts it.
     Format:
     {
-        <primary key> : [((<PID>, <idx>), (<PID>, <idx>), ...), ... ]
+        <primary key> : <RID>
     }
 -----------------------------------------------------------------------------------------------------------------------    Index (Bufferpool):
 
@@ -66,33 +66,30 @@ class Index:
         self.vk_index = [{}] * numColumns 
         self.table = table
 
-    def create_index(self, keyIndex):
-        self.table.key = keyIndex
+    def create_index(self, column):
+        """
+        Description: Secondary indexes aren't kept: selects on a non-key column scan it (pages are skipped with their
+                     zone maps). The primary key column stays the same.
+        """
+        pass
     
     def __repr__(self):
         """
         Format:
         PKL
         {
-            <primary key> : [((<PID>, <idx>), (<PID>, <idx>), ...), ... ]
+            <primary key> : <RID>
         }
 
         pkl Rep:
-        pk:PID-idx#PID-idx#PID-idx|PID-idx#PID-idx#PID-idx,pk:...\n
+        pk:RID,pk:RID,...\n
 
         VK:
          <value>:<version>#<key>#<key>#...#<key>|<version>...,<value>...@<value>.....\n"
 
         """
         #Step-01: Build the PKL string representation
-        pkl = []
-        for key in self.pkl_index: #key -> [rec, rec, rec] | rec -> (c1, c2, ...) | c -> (PID, idx)
-            records = [] #[rec, rec, red, ...]
-            for record in self.pkl_index[key]:
-                record = '#'.join([f"{page[0]}-{page[1]}" for page in record])
-                records.append(record)
-            pkl.append(f"{key}:{'|'.join(records)}")
-        pkl = ','.join(pkl)
+        pkl = ','.join([f"{key}:{RID}" for key, RID in self.pkl_index.items()])
 
         #Step-02: Build vkl
         vk = []
@@ -113,7 +110,8 @@ class Index:
         """
         Format:
         pkl Rep:
-        pk:PID-idx#PID-idx#PID-idx|PID-idx#PID-idx#PID-idx,pk:...\n
+        pk:RID,pk:...\n
+        (before RIDs: pk:PID-idx#PID-idx#PID-idx|PID-idx#PID-idx#PID-idx,pk:...\n)
 
         VK:
          <value>:<version>#<key>#<key>#...#<key>|<version>...,<value>...@<value>.....\n"
@@ -121,7 +119,12 @@ class Index:
         
 
         #Step-01: Build pkl index from string rep
-        pklRep = pklRep[:-1].split(',') #  [pk:PID-idx#PID-idx#PID-idx|PID-idx#PID-idx#PID-idx, pk:...]
+        pklRep = pklRep[:-1].split(',') #  [pk:RID, pk:...]
+        if "P-" not in pklRep[0]:
+            for pkRep in filter(None, pklRep):
+                key, RID = pkRep.split(':')
+                self.pkl_index[int(key)] = int(RID)
+            return
         for pkRep in pklRep: # pkRep -> pk:PID-idx#PID-idx#PID-idx|PID-idx#PID-idx#PID-idx
             pkRep = pkRep.split(':') #pkRep -> [pk, PID-idx#PID-idx#PID-idx|PID-idx#PID-idx#PID-idx]
             key = int(pkRep[0])
@@ -153,11 +156,11 @@ class Index:
         #             column[int(verRep[0])] = verRep[1:]
         #     self.vk_index.append(column)
         
-    def getLoc(self, primaryKey, recordIdx):
-        return self.pkl_index[primaryKey][recordIdx]
+    def getLoc(self, primaryKey):
+        return self.pkl_index[primaryKey]
     
-    def setLoc(self, key, recordIdx, record):
-        self.pkl_index[key].insert(record, recordIdx)
+    def setLoc(self, key, RID):
+        self.pkl_index[key] = RID
 
     def getIndexByValue(self, colIndx, value, version):
         if(value in self.vk_index[colIndx]):
@@ -0,0 +1,124 @@
+import threading
+"""
+Documentation for the page latches.
+Description:
+    Short-term read/write latches that protect the contents of a buffer frame, as opposed to the transaction
+    level record locks in RWLocking.py. Any number of threads may hold a latch shared; exclusive holders wait
+    for them to drain and keep new readers out. Latches are not reentrant and are only held for the length of
+    one page operation.
+
+    Each Page has one (page.latch) and the bufferpool's locks are partitioned by page ID, so threads that work
+    on different pages never wait for each other. The lock order is:
+        MemoryBudget.lock -> BufferPool partition lock -> Page latch -> BufferPool directory/policy locks
+    Usage:
+        with page.latch.exclusive:
+            index = page.write(value)
+
+    Epochs is for things that are replaced while readers may still use them (e.g., the pages a merge supersedes):
+    the replaced item is retired and only freed once every reader that could have seen it has left.
+"""
+
+class _Hold:
+    """
+    Description: The context manager of one latch mode (see Latch.shared and Latch.exclusive).
+    """
+    __slots__ = ("acquire", "release")
+
+    def __init__(self, acquire, release):
+        self.acquire = acquire
+        self.release = release
+
+    def __enter__(self):
+        self.acquire()
+
+    def __exit__(self, *exc):
+        self.release()
+        return False
+
+class Latch:
+
+    __slots__ = ("mutex", "drained", "readers", "shared", "exclusive")
+
+    def __init__(self):
+        """
+        Internal Objects:
+            mutex (Lock): Held by the exclusive holder for as long as it holds the latch, and briefly by readers
+                          to update <readers>. So taking the latch exclusive when nobody reads is one lock acquire.
+            drained (Condition): Signalled when the last reader leaves. A writer waits on it (releasing the mutex)
+                                 until the readers that were already in have left.
+            readers (int): The number of shared holders.
+            shared / exclusive: Context managers that hold the latch in that mode.
+        """
+        self.mutex = threading.Lock()
+        self.drained = threading.Condition(self.mutex)
+        self.readers = 0
+        self.shared = _Hold(self.acquireShared, self.releaseShared)
+        self.exclusive = _Hold(self.acquireExclusive, self.releaseExclusive)
+
+    def acquireShared(self):
+        with self.mutex: #waits for the exclusive holder to leave
+            self.readers += 1
+
+    def releaseShared(self):
+        with self.mutex:
+            self.readers -= 1
+            if(self.readers == 0):
+                self.drained.notify_all()
+
+    def acquireExclusive(self):
+        self.mutex.acquire()
+        while(self.readers):
+            self.drained.wait()
+
+    def releaseExclusive(self):
+        self.mutex.release()
+
+class Epochs:
+
+    __slots__ = ("mutex", "current", "readers", "retired")
+
+    def __init__(self):
+        """
+        Description: Epoch based reclamation. A reader enter()s the current epoch before it looks up something a
+                     writer may replace and exit()s it when it's done with it. The writer swaps the new version in,
+                     retire()s the old one (which starts a new epoch) and frees it once reclaimable() returns it,
+                     i.e., once no reader of the epoch it was retired in, or an older one, is left.
+        Internal Objects:
+            mutex (Lock): Guards everything below.
+            current (int): The epoch readers enter.
+            readers (dict): epoch -> the number of readers in it. Only epochs with readers (and the current one).
+            retired (list): (epoch, item) of the items retired in that epoch.
+        """
+        self.mutex = threading.Lock()
+        self.current = 0
+        self.readers = {0: 0}
+        self.retired = []
+
+    def enter(self):
+        with self.mutex:
+            self.readers[self.current] += 1
+            return self.current
+
+    def exit(self, epoch):
+        with self.mutex:
+            self.readers[epoch] -= 1
+            if(self.readers[epoch] == 0 and epoch != self.current):
+                del self.readers[epoch]
+
+    def retire(self, items):
+        with self.mutex:
+            self.retired.extend((self.current, item) for item in items)
+            if(self.readers[self.current] == 0):
+                del self.readers[self.current]
+            self.current += 1
+            self.readers[self.current] = 0
+
+    def reclaimable(self):
+        """
+        Description: Returns the retired items no reader can still be using (and forgets them).
+        """
+        with self.mutex:
+            oldest = min(self.readers)
+            ready = [item for epoch, item in self.retired if epoch < oldest]
+            self.retired = [(epoch, item) for epoch, item in self.retired if epoch >= oldest]
+            return ready
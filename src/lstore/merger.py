@@ -0,0 +1,46 @@
+import logging
+import threading
+
+from lstore.setupLogging import *
+"""
+Documentation for the background merge.
+Description:
+    A thread that merges one table's tail records into new versions of its base pages (see Table.merge) every
+    <interval> seconds. Reads of the latest version stop following a record's indirection at the first merged tail
+    record, so however often a record is updated its read cost only depends on the updates since the last merge.
+    After each merge it vacuums the table (see Table.vacuum): the cells and pages of the records deleted since are
+    reclaimed here, so delete() only has to leave a tombstone.
+"""
+
+class BackgroundMerger(threading.Thread):
+
+    log = setupLogger(False, LOG_LEVEL, logging.getLogger("BackgroundMerger"), 8)
+
+    def __init__(self, table, interval=1.0):
+        """
+        Inputs:
+            table (Table): The table to merge.
+            interval (float): Seconds between merges.
+        """
+        super().__init__(name="BackgroundMerger", daemon=True)
+        self.table = table
+        self.interval = interval
+        self.stopEvent = threading.Event()
+        self.recordsMerged = 0
+        self.recordsVacuumed = 0
+
+    def run(self):
+        while(not self.stopEvent.wait(self.interval)):
+            try:
+                self.recordsMerged += self.table.merge()
+                self.recordsVacuumed += self.table.vacuum()
+            except Exception as e:
+                self.log.error("ERROR: An exception occured while merging: %s", e)
+
+    def stop(self):
+        """
+        Description: Stops the thread after its current merge and waits for it.
+        """
+        self.stopEvent.set()
+        if(self.is_alive()):
+            self.join()
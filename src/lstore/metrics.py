@@ -0,0 +1,90 @@
+"""
+Documentation for the bufferpool metrics.
+Description:
+    Counters and latency histograms kept by every BufferPool. Updating them is a list/attribute increment, so they
+    are always on. Read them with snapshot() (a plain dict that doesn't change afterwards) and compare two snapshots
+    with diff(), e.g.:
+        before = table.metrics()
+        ... run a workload ...
+        print(metrics.diff(before, table.metrics()))
+    The counters aren't latched, so with several threads using a pool at once they are close but not exact.
+
+Counters:
+-----------------------------------------------------------------------------------------------------------------------
+    hits / misses (list): getPage calls per column that found the page in memory / had to go to disk.
+    loads: Pages read into memory. evictions: Pages written out (if dirty) and dropped to make room.
+    flushes: Dirty pages written to disk (evictions, background flusher and saves). prefetches: Prefetch reads issued.
+    ringReuses: Frames a scan ring took back from its own oldest page (see BufferRing) instead of evicting.
+    bytesRead / bytesWritten: Page file (or segment frame) bytes read and written.
+    loadTime / saveTime: Seconds spent in loadPage / savePage.
+    loadLatency / saveLatency (list): Histograms of loadPage / savePage latency. Bucket i counts calls that took
+                                      less than 2**i microseconds (and at least 2**(i-1)); the last bucket is open.
+-----------------------------------------------------------------------------------------------------------------------
+"""
+
+LATENCY_BUCKETS = 24 #the last bucket holds everything from 2**22 us (~4 s) up
+
+def latencyBucket(seconds):
+    """
+    Description: Returns the histogram bucket of a duration: the bit length of its length in microseconds.
+    """
+    return min(int(seconds * 1e6).bit_length(), LATENCY_BUCKETS - 1)
+
+class BufferPoolMetrics:
+
+    COUNTERS = ("loads", "evictions", "flushes", "prefetches", "ringReuses", "bytesRead", "bytesWritten", "loadTime", "saveTime")
+
+    def __init__(self, numColumns):
+        self.hits = [0]*numColumns
+        self.misses = [0]*numColumns
+        self.loadLatency = [0]*LATENCY_BUCKETS
+        self.saveLatency = [0]*LATENCY_BUCKETS
+        for name in self.COUNTERS:
+            setattr(self, name, 0)
+
+    def recordLoad(self, seconds, nbytes):
+        self.loads += 1
+        self.bytesRead += nbytes
+        self.loadTime += seconds
+        self.loadLatency[latencyBucket(seconds)] += 1
+
+    def recordSave(self, seconds, nbytes):
+        self.flushes += 1
+        self.bytesWritten += nbytes
+        self.saveTime += seconds
+        self.saveLatency[latencyBucket(seconds)] += 1
+
+    def snapshot(self):
+        """
+        Description: Returns a copy of every counter and histogram as a dict (plus the total hit ratio).
+        """
+        snap = {name: getattr(self, name) for name in self.COUNTERS}
+        for name in ("hits", "misses", "loadLatency", "saveLatency"):
+            snap[name] = list(getattr(self, name))
+        accesses = sum(self.hits) + sum(self.misses)
+        snap["hitRatio"] = sum(self.hits) / accesses if(accesses) else 0.0
+        return snap
+
+def diff(before, after):
+    """
+    Description: Returns what happened between two snapshots: after - before for every counter and histogram
+                 bucket (recursively for dicts of snapshots, e.g., Database.metrics()). hitRatio is recomputed.
+    """
+    result = {}
+    for name, value in after.items():
+        old = before.get(name)
+        if(isinstance(value, dict)):
+            result[name] = diff(old or {}, value)
+        elif(isinstance(value, list)):
+            old = old or [0]*len(value)
+            result[name] = [new - prev for new, prev in zip(value, old)]
+        elif(name == "hitRatio"):
+            continue
+        elif(isinstance(value, (int, float))):
+            result[name] = value - (old or 0)
+        else:
+            result[name] = value
+    if("hits" in result and "misses" in result):
+        accesses = sum(result["hits"]) + sum(result["misses"])
+        result["hitRatio"] = sum(result["hits"]) / accesses if(accesses) else 0.0
+    return result
@@ -1,8 +1,13 @@
 import time
 import os
+import sys
+import array
+import struct
 import logging
 
 from lstore.setupLogging import *
+from lstore import encoding
+from lstore.latch import Latch
 """
 Documentation for the page class.
 Author: Jared Hall jhall10@uoregon.edu
@@ -18,49 +23,144 @@ Modifications:
        ii. I added methods to read from and write to a file as well as a method for pages to 
            automatically do so.
        iii. All data stored in the page has a fixed chunck size of 8 bytes
+    ~ M3 ~
+    1. Values are now stored as native little-endian int64 cells instead of '-' padded strings.
+       read() returns an int directly so callers no longer have to decode/strip/parse every cell,
+       and 9+ digit values no longer grow the data array. convertLegacyPage() rewrites .bin files
+       that were saved in the old string format (Table.load runs it on m2 tables automatically).
+    2. Added asArray() which exposes the whole data array as int64 values without slicing a new bytes object
+       per cell. Scans (e.g., Query.sum) should use it (or readMany()) instead of read().
+    3. Replaced the availableOffsets list with an occupancy bitmap (self.slots, bit i set <=> slot i is in use).
+       Allocation takes the lowest free slot, remove() clears a bit and hasCapacity() is a popcount.
+    4. A page is now stored as one self-describing file, <pid>.page, instead of <pid>-{full,partial}.bin + .offsets.
+       The file is the page's frame buffer verbatim: a fixed header (see PAGE_HEADER) followed by the data array.
+       Header: magic, format version, entry size, page number, column index, capacity, record count, slot bitmap.
+       Loading is a single readinto() of the frame and saving is a single write(). Whether a page is full is read
+       from its bitmap, so filling a page no longer renames anything on disk.
+    5. Pages can instead be backed by a ColumnSegment (see segment.py): the frame is then a view of an mmap'ed
+       per-column segment file, load() only parses the header and save() flushes the frame.
+    6. The logger is shared by all pages (class attribute) and the per-cell methods (read/write/remove/setDirty)
+       no longer log at all. Other log calls use lazy %-formatting so nothing is formatted unless it's emitted.
+    7. Full pages can be saved compressed (save(encode=True), see encoding.py). The header records the encoding and
+       payload length, load() decodes the payload back into the data array and sumPageFile() can aggregate an
+       encoded page straight from disk without loading it.
+    8. Pages keep a zone map: the min and max value ever written (minValue/maxValue) and the live record count
+       (numRecords()). It is maintained by write()/remove() and saved in the header, so the bufferpool can rule a
+       page out for a range predicate (mayContain()) from its header alone. remove() leaves the bounds as they
+       are (they stay correct, just looser) and they are reset once the page is empty.
+    9. The cell width now follows the table schema (see COLUMN_TYPES): a page stores int8, int16, int32 or int64
+       cells and <size> is the width in bytes. The capacity of a page stays the same, so a page of an int8 column
+       holds 8x the records of an int64 page. Writing a value that doesn't fit the column type raises struct.error.
+    10. Added readMany(), a batch version of read(). Batches of writes go through writeRun() (see 18).
+    11. Pages are pinned while they are in use (pinCount). BufferPool.getPage returns the page pinned and the page is
+        a context manager that unpins it on exit (with bufferPool.getPage(PID) as page: ...). The bufferpool never
+        evicts a page with pinCount > 0.
+    12. load() and sumPageFile() accept the raw bytes of the page file (<raw>) so a page can be read ahead of time
+        on an I/O thread (BufferPool.prefetch) and only parsed on the caller's thread.
+    13. load()/save() record the number of bytes they read/wrote in ioBytes (for the bufferpool metrics).
+    14. A new page only exists in memory until it is first saved, so delete() of a page that was never written
+        to disk is not an error.
+    15. Every page has a read/write latch (self.latch, see latch.py) so bufferpool threads can share it. Writers
+        (write/writeAt/writeRun/remove) must hold it exclusive, save() takes it shared so the image it writes is
+        consistent, and pin()/unpin() are a single list append/pop so they need no lock. Reading a single committed
+        cell needs no latch: writers only fill free slots and one unpack_from can't see half a cell.
+    16. Added writeAt() which writes a given slot instead of the lowest free one. Tail pages are addressed by tail
+        record ID (the caller owns the slots) and record metadata (e.g., the indirection column) is updated in place.
+    17. Added copyFrom() which copies another page's cells, bitmap and zone map. The merge builds the new version of
+        a base page from a copy of the current one (see Table.merge).
+    18. Added writeRun(), the batch version of writeAt(): one pack_into for a run of consecutive slots (bulk inserts
+        fill a page per call, see Table.insert_many).
+    19. Added isSet() which tells whether a slot holds a value. The merge reads tail records by position and skips
+        the ones the vacuum removed (see Table.merge).
 """
+
+#Bytes of data in a page (the bufferpool creates every page with this capacity).
+PAGE_CAPACITY = 4096
+
+#An int64 cell: little-endian signed 64-bit integer (the default column type and the only one m2 pages had).
+CELL = struct.Struct('<q')
+
+#Column types a table schema can declare -> struct format code of their cells. The cell width is the page's entrySize.
+COLUMN_TYPES = {'int8': 'b', 'int16': 'h', 'int32': 'i', 'int64': 'q'}
+CELL_FORMATS = {struct.calcsize(code): code for code in COLUMN_TYPES.values()}
+
+def columnWidth(columnType):
+    """
+    Description: Returns the cell width (bytes) of a schema column type, e.g., columnWidth('int8') -> 1.
+    """
+    if(columnType not in COLUMN_TYPES):
+        err = f"ERROR: Unknown column type: {columnType}. Expected one of: {', '.join(COLUMN_TYPES)}."
+        raise TypeError(err)
+    return struct.calcsize(COLUMN_TYPES[columnType])
+
+def columnRange(columnType):
+    """
+    Description: Returns the (lowest, highest) value a cell of a schema column type holds, e.g., (-128, 127) for 'int8'.
+    """
+    bits = 8 * columnWidth(columnType)
+    return (-(1 << (bits - 1)), (1 << (bits - 1)) - 1)
+
+#Fixed part of the page header: magic, version, entrySize, page number, columnIdx, capacity, record count,
+#encoding, payload length (bytes stored after the header), min value and max value (the zone map).
+#It is followed by the slot bitmap (maxEntries/8 bytes) and padded to a multiple of HEADER_ALIGN.
+PAGE_HEADER = struct.Struct('<4sHHqiIIBIqq')
+PAGE_MAGIC = b'LSPG'
+PAGE_VERSION = 3
+HEADER_ALIGN = 64
+
+def headerSize(capacity, size):
+    """
+    Description: Returns the number of bytes that precede the data array in a page frame/file.
+    """
+    raw = PAGE_HEADER.size + (capacity//size + 7)//8
+    return -(-raw // HEADER_ALIGN) * HEADER_ALIGN
 class Page:
 
-    def __init__(self, pid, path, capacity=4096, size=8):
+    #One logger for every page, configured once at import. Creating a page never touches logging.
+    log = setupLogger(False, LOG_LEVEL, logging.getLogger("Page"), 12)
+
+    def __init__(self, pid, path, capacity=PAGE_CAPACITY, size=8, columnIdx=0, segment=None):
         """
         Description: The physical page of our columnar storage. A page contains a single column of data.
         Notes: pid's must be unique since it is both an identifier for the page and it's data file.
-               e.g., (page 1)->self.pageID <- "P-106" <- saved in file: "P-106.data"
-               The Pags' local index is also saved into a file. File (prev example): "P-106.index"
+               e.g., (page 1)->self.pageID <- "P-106" <- saved in file: "P-106.page"
 
         Inputs: 
             pid (str): A unique numerical intentifier for this page. Format: "P-<int>"
             capacity (int): A numerical value which determines the size of the storage unit.
-            size (int): A numerical value containing the fixed length of all data to be inserted into the column.
+            size (int): The cell width in bytes (1, 2, 4 or 8: int8, int16, int32 or int64 cells, see COLUMN_TYPES).
+            columnIdx (int): The table column this page stores. Saved in the page header.
+            segment (ColumnSegment): If given, the page's frame lives in this segment's mapping instead of its own file.
 
         Outputs:
             Page Object
         
         Internal Objects:
             pageIndex (dict): A dictionary containing a page-wise index of values with their absolute version
-            rIndex (list): A list of open data indexes
-            dTail (int): The last open position in the data array
-            rTail (int): the last open position in the rIndex array
-            data (ByteArray): The actual data of the column in bytes
+            slots (int): Occupancy bitmap of the data array. Bit i is set if the entry at offset i*entrySize is in use.
+            frame (ByteArray): The page header followed by the data array. This is exactly what is stored on disk.
+            data (memoryview): The actual data of the column in bytes (a view of frame past the header)
             maxEntries (int): The maximum number of entries (max = capacity//entrySize)
             entrySize (int): The fixed size of each entry.
-            pin (int): A variable that contains the number of active transactions on this page.   
+            cellFormat (str): The struct/memoryview format code of the cells ('b', 'h', 'i' or 'q').
+            cell (Struct): Packs/unpacks a single cell (little-endian).
+            pins (list): One entry per caller currently using this page (pinCount). A pinned page is never evicted.
+            latch (Latch): The frame's read/write latch. Held exclusive by writers, shared by save().
+            ioBytes (int): The number of bytes the last load()/save() read/wrote (0 for a segment page's load).
             pageIndex (dict): A dictionary version based value-key 2nd level Index (m1: Bonus)
             
-            rIndex (list): A list of open indecees in the data array (m2 Bonus: efficient compactless storage).
+            slots (int): Replaces the m2 rIndex list of open indecees (m2 Bonus: efficient compactless storage).
             Format:
-                            [idx_1, idx_2, ..., idx_k]
+                            0b<slot_k>...<slot_1><slot_0>
+            minValue/maxValue (int): Zone map. Bounds of every value written to the page (None while it is empty).
             LFU (float): (m2 Bonus: Eviction Policy) This variable contains a measurement of the "rate of use" that a page sees.
                          The rate of use is calculated by taking the number of times a page has been read from or written to
                          in a fixed cycle and dividing this by a fixed time window.  
         """
-        self.log = logging.getLogger(self.__class__.__name__)
-        self.log = setupLogger(False, "DEBUG", self.log, 12)
-
-        self.log.debug(f"Params | pid: {pid} - path: {path} - capacity: {capacity} - size: {size}")
-
         self.LFU = 0
-        self.pin = -1
+        self.pins = []
+        self.latch = Latch()
+        self.ioBytes = 0
         self.isDirty = False
 
         self.startTime = time.time()
@@ -68,10 +168,20 @@ class Page:
 
         self.capacity = 0
         self.entrySize = size
+        self.columnIdx = columnIdx
         self.path = path
+        self.segment = segment
+        self.frame = None
         self.data = None
-        self.availableOffsets = None
+        self.slots = 0
+        self.minValue = None
+        self.maxValue = None
 
+        if(size not in CELL_FORMATS):
+            err = f"ERROR: Parameter <size> must be one of the cell widths: {sorted(CELL_FORMATS)}."
+            raise TypeError(err)
+        self.cellFormat = CELL_FORMATS[size]
+        self.cell = struct.Struct('<' + self.cellFormat)
         
         if(type(pid) != type("str") or "P-" not in pid):
             err = "ERROR: Parameter <pid> must be a string in the format P-<int>."
@@ -80,24 +190,42 @@ class Page:
             self.pageID = pid
             
         if(type(capacity) == type(1) and capacity > 0):
-            self.data = bytearray(capacity)
+            self.headerSize = headerSize(capacity, size)
+            if(segment is not None):
+                self.frame = segment.frame(pid)
+            else:
+                self.frame = bytearray(self.headerSize + capacity)
+            self.data = memoryview(self.frame)[self.headerSize:]
             self.capacity = capacity
-            self.availableOffsets = [x for x in range(capacity-size, -size, -size)]
             self.maxEntries = capacity//size
+            self.fullMask = (1 << self.maxEntries) - 1
         else:
             err = "ERROR: Parameter <capacity> must be a non-zero integer."
             raise TypeError(err)
-        
-        self.log.debug(f"Initial offset array length: {len(self.availableOffsets)} - Array: \n{self.availableOffsets}\n")
-        self.log.debug(f"Page created!")
     
+    @property
+    def pinCount(self):
+        return len(self.pins)
+
+    def pin(self):
+        self.pins.append(None) #append/pop are atomic, unlike += on an int
+        return self
+
+    def unpin(self):
+        self.pins.pop()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.unpin()
+        return False
+
     def setDirty(self):
         self.isDirty = True
-        self.log.debug(f"Page {self.pageID} set to 'dirty'!")
     
     def setClean(self):
         self.isDirty = False
-        self.log.debug(f"Page {self.pageID} set to 'clean'!")
 
     def hasCapacity(self):
         """
@@ -107,144 +235,268 @@ class Page:
         Ouputs:
             Boolean: <True> if there is enough space, else <False>
         """
-        self.log.debug(f"Checking capacity. Number of available slots: {len(self.availableOffsets)} - conditional: {True if(len(self.availableOffsets) > 0) else False}")
-        return True if(len(self.availableOffsets) > 0) else False
+        return self.slots.bit_count() < self.maxEntries
+
+    def numRecords(self):
+        """
+        Description: Returns the number of slots currently in use.
+        """
+        return self.slots.bit_count()
+
+    def mayContain(self, low, high):
+        """
+        Description: Zone map check. False if no live value of this page can be in [low, high].
+        """
+        return self.slots != 0 and self.minValue <= high and low <= self.maxValue
     
-    def save(self, suffix):
+    def filename(self):
+        return self.segment.filename if(self.segment is not None) else f"{self.path}{self.pageID}.page"
+
+    def packHeader(self, pageEncoding=encoding.RAW, payloadLength=None):
         """
-        Description: This method saves the page data and it's available offsets to disk.
-        Inputs: 
-            suffix (str): '-full' or '-partial'
+        Description: Writes the page header (including the slot bitmap) into the start of the frame.
+        """
+        payloadLength = self.capacity if(payloadLength is None) else payloadLength
+        records = self.slots.bit_count()
+        PAGE_HEADER.pack_into(self.frame, 0, PAGE_MAGIC, PAGE_VERSION, self.entrySize, int(self.pageID[2:]),
+                              self.columnIdx, self.capacity, records, pageEncoding, payloadLength,
+                              self.minValue if(records) else 0, self.maxValue if(records) else 0)
+        bitmap = self.slots.to_bytes((self.maxEntries + 7)//8, 'little')
+        self.frame[PAGE_HEADER.size : PAGE_HEADER.size + len(bitmap)] = bitmap
+
+    def unpackHeader(self):
+        """
+        Description: Reads the page header from the frame and restores the column index and slot bitmap.
+        Outputs:
+            (encoding, payloadLength) if the header is a valid page header for this page's layout, else None.
         """
-        self.log.debug(f"Save called for page: {self.pageID}! Writing {suffix} page to disk...")
+        magic, version, size, pageNo, columnIdx, capacity, records, pageEncoding, payloadLength, minValue, maxValue = PAGE_HEADER.unpack_from(self.frame, 0)
+        if(magic != PAGE_MAGIC or version != PAGE_VERSION or size != self.entrySize or capacity != self.capacity):
+            self.log.error("ERROR: %s is not a v%s page with this layout.", self.filename(), PAGE_VERSION)
+            return None
+        self.columnIdx = columnIdx
+        end = PAGE_HEADER.size + (self.maxEntries + 7)//8
+        self.slots = int.from_bytes(self.frame[PAGE_HEADER.size : end], 'little')
+        self.minValue, self.maxValue = (minValue, maxValue) if(records) else (None, None)
+        return pageEncoding, payloadLength
+
+    def save(self, encode=False):
+        """
+        Description: This method saves the page (header, slot bitmap and data) to disk in a single write.
+        Inputs:
+            encode (bool): Store the data array with the smallest encoding in encoding.py (used for full pages).
+                           Ignored for segment backed pages since their frames are fixed size.
+        """
+        self.log.debug("Save called for page: %s! Writing page to disk...", self.pageID)
         status = True
-        #Step-01: Write the page index
+        self.latch.acquireShared() #writers finish first so the header, bitmap and data we write agree
+        self.setClean() #before the write: a write that lands after we save marks the page dirty again
         try:
-            path = self.path
-            os.makedirs(os.path.dirname(path), exist_ok=True)
-            self.log.debug(f"Created necessary folders given path: {self.path}")
-            self.log.debug(f"Opening writing offset file: {self.path}{self.pageID}{suffix}.offsets")
-            with open(f"{self.path}{self.pageID}{suffix}.offsets", "w") as offsetFile:
-                data = [str(x) for x in self.availableOffsets]
-                self.log.debug(f"Casting offsets to string. self.availableOffsets: {data}")
-                rep = ','.join(data)
-                self.log.debug(f"Built string representation: {rep}")
-                offsetFile.write(rep)
-                self.log.debug(f"Wrote string representation to file.")
-            self.log.debug(f"Saving offsets complete! Writing binary file: {self.path}{self.pageID}{suffix}.bin")
-            with open(f"{self.path}{self.pageID}{suffix}.bin", "wb") as dataFile:
-                self.log.debug(f"Wrote string representation to file.")
-                dataFile.write(bytes(self.data))
-            self.log.debug(f"Wrote string representation to file.")
+            if(self.segment is not None):
+                self.packHeader()
+                self.segment.flush(self.pageID)
+                self.ioBytes = len(self.frame)
+            else:
+                pageEncoding, payload = encoding.encode(self.asArray(), self.entrySize) if(encode) else (encoding.RAW, None)
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                with open(self.filename(), "wb") as pageFile:
+                    if(payload is None):
+                        self.packHeader()
+                        self.ioBytes = pageFile.write(self.frame)
+                    else:
+                        self.packHeader(pageEncoding, len(payload))
+                        self.ioBytes = pageFile.write(bytes(self.frame[:self.headerSize]) + payload)
         except Exception as e:
             status = False
-            self.log.error(f"ERROR: An exception occured in load: {e}")
-        self.setClean()
-        self.log.debug(f"Save complete! Returning: {status}")
+            self.setDirty()
+            self.log.error("ERROR: An exception occured in save: %s", e)
+        finally:
+            self.latch.releaseShared()
+        self.log.debug("Save complete! Returning: %s", status)
         return status
 
-    def load(self, suffix):
+    def load(self, raw=None):
         """
-        Description: This method loads the page (data and index) from disk.
+        Description: This method loads the page (header, slot bitmap and data) from disk with a single readinto.
+        Inputs:
+            raw (bytes): The contents of the page file if they were already read (e.g., prefetched). Not read again.
         """
-        self.log.debug(f"Load called for page: {self.pageID}! Loading {suffix} page from disk...")
+        self.log.debug("Load called for page: %s! Loading page from disk...", self.pageID)
         status = True
         try:
-            self.log.debug(f"Loading data from binary file: {self.path}{self.pageID}{suffix}.bin")
-            with open(f"{self.path}{self.pageID}{suffix}.bin", "rb") as dataFile:
-                rawData = dataFile.read()
-                self.log.debug(f"Raw data loaded from file: {rawData}")
-                self.log.debug(f"Casting data as a bytearray...")
-                self.data = bytearray(rawData)
-                self.log.debug(f"Loaded data: {self.data}")
-            self.log.debug(f"Data file read! Loading offsets...")
-            self.log.debug(f"Checking if the page is full or partial: {'partial' if(suffix != '-full') else 'full'}")
-            if(suffix != '-full'):
-                self.log.debug(f"Loading partial pages offset array from file: {self.path}{self.pageID}{suffix}.offsets")
-                with open(f"{self.path}{self.pageID}{suffix}.offsets", "r") as offsetFile:
-                    self.log.debug(f"file opened! loading availableOffsets")
-                    self.availableOffsets = [int(x) for x in offsetFile.read().split(',')]
-                    self.log.debug(f"Offset Array: {self.availableOffsets}")
+            if(self.segment is not None):
+                self.ioBytes = 0
+                status = self.unpackHeader() is not None #the frame is already mapped, just parse the header
             else:
-                self.log.debug(f"Full page! Creating an empty offset array...")
-                self.availableOffsets = []
+                if(raw is None):
+                    with open(self.filename(), "rb") as pageFile:
+                        length = pageFile.readinto(self.frame)
+                elif(len(raw) <= len(self.frame)):
+                    length = len(raw)
+                    self.frame[:length] = raw
+                else:
+                    length = -1 #too long to be a page with this layout
+                self.ioBytes = max(length, 0)
+                header = self.unpackHeader()
+                status = header is not None and length == self.headerSize + header[1]
+                if(status and header[0] != encoding.RAW):
+                    payload = bytes(self.data[:header[1]])
+                    values = encoding.decode(header[0], payload, self.maxEntries)
+                    struct.pack_into(f"<{self.maxEntries}{self.cellFormat}", self.data, 0, *values)
         except Exception as e:
             status = False
-            self.log.error(f"ERROR: An exception occured in load: {e}")
-        self.log.debug(f"Load complete! Returning: {status}")
+            self.log.error("ERROR: An exception occured in load: %s", e)
+        self.log.debug("Load complete! Returning: %s", status)
         return status
     
-    def delete(self, suffix):
+    def delete(self):
         """
-        Description: This method deletes the page (data and index) from disk.
+        Description: This method deletes the page file from disk.
         """
         status = True
         try:
-            self.log.debug(f"Delete called! Removing page from disk...")
-            self.log.debug(f"Removing file: {self.path}{self.pageID}{suffix}.offsets")
-            os.remove(f"{self.path}{self.pageID}{suffix}.offsets")
-            self.log.debug(f"Removing file: {self.path}{self.pageID}{suffix}.bin")
-            os.remove(f"{self.path}{self.pageID}{suffix}.offsets")
+            self.log.debug("Delete called! Removing page %s from: %s", self.pageID, self.filename())
+            if(self.segment is not None):
+                self.segment.free(self.pageID)
+            elif(os.path.exists(self.filename())): #else the page was never saved
+                os.remove(self.filename())
         except Exception as e:
             status = False
-            self.log.error(f"ERROR! Encountered exception while deleting files: {e}")
-        self.log.debug(f"Remove complete! Returning: {status}")
+            self.log.error("ERROR! Encountered exception while deleting files: %s", e)
+        self.log.debug("Remove complete! Returning: %s", status)
         return status
 
     def write(self, value):
         """
         Description: A simple write method. Will insert new data to array.
         Inputs:
-            value (any): The data value to be stored. Will be encoded as a string.
+            value (int): The data value to be stored. Encoded as a little-endian int of the page's cell width.
         Outputs:
             index (int): The integer index that the data was stored at.
+        Notes: Raises struct.error (and stores nothing) if <value> is out of range for the column type.
+               The page must have a free slot. If it is shared between threads, hold self.latch exclusive.
         """
-        self.log.debug(f"Write called! Writing value: {value} to the pages data array.")
         self.LFU += 1
-        self.log.debug(f"Incrementing the LFU counter: (before) {self.LFU-1} -> (current) {self.LFU}")
-        self.log.debug(f"First 5 offsets: {self.availableOffsets[:5]}")
-        self.log.debug(f"Fetching smallest available offset. Length of offsets: {len(self.availableOffsets)}")
-        index = self.availableOffsets.pop()
-        self.log.debug(f"Got offset: {index} - Length of offsets: {len(self.availableOffsets)}")
-        self.log.debug(f"Slice of the data array we are writing to: [{index}, {index+8}]")
-        data = str(value).ljust(8, '-').encode('utf-8')
-        self.log.debug(f"Value(raw): {value} - value(str): {str(value)} - Encoded value: {data}")
-        self.log.debug(f"Data in array before writing: index-1: {self.data[(index-8) : ((index-8) + 8)]} - index: {self.data[(index) : ((index) + 8)]} - index+1: {self.data[(index+8) : ((index+8) + 8)]}") 
-        self.data[index : (index + 8)] = data
-        self.log.debug(f"Data in array after writing: index-1: {self.data[(index-8) : ((index-8) + 8)]} - index: {self.data[(index) : ((index) + 8)]} - index+1: {self.data[(index+8) : ((index+8) + 8)]}") 
+        free = ~self.slots & self.fullMask
+        slot = (free & -free).bit_length() - 1 #lowest free slot
+        index = slot * self.entrySize
+        self.cell.pack_into(self.data, index, value)
+        self.slots |= (1 << slot)
+        if(self.minValue is None or value < self.minValue):
+            self.minValue = value
+        if(self.maxValue is None or value > self.maxValue):
+            self.maxValue = value
         self.setDirty()
-        self.log.debug(f"Complete! Returning index: {index}")
         return index
         
+    def writeAt(self, index, value):
+        """
+        Description: Writes <value> at offset <index>, whether or not the slot is in use (in place updates).
+        Inputs:
+            index (int): The data array offset (slot * entrySize) to write.
+            value (int): The data value to be stored.
+        Notes: Raises struct.error if <value> is out of range for the column type. Hold self.latch exclusive if
+               the page is shared between threads.
+        """
+        self.LFU += 1
+        self.cell.pack_into(self.data, index, value)
+        self.slots |= (1 << (index // self.entrySize))
+        if(self.minValue is None or value < self.minValue):
+            self.minValue = value
+        if(self.maxValue is None or value > self.maxValue):
+            self.maxValue = value
+        self.setDirty()
+
+    def copyFrom(self, other):
+        """
+        Description: Makes this page's cells, slot bitmap and zone map a copy of <other>'s.
+        Inputs:
+            other (Page): A page with the same cell width. Hold its latch shared (and this page's exclusive) if
+                          they are shared between threads.
+        """
+        self.LFU += 1
+        self.data[:] = other.data
+        self.slots = other.slots
+        self.minValue, self.maxValue = other.minValue, other.maxValue
+        self.setDirty()
+
+    def writeRun(self, index, values):
+        """
+        Description: Writes <values> to consecutive slots starting at offset <index>, whether or not they are in
+                     use, with a single pack_into. The batch version of writeAt().
+        Inputs:
+            index (int): The data array offset of the first slot.
+            values (sequence): The data values to be stored. They must fit in the page from <index> on.
+        Notes: Raises struct.error (and stores nothing) if a value is out of range for the column type. Hold
+               self.latch exclusive if the page is shared between threads.
+        """
+        if(not len(values)):
+            return
+        self.LFU += 1
+        struct.pack_into(f"<{len(values)}{self.cellFormat}", self.data, index, *values)
+        self.slots |= ((1 << len(values)) - 1) << (index // self.entrySize)
+        low, high = min(values), max(values)
+        if(self.minValue is None or low < self.minValue):
+            self.minValue = low
+        if(self.maxValue is None or high > self.maxValue):
+            self.maxValue = high
+        self.setDirty()
+
     def read(self, index):
         """"
         Description: A simple read method. Returns data by index from the page if the key exists.
         Inputs:
             index (int): the index of the value you wanna read.
+        Outputs:
+            value (int): The decoded integer stored at <index>.
         """
-        self.log.debug(f"Read called! Reading value in data array from position <index>: {index}")
         self.LFU += 1
-        self.log.debug(f"Incrementing the LFU counter: (before) {self.LFU-1} -> (current) {self.LFU}")
-        self.log.debug(f"Slice of the data array we are reading from: [{index}, {index+8}]")
-        self.log.debug(f"Data in array adjecent to {index}: index-1: {self.data[(index-8) : ((index-8) + 8)]} - index: {self.data[(index) : ((index) + 8)]} - index+1: {self.data[(index+8) : ((index+8) + 8)]}") 
-        data = self.data[index : (index+8)]
-        self.log.debug(f"data(raw): {data} - decoded: {data.decode('utf-8')} - trimmed: {data.decode('utf-8').replace('-', '')}")
-        data = data.decode('utf-8').replace('-', '')
-        self.log.debug(f"Read complete returning data: {data}")
+        data = self.cell.unpack_from(self.data, index)[0]
         return data
 
+    def isSet(self, index):
+        """
+        Description: Returns True if the slot at <index> holds a value (it was written and not removed since).
+        """
+        return bool(self.slots >> (index // self.entrySize) & 1)
+
+    def asArray(self):
+        """
+        Description: Returns a zero-copy int view over the page's data array. Element i is the cell stored at
+                     offset i*entrySize. The view is only valid until the page is reloaded or evicted.
+        Outputs:
+            memoryview (format <cellFormat>) on little-endian hosts, else an array.array copy in host order.
+        """
+        self.LFU += 1
+        if(sys.byteorder == 'little'):
+            return memoryview(self.data).cast(self.cellFormat)
+        values = array.array(self.cellFormat, bytes(self.data))
+        values.byteswap()
+        return values
+
+    def readMany(self, offsets):
+        """
+        Description: Batch read. Returns the values stored at <offsets> (as returned by write()).
+                     Large batches convert the whole data array to a list in one slice instead of indexing cell by cell.
+        Outputs:
+            values (list): ints, in the same order as <offsets>.
+        """
+        view = self.asArray()
+        if(len(offsets) > self.maxEntries // 8):
+            view = view.tolist()
+        size = self.entrySize
+        return [view[offset // size] for offset in offsets]
+
     def remove(self, index):
         """
         Description: Removes data in the page from the given index.
         Inputs:
             index (int): the index of the value you wanna delete.
         """
-        self.log.debug(f"Remove called! Adding index to list of available offsets...")
         self.LFU += 1
-        self.log.debug(f"Incrementing the LFU counter: (before) {self.LFU-1} -> (current) {self.LFU}")
-        self.log.debug(f"Last 5 offsets before remove: {self.availableOffsets[-5:]}")
-        self.availableOffsets.append(index)
-        self.log.debug(f"Last 5 offsets after remove: {self.availableOffsets[-5:]}")
+        self.slots &= ~(1 << (index // self.entrySize))
+        if(self.slots == 0):
+            self.minValue = self.maxValue = None
         self.setDirty()
     
     def calculateLFU(self):
@@ -253,10 +505,134 @@ class Page:
         Inputs:
             index (int): the index of the value you wanna delete.
         """
-        self.log.debug(f"CalculateLFU called! Calculating the Least Frequently Used (LFU) value for this page...")
         endTime = time.time()
-        self.log.debug(f"Formula variables: #used: {self.LFU} - start time: {self.startTime} - end time: {endTime} - cycle: {self.cycle}")
+        self.log.debug("Formula variables: #used: %s - start time: %s - end time: %s - cycle: %s", self.LFU, self.startTime, endTime, self.cycle)
         LFU = self.LFU/((self.startTime - endTime) % self.cycle)
         self.LFU = 0
-        self.log.debug(f"Complete! Returning calculated LFU: {LFU}")
-        return LFU
\ No newline at end of file
+        return LFU
+
+def readPageHeader(raw):
+    """
+    Description: Parses the fixed header at the start of <raw> (bytes of a page file or frame).
+    Outputs:
+        (pageNo, entrySize, columnIdx, capacity, records, encoding, payloadLength, minValue, maxValue),
+        or None if <raw> doesn't start with a header of the current version.
+    """
+    if(len(raw) < PAGE_HEADER.size):
+        return None
+    header = PAGE_HEADER.unpack_from(raw, 0)
+    if(header[0] != PAGE_MAGIC or header[1] != PAGE_VERSION):
+        return None
+    return (header[3], header[2]) + header[4:]
+
+def readPageFileHeader(filename):
+    """
+    Description: Reads only the fixed header of a page file (see readPageHeader).
+    """
+    with open(filename, "rb") as pageFile:
+        return readPageHeader(pageFile.read(PAGE_HEADER.size))
+
+def readPageFile(filename):
+    """
+    Description: Returns the whole contents of a page file (header and data or encoded payload).
+    """
+    with open(filename, "rb") as pageFile:
+        return pageFile.read()
+
+def sumPageFile(filename, offsets, capacity=4096, size=8, raw=None):
+    """
+    Description: Sums the cells at <offsets> of a page that is on disk without loading it into the bufferpool.
+                 Encoded pages are summed directly from their payload (see encoding.sumEncoded).
+    Inputs:
+        raw (bytes): The file contents if they were already read (see readPageFile), else the file is read.
+    Outputs:
+        The sum (int), or None if the file isn't a page with this layout.
+    """
+    if(raw is None):
+        raw = readPageFile(filename)
+    hsize = headerSize(capacity, size)
+    header = readPageHeader(raw)
+    if(header is None or header[1] != size or header[3] != capacity):
+        return None
+    pageEncoding, payloadLength = header[5], header[6]
+    payload = memoryview(raw)[hsize : hsize + payloadLength]
+    if(pageEncoding == encoding.RAW):
+        cell = struct.Struct('<' + CELL_FORMATS[size])
+        return sum(cell.unpack_from(payload, offset)[0] for offset in offsets)
+    return encoding.sumEncoded(pageEncoding, payload, capacity//size, [offset // size for offset in offsets])
+
+def decodeLegacyCell(raw):
+    """
+    Description: Decodes one 8 byte cell written by the old string encoding (str(value).ljust(8, '-')).
+                 Unused cells are all zero bytes and decode to 0.
+    """
+    text = raw.decode('utf-8').replace('-', '').strip('\x00')
+    return int(text) if text else 0
+
+def convertLegacyPage(path, pid, columnIdx=0, capacity=4096):
+    """
+    Description: One-time converter for pages saved by m2. Reads <pid>-{full,partial}.bin (string encoded cells)
+                 and its .offsets file (comma-separated free offsets) and writes the equivalent <pid>.page file.
+                 The -full files win if both exist since the -partial ones are left over from the page's first save.
+    Inputs:
+        path (str): The table directory (e.g., ./CS451/Grades/).
+        pid (str): The page ID (e.g., "P-4").
+        columnIdx (int): The column of the page (from the table's .meta page directory).
+    Outputs:
+        True if the page was converted. False if it could not be (e.g., a page whose data array was grown
+        past <capacity> by 9+ digit values; its cells are no longer aligned and can't be recovered safely).
+    """
+    suffix = "-full" if os.path.exists(f"{path}{pid}-full.bin") else "-partial"
+    with open(f"{path}{pid}{suffix}.bin", "rb") as dataFile:
+        raw = dataFile.read()
+    if(len(raw) != capacity):
+        return False
+    page = Page(pid, path, capacity, CELL.size, columnIdx)
+    try:
+        for i in range(0, capacity, CELL.size):
+            CELL.pack_into(page.data, i, decodeLegacyCell(raw[i : i + CELL.size]))
+        page.slots = page.fullMask
+        if(suffix == "-partial"):
+            with open(f"{path}{pid}{suffix}.offsets", "r") as offsetFile:
+                rep = offsetFile.read().strip()
+            for offset in (rep.split(',') if rep else []):
+                page.slots &= ~(1 << (int(offset) // CELL.size))
+    except (ValueError, OSError):
+        return False
+    values = [value for i, value in enumerate(page.asArray()) if(page.slots >> i) & 1]
+    if(values):
+        page.minValue, page.maxValue = min(values), max(values)
+    return page.save()
+
+def convertLegacyTable(path, capacity=4096):
+    """
+    Description: Runs convertLegacyPage on every m2 page in a table directory and removes the old files.
+                 Column indexes are taken from the table's .meta page directory if there is one.
+    Outputs:
+        A list of the page IDs that could not be converted (their old files are kept).
+    """
+    path = os.path.join(path, "")
+    columns = {}
+    for name in os.listdir(path):
+        if(name.endswith(".meta")):
+            with open(f"{path}{name}", "r") as metaFile:
+                for line in metaFile:
+                    if(line.startswith("P-") and ":(" in line):
+                        pid, entry = line.split(":")
+                        columns[pid] = int(entry.strip("()\n").split(",")[2])
+    pids = {name.rsplit("-", 1)[0] for name in os.listdir(path) if name.startswith("P-") and name.endswith(".bin")}
+    failed = []
+    for pid in sorted(pids):
+        if(convertLegacyPage(path, pid, columns.get(pid, 0), capacity)):
+            for suffix in ("-full.bin", "-full.offsets", "-partial.bin", "-partial.offsets"):
+                if(os.path.exists(f"{path}{pid}{suffix}")):
+                    os.remove(f"{path}{pid}{suffix}")
+        else:
+            failed.append(pid)
+    return failed
+
+
+if(__name__ == "__main__"):
+    for tablePath in sys.argv[1:]:
+        for name in convertLegacyTable(tablePath):
+            print(f"Could not convert: {os.path.join(tablePath, name)}")
@@ -66,7 +66,18 @@ class Query:
     # Returns False if insert fails for whatever reason
     """
     def insert(self, *columns):
-        self.table.insert(columns)
+        return self.table.insert(columns)
+
+    """
+    # Insert many records at once (see Table.insert_many)
+    # :param rows: list of records, each a list of column values
+    # :param columns: or the records as one list (or array) of values per column
+    # Return True if every record was inserted
+    # Returns False if some were not (e.g., their key already exists)
+    """
+    def insert_batch(self, rows=None, columns=None):
+        count = len(rows) if rows is not None else len(columns[0])
+        return self.table.insert_many(rows, columns) == count
         
 
     
@@ -80,12 +91,10 @@ class Query:
     # Assume that select will never be called on a key that doesn't exist
     """
     def select(self, search_key, search_key_index, projected_columns_index):
-        if search_key not in self.table.index.pkl_index:
-                return []
         #print(f"\n\n[Query.select] Select called. See input params below:")
         #print(f"[Query.select] search_key: {search_key} - search_key_index: {search_key_index} - projected_columns_index: {projected_columns_index}")
         #print(f"[Query.select] Calling select version on the latest record version")
-        final = self.select_version(search_key, search_key_index, projected_columns_index, -1)
+        final = self.select_version(search_key, search_key_index, projected_columns_index, 0)
         #print(f"[Query.select] Returning: {final}") 
         return final
     
@@ -100,47 +109,64 @@ class Query:
     # Assume that select will never be called on a key that doesn't exist
     """
     def select_version(self, search_key, search_key_index, projected_columns_index, relative_version):
+            if(search_key_index != self.table.key):
+                return self.select_by_value(search_key, search_key_index, projected_columns_index, relative_version)
             if search_key not in self.table.index.pkl_index:
                 return []
             #print(f"\n[Query.select_version] Select version called. See input params below:")
             #print(f"[Query.select_version] search_key: {search_key} - search_key_index: {search_key_index} - projected_columns_index: {projected_columns_index} - relative_version: {relative_version}")
             
-            retVal = []
-            
-            #print(f"[Query.select_version] Checking if we are searching using the primary key...")
-            if(search_key_index == self.table.key): #we are searching using the primary key 
-                
-                #print(f"[Query.select_version] Searching for records with the primary key: {search_key}")
-                
-                if not self.table.lockManager.hasLock(search_key):
-                    self.table.lockManager.addLock(search_key)
-                
-                if not self.table.lockManager.acquireRLock(search_key):
-                    return
-                records = self.table.index.pkl_index[search_key]
-                #print(f"[Query.select_version] Records found with this key: {record}")
-                #print("RECORDS TO SELECT FROM: ", self.table.index.pkl_index[search_key])
-                #print("RECORDS: ", search_key, records)
-                for record in records[::-1]:
-                    colToReturn = []
-                    
-                    #print(f"[Query.select_version] Fetching version the {relative_version} tail record: {record}")
-                    #print(f"[Query.select_version] looping through the locations in the record...")
-                    for location in record:
-                        #print(f"[Query.select_version] Location: {location}. Getting page with PID: {location[0]}...")
-                        page = self.table.bufferPool.getPage(location[0])
-                        #print(f"[Query.select_version] Found page: {page.pageID}! Reading data from the page...")
-                        data = page.read(location[1])
-                        #print(f"[Query.select_version] Got data! raw: {data} - type: {type(data)} - int: {int(data)}! Appending to return record...")
-                        colToReturn.append(int(data))
-                        #print(f"[Query.select_version] data added. Continuing...")
-                    
-                    retVal.append(Record(search_key, self.FilterColumns(colToReturn, projected_columns_index)))
-            if colToReturn[self.table.key] != search_key: 
-                t = 0
-            self.table.lockManager.releaseRLock(search_key)
+            if not self.table.lockManager.hasLock(search_key):
+                self.table.lockManager.addLock(search_key)
+            if not self.table.lockManager.acquireRLock(search_key):
+                return False
+            try:
+                #only the projected columns are read (and only the tail records that hold them are visited)
+                wanted = [i for i, projected in enumerate(projected_columns_index) if projected == 1]
+                columns = self.table.readRecord(search_key, relative_version, wanted)
+            finally:
+                self.table.lockManager.releaseRLock(search_key)
+            if columns is None: #deleted before we got the lock
+                return []
             #print(f"[Query.select_version] Select version done! Returning: {retVal}")
-            return retVal
+            return [Record(search_key, self.FilterColumns(columns, projected_columns_index))]
+
+    def select_by_value(self, search_key, search_key_index, projected_columns_index, relative_version=0):
+        """
+        Select on a non-key column: returns <relative_version> of every record whose <search_key_index> column
+        equals <search_key> in that version. Pages whose zone map can't hold the value are skipped without being loaded, and the
+        pages the scan does load go through a scan ring (see BufferPool.scanRing) so they don't evict hot pages.
+        """
+        epoch = self.table.epochs.enter() #the records it finds aren't reclaimed under it (see Table.vacuum)
+        try:
+            return self._selectByValue(search_key, search_key_index, projected_columns_index, relative_version)
+        finally:
+            self.table.epochs.exit(epoch)
+
+    def _selectByValue(self, search_key, search_key_index, projected_columns_index, relative_version):
+        table = self.table
+        bufferPool = table.bufferPool
+        wanted = [i for i, projected in enumerate(projected_columns_index) if projected == 1]
+        retVal = []
+        with bufferPool.scanRing() as ring:
+            entries = list(table.index.pkl_index.copy().items()) #read by RID: a key deleted meanwhile is still readable (see epoch above)
+            keys = [key for key, _ in entries]
+            baseRIDs = [RID for _, RID in entries]
+            schemas = table.readCells([table.baseLocation(table.schemaColumn, RID) for RID in baseRIDs], ring)
+            for key, baseRID, schema in zip(keys, baseRIDs, schemas):
+                if schema >> search_key_index & 1: #updated: the value of the version may be in a tail record
+                    value = table.readRecord(key, relative_version, [search_key_index], baseRID)[search_key_index]
+                else: #never updated: every version has the base value
+                    location = table.baseLocation(search_key_index, baseRID)
+                    if not bufferPool.pageMayContain(location[0], search_key, search_key):
+                        continue
+                    with bufferPool.getPage(location[0], ring=ring) as page:
+                        value = page.read(location[1])
+                if value != search_key:
+                    continue
+                columns = table.readRecord(key, relative_version, wanted, baseRID) #a match: the row is fetched like a point select
+                retVal.append(Record(key, self.FilterColumns(columns, projected_columns_index)))
+        return retVal
 
     def FilterColumns(self, columns, projected_columns_index):
         columnsToReturn = []
@@ -155,8 +181,7 @@ class Query:
     # Returns False if no records exist with given key or if the target record cannot be accessed due to 2PL locking
     """
     def update(self, primary_key, *columns):
-        #if primary_key 
-        self.table.update(primary_key, *columns)
+        return self.table.update(primary_key, *columns)
        
 
     
@@ -179,14 +204,7 @@ class Query:
         return summationResult 
         
         """
-    
-        summationResult = 0
-        keys = [start_range + i for i in range((end_range - start_range) + 1)]
-        for key in keys:
-            if key in self.table.index.pkl_index:
-                location = self.table.index.pkl_index[key][-1]
-                summationResult += int(self.table.bufferPool.getPage(location[aggregate_column_index][0], aggregate_column_index).read(location[aggregate_column_index][1]))
-        return summationResult
+        return self.sum_version(start_range, end_range, aggregate_column_index, 0)
     
     """
     :param start_range: int         # Start of the key range to aggregate 
@@ -208,12 +226,48 @@ class Query:
         return summationResult 
         
         """
+        table = self.table
+        epoch = table.epochs.enter() #the records it sums aren't reclaimed under it (see Table.vacuum)
+        try:
+            return self._sumVersion(start_range, end_range, aggregate_column_index, relative_version)
+        finally:
+            table.epochs.exit(epoch)
+
+    def _sumVersion(self, start_range, end_range, aggregate_column_index, relative_version):
+        table = self.table
+        pkl_index = table.index.pkl_index
+        located = [(key, pkl_index.get(key)) for key in range(start_range, end_range + 1)]
+        located = [(key, RID) for key, RID in located if RID is not None] #a key deleted meanwhile is skipped
+        keys = [key for key, _ in located]
+        baseRIDs = [RID for _, RID in located]
+        schemas = table.readCells([table.baseLocation(table.schemaColumn, RID) for RID in baseRIDs])
+
+        #Records whose column was updated follow their tail records. For the others the value is in the base record:
+        #group those offsets by page so each page is fetched once and summed in a single pass.
         summationResult = 0
-        keys = [start_range + i for i in range((end_range - start_range) + 1)] 
-        for key in keys:
-            location = self.key_rid[key][relative_version]
-            summationResult += self.bufferpool.getPageByID(location[aggregate_column_index][0]).read() 
-        return summationResult 
+        pageOffsets = {}
+        for key, baseRID, schema in zip(keys, baseRIDs, schemas):
+            if schema >> aggregate_column_index & 1:
+                summationResult += table.readRecord(key, relative_version, [aggregate_column_index], baseRID)[aggregate_column_index]
+                continue
+            location = table.baseLocation(aggregate_column_index, baseRID)
+            if location[0] in pageOffsets:
+                pageOffsets[location[0]].append(location[1])
+            else:
+                pageOffsets[location[0]] = [location[1]]
+
+        bufferPool = table.bufferPool
+        PIDs = list(pageOffsets)
+        #A scan of more than a quarter of the pool cycles through a small ring of frames instead of evicting hot pages
+        ring = bufferPool.scanRing() if len(PIDs) > bufferPool.capacity // 4 else None
+        try:
+            for i, PID in enumerate(PIDs):
+                bufferPool.prefetch(PIDs[i + 1 : i + 1 + bufferPool.readAhead]) #read the next pages while this one is summed
+                summationResult += bufferPool.sumPage(PID, aggregate_column_index, pageOffsets[PID], ring)
+        finally:
+            if ring is not None:
+                ring.close()
+        return summationResult
 
     def GetVersionColumnValue(self, search_key, relative_version, columnIndex):
         try:
@@ -0,0 +1,172 @@
+import os
+import mmap
+import logging
+
+from lstore.setupLogging import *
+from lstore.page import PAGE_HEADER, PAGE_MAGIC, headerSize
+"""
+Documentation for the column segment class.
+Description:
+    A column segment is a single preallocated file (C-<columnIdx>.seg) that holds every page of one column of a
+    table. The file is divided into fixed size frames, one per page, where each frame has exactly the same layout
+    as a <pid>.page file (header + data array). The file is mmap'ed, so a Page backed by a segment is a view over
+    the mapping: loading it costs no file open or read, saving it is an msync of its frame and the OS page cache
+    does the read-through/write-back.
+
+    The file grows in extents of <extentPages> frames. Each extent is a separate mapping of the same file so
+    growing never has to remap (and invalidate) frames that pages already hold views of.
+
+    Frame Format (offset = slot * frameSize):
+    [<page header + slot bitmap (padded)>, <data array (capacity bytes)>]
+"""
+
+class ColumnSegment:
+
+    log = setupLogger(False, LOG_LEVEL, logging.getLogger("ColumnSegment"), 12)
+
+    def __init__(self, path, columnIdx, capacity=4096, size=8, extentPages=64):
+        """
+        Description: Opens (or creates) the segment file for a column and maps the extents it already has.
+        Inputs:
+            path (str): The table directory.
+            columnIdx (int): The column this segment stores.
+            capacity (int): The capacity of each page in the segment.
+            size (int): The entry size of each page in the segment.
+            extentPages (int): The number of frames added each time the file grows.
+        Internal Objects:
+            slotOf (dict): Maps page IDs to their frame number in the segment. Rebuilt from the frame headers on open.
+            freeSlots (list): Frame numbers of deleted pages that can be reused.
+            extents (list): One mmap object per extent of the file.
+        """
+        self.path = path
+        self.columnIdx = columnIdx
+        self.filename = f"{path}C-{columnIdx}.seg"
+        self.frameSize = headerSize(capacity, size) + capacity
+        self.extentPages = extentPages
+        #each extent is mapped separately so it's offset must be a multiple of the allocation granularity.
+        extentBytes = self.frameSize * extentPages
+        self.extentBytes = -(-extentBytes // mmap.ALLOCATIONGRANULARITY) * mmap.ALLOCATIONGRANULARITY
+
+        self.slotOf = {}
+        self.freeSlots = []
+        self.nextSlot = 0
+        self.extents = []
+
+        os.makedirs(os.path.dirname(self.filename), exist_ok=True)
+        mode = "r+b" if os.path.exists(self.filename) else "w+b"
+        self.file = open(self.filename, mode)
+        numExtents = os.path.getsize(self.filename) // self.extentBytes
+        for i in range(numExtents):
+            self._mapExtent(i)
+        self._scan()
+
+    def _mapExtent(self, i):
+        if(os.path.getsize(self.filename) < (i + 1) * self.extentBytes):
+            #allocate real blocks for the extent (not a sparse hole) so later writes don't allocate (or fail) on msync
+            try:
+                os.posix_fallocate(self.file.fileno(), i * self.extentBytes, self.extentBytes)
+            except (AttributeError, OSError): #not available on this platform/file system
+                os.ftruncate(self.file.fileno(), (i + 1) * self.extentBytes)
+        self.extents.append(mmap.mmap(self.file.fileno(), self.extentBytes, offset=i * self.extentBytes))
+
+    def _locate(self, slot):
+        """Returns (extent, byte offset in the extent) of a frame."""
+        return self.extents[slot // self.extentPages], (slot % self.extentPages) * self.frameSize
+
+    def _scan(self):
+        """
+        Description: Rebuilds slotOf/freeSlots from the page headers in the file.
+        """
+        for slot in range(len(self.extents) * self.extentPages):
+            extent, offset = self._locate(slot)
+            header = PAGE_HEADER.unpack_from(extent, offset)
+            magic, pageNo = header[0], header[3]
+            if(magic == PAGE_MAGIC):
+                self.slotOf[f"P-{pageNo}"] = slot
+                self.nextSlot = slot + 1
+        used = set(self.slotOf.values())
+        self.freeSlots = [slot for slot in range(self.nextSlot - 1, -1, -1) if slot not in used]
+        self.log.debug("Opened segment %s: %s pages - %s extents", self.filename, len(self.slotOf), len(self.extents))
+
+    def reserve(self, count):
+        """
+        Description: Maps (and preallocates) extents ahead of time until at least <count> frames are free.
+        """
+        while(len(self.freeSlots) + len(self.extents) * self.extentPages - self.nextSlot < count):
+            self._mapExtent(len(self.extents))
+
+    def hasPage(self, PID):
+        return PID in self.slotOf
+
+    def frame(self, PID):
+        """
+        Description: Returns a writable memoryview of the frame for <PID>, assigning the page a frame
+                     (and growing the file by an extent) if it doesn't have one yet.
+        """
+        if(PID not in self.slotOf):
+            if(self.freeSlots):
+                slot = self.freeSlots.pop()
+            else:
+                slot = self.nextSlot
+                self.nextSlot += 1
+                if(slot // self.extentPages >= len(self.extents)):
+                    self._mapExtent(len(self.extents))
+            self.slotOf[PID] = slot
+        extent, offset = self._locate(self.slotOf[PID])
+        return memoryview(extent)[offset : offset + self.frameSize]
+
+    def flush(self, PID):
+        """
+        Description: Synchronously writes the frame of <PID> back to the file (msync of the frame's pages).
+        """
+        extent, offset = self._locate(self.slotOf[PID])
+        start = offset - (offset % mmap.PAGESIZE)
+        extent.flush(start, offset + self.frameSize - start)
+
+    def flushMany(self, PIDs):
+        """
+        Description: Writes the frames of <PIDs> back to the file, one msync per run of adjacent frames
+                     (in the same extent) instead of one per page.
+        """
+        slots = sorted(self.slotOf[PID] for PID in PIDs if PID in self.slotOf)
+        i = 0
+        while(i < len(slots)):
+            j = i
+            while(j + 1 < len(slots) and slots[j + 1] == slots[j] + 1 and slots[j + 1] % self.extentPages != 0):
+                j += 1
+            extent, offset = self._locate(slots[i])
+            start = offset - (offset % mmap.PAGESIZE)
+            extent.flush(start, offset + (j - i + 1) * self.frameSize - start)
+            i = j + 1
+
+    def willNeed(self, PID):
+        """
+        Description: Asks the kernel to start reading the frame of <PID> into the page cache (readahead hint).
+        """
+        if(PID in self.slotOf and hasattr(mmap, "MADV_WILLNEED")):
+            extent, offset = self._locate(self.slotOf[PID])
+            start = offset - (offset % mmap.PAGESIZE)
+            extent.madvise(mmap.MADV_WILLNEED, start, offset + self.frameSize - start)
+
+    def free(self, PID):
+        """
+        Description: Releases the frame of <PID> so it can be reused. The header magic is cleared so the
+                     frame isn't picked up as a page the next time the segment is opened.
+        """
+        if(PID in self.slotOf):
+            slot = self.slotOf.pop(PID)
+            extent, offset = self._locate(slot)
+            extent[offset : offset + 4] = bytes(4)
+            self.freeSlots.append(slot)
+
+    def close(self):
+        """
+        Description: Flushes every extent and unmaps the ones no page holds a view of anymore.
+        """
+        for extent in self.extents:
+            extent.flush()
+            try:
+                extent.close()
+            except BufferError:
+                pass #a live Page still references this extent; it is unmapped when that page is dropped.
+        self.file.close()
@@ -1,19 +1,32 @@
+import os
 import logging
 
+#Default level for the lstore loggers. Tracing is off unless asked for, e.g.: LSTORE_LOG_LEVEL=DEBUG python3 __main__.py
+LOG_LEVEL = os.environ.get("LSTORE_LOG_LEVEL", "WARNING").upper()
+
 #setup logger
 def setupLogger(mode, level, logger, indentLevel, logfile="logfile.log"):
+    """
+    Description: Configures <logger> once per process. Calling it again for a logger that is already set up
+                 returns it unchanged, so no new handlers (or log files) are created. Only the handler for
+                 the selected <mode> is created (True: file, False: console).
+    Notes: Loggers should be set up once per class/module (at import), not per object, and callers in hot
+           paths should use lazy formatting (log.debug("x: %s", x)) or check log.isEnabledFor(logging.DEBUG).
+    """
+    if(getattr(logger, "_lstoreConfigured", False)):
+        return logger
     logger.setLevel(level)
-    fileHandler = logging.FileHandler(logfile, mode='w', encoding='utf-8')
-    consoleHandler = logging.StreamHandler()
     indent = " "*indentLevel
     fmt = logging.Formatter(
         indent+"[{name}.{funcName}] {message}",
         style='{')
 
     if(mode):
-        fileHandler.setFormatter(fmt)
-        logger.addHandler(fileHandler)
+        handler = logging.FileHandler(logfile, mode='w', encoding='utf-8', delay=True)
     else:
-        consoleHandler.setFormatter(fmt)
-        logger.addHandler(consoleHandler)
-    return logger
\ No newline at end of file
+        handler = logging.StreamHandler()
+    handler.setFormatter(fmt)
+    logger.addHandler(handler)
+    logger.propagate = False
+    logger._lstoreConfigured = True
+    return logger
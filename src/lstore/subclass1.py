@@ -10,5 +10,5 @@ class subClass():
         
 
     def method1(self):
-        self.log.debug(f"Hello from method1")
+        self.log.debug("Hello from method1")
 
@@ -11,5 +11,5 @@ class subClass2():
         self.log.debug("Hello from init")
 
     def method1(self):
-        self.log.debug(f"Hello from method1")
+        self.log.debug("Hello from method1")
         self.sub1.method1()
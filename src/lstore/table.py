@@ -4,15 +4,60 @@ Author: Jack O'Donnell Jodonnel@uoregon.edu
 Description:
     This file contains the implementation for the table. 
 
+Records (L-Store base/tail records):
+    A record is inserted as a base record: one cell per column plus two metadata cells, stored in bufferpool
+    columns num_columns + INDIRECTION_COLUMN and num_columns + SCHEMA_ENCODING_COLUMN. An update appends a tail
+    record that only holds the columns it changed: the new values, its schema encoding (bit i set <=> it holds
+    column i), its indirection (the previous tail record, or NO_RECORD) and the RID of its base record (a third
+    metadata cell in column num_columns + BASE_RID_COLUMN that only tail records have). The base record's
+    indirection is then pointed at the new tail record and its schema encoding collects the columns that were
+    ever updated.
+    Records are addressed by integer record IDs (base and tail records are numbered separately). The page
+    directories (basePages and tailPages) map a column and page number to a PID and each column numbers its pages on
+    its own: the cell of column c of record r is slot r % recordsPerPage[c] of the column's page
+    r // recordsPerPage[c]. A page is only created once a record writes to it, so columns that are never updated
+    get no tail pages. The index maps a primary key to its base RID and inserts reuse the RIDs of deleted records.
+    A read starts at the base record and follows the indirection until every column it needs was found (columns
+    the base schema encoding doesn't have are read from the base record right away).
+
+Merge:
+    merge() (run by a BackgroundMerger thread) takes the full tail pages that haven't been merged and writes the
+    latest value of every column they update into a new version of the base page: a copy of the page's previous
+    version. It reads those tail records a page at a time and finds their base records by their base RID cells, so
+    its cost follows the number of updates since the last merge, not the size of the table. mergedPages maps the base page to its newest version, one dict assignment, so readers never wait for
+    the merge. Every version holds all the merged updates of its page (a merge that doesn't copy a page had none for
+    it), so a read of the latest version takes the columns it still needs from there as soon as its walk reaches a
+    tail record below mergedRID. The base pages themselves keep the values the records were inserted with,
+    which older versions (select_version) still need. A superseded version is deleted once no reader can be using
+    it (see latch.Epochs).
+
+Delete:
+    delete() only drops the index entry and leaves a tombstone (the base RID in <tombstones>), so it never touches a
+    page. vacuum() (run by the BackgroundMerger after each merge) reclaims them in bulk: it removes the cells of the
+    records and their tail records a page at a time, deletes the tail pages that are left empty and compacts the base
+    records. Base records are grouped in blocks of whole pages of every column; the live records of a block that is
+    less than COMPACT_BELOW full are moved to free slots of the other blocks and the block's pages are deleted.
+    Pages and RIDs are only freed once no reader that could still use them is left (readers enter self.epochs).
+    Updates and deletes hold the latch of their record's block shared (see _latchRecord) and the vacuum holds it
+    exclusive while it moves the block's records, so it never takes (or fails on) the transactions' record locks.
 """
+import os
+import threading
 from lstore.index import Index
-from lstore.page import Page
+from lstore.page import Page, PAGE_CAPACITY, columnRange, convertLegacyTable
 from lstore.RWLocking import RWLockManager
+from lstore.latch import Epochs, Latch
+from lstore.merger import BackgroundMerger
 
+#Metadata columns. They are stored after the table's own columns: bufferpool column num_columns + <column>.
 INDIRECTION_COLUMN = 0
-RID_COLUMN = 1
-TIMESTAMP_COLUMN = 2
-SCHEMA_ENCODING_COLUMN = 3
+SCHEMA_ENCODING_COLUMN = 1
+BASE_RID_COLUMN = 2 #Tail records only: the base record they update
+META_COLUMNS = 3
+BASE_META_COLUMNS = 2 #The metadata cells of a base record: indirection and schema encoding
+NO_RECORD = -1 #The indirection of a base record that was never updated and of a record's first tail record
+COMPACT_BELOW = 0.25 #The vacuum moves the records out of base blocks that have fewer live records than this fraction
+RECORD_LATCHES = 64 #Latches of the base blocks (block % RECORD_LATCHES): updates and deletes vs. the vacuum moving records
 
 
 class Record:
@@ -39,218 +84,435 @@ class Table:
     :param name: string         #Table name
     :param num_columns: int     #Number of Columns: all columns are integer
     :param key: int             #Index of table key in columns
+    :param schema: list         #Column type of each column (see page.COLUMN_TYPES). Default: all int64
     """
-    def __init__(self, name, num_columns, key, bufferPool, path):
+    def __init__(self, name, num_columns, key, bufferPool, path, schema=None):
         self.name = name
         self.key = key
         self.num_columns = num_columns
+        self.schema = list(schema) if schema is not None else ["int64"]*num_columns
+        self.columnRanges = [columnRange(columnType) for columnType in self.schema]
         self.path = f"{path}/{name}/"
         self.page_directory = {}
         self.index = Index(num_columns, self)
         self.bufferPool = bufferPool
         self.bufferPool.path = self.path
+        self.indirectionColumn = num_columns + INDIRECTION_COLUMN #bufferpool columns of the metadata
+        self.schemaColumn = num_columns + SCHEMA_ENCODING_COLUMN
+        self.baseRIDColumn = num_columns + BASE_RID_COLUMN
+        self.recordsPerPage = [PAGE_CAPACITY // size for size in bufferPool.columnSizes]
+        self.blockSize = max(self.recordsPerPage) #base RIDs per block: whole pages of every column (see vacuum)
+        self.recordLatches = [Latch() for _ in range(RECORD_LATCHES)]
+        self.basePages = {} #(bufferpool column, base page number) -> PID
+        self.tailPages = {} #(bufferpool column, tail page number) -> PID
+        self.nextBaseRID = 0
+        self.freeRIDs = [] #base RIDs of reclaimed records, the next one to reuse last
+        self.tombstones = [] #base RIDs of deleted records the vacuum hasn't reclaimed yet
+        self.compactPending = False #RIDs were freed since the last compaction (see vacuum)
+        self.nextTailRID = 0
+        self.directoryLock = threading.Lock() #guards the page directories, the RID counters, freeRIDs, tombstones and pendingTails
+        self.pendingTails = set() #tail RIDs of updates that haven't linked their tail record yet
+        self.mergedPages = {} #base page PID -> PID of its newest version (see merge)
+        self.mergedRID = 0 #every tail record below this is merged
+        self.mergeLock = threading.Lock() #one merge at a time
+        self.epochs = Epochs() #readers of mergedPages and of the pages and RIDs the vacuum frees
+        self.merger = None
 
         self.lockManager = RWLockManager()
 
     def insert(self, *columns):
         """
-        RID is stored as a list of tuples. each tuple represents a base page location and offset. 
-        Each tuple in the list corresponds to a column/page for that column. 
-        For example, RID = [(0,2), (3,2), (1,1)] -> The second column value is stored in self.base_pages[1][3] and is the 2nd element in that page 
-        self.bp_index is used to track the index of the current base page as it fills 
-
-        record_location = ()
-        for i, value in enumerate(columns[0]):                  #LOOP THROUGH COLUMNS                            
-            if col-mem-partial[i]:                              #IF COLUMN HAS PARTIAL PAGES IN MEMORY                          
-                page = col-mem-partial[i][0]                    #RETRIEVE THE PAGE 
-                page.write(value)                               #WRITE VALUE TO THE PAGE 
-                record_location[i] = (page.pageID, offset)      #SAVE THE LOCATION FOR THAT COLUMN 
-                if not page.hasCapacity():                      #IF THE PAGE IS FULL AFTER INSERT 
-                    col-mem-full[i].append(page)                #MOVE IT TO FULL PAGES IN MEMORY 
-                    col-mem-partial[i].remove(page)             #REMOVE IT FROM THE PARTIAL PAGES IN MEMORY 
-
-            else:                                                   #IF THERE ARE NO PARTIAL PAGES IN MEMORY 
-                if not bufferPool.hasCapacityForColumn(i):          #IF bufferPool IS FULL (OF FULL PAGES)
-                    bufferPool.evict()                              #EVICT A PAGE BASED ON POLICY NOW THERE IS AN EMPTY SPACE IN MEMORY  
-                    if col-disk-partial[i]:                         #IF THERE ARE PARTIAL PAGES ON THE DISK 
-                        page = col-disk-partial[i][0]               #RETRIEVE THE PAGE FROM DISK TO MEMORY 
-                        page.write(value)                           #WRITE VALUE TO THE PAGE 
-                        record_location[i] = (page.pageID, offset)  #SAVE THE LOCATION FOR THIS COLUMN 
-                        if not page.hasCapacity():                  #IF THE PAGE IS NOW FULL 
-                            col-mem-full[i].append(page)            #ADD IT TO FULL PAGES IN MEMORY 
-                        else:                                       #IF PAGE IS PARTIAL STILL 
-                            col-mem-partial[i].append(page)         #ADD IT TO PARTIAL PAGES IN MEMORY 
-                        
-                    else:                                                   #IF THERE ARE NO PARTIAL PAGES ON DISK 
-                        pid = createNewPageAndGetId()                       #CREATE A NEW PAGE AND GET PAGE ID 
-                        bufferPool.pageDir[pid].write(value)                #WRITE VALUE TO THE PAGE 
-                        col-mem-partial[i].append(bufferPool.pageDir[pid])  #ADD THE PAGE TO PARTIAL PAGES IN MEMORY 
-                        record_location[i] = (pid, offset)                  #SAVE THE LOCATION FOR THAT COLUMN 
-
-                else:                                                       #IF THE bufferPool HAS EMPTY SPACE (NO PARTIALS AND SOME FULLS)
-                    pid = createNewPageAndGetId()                           #CREATE A NEW PAGE AND GET PAGE ID
-                    bufferPool.pageDir[pid].write(value)                    #WRITE VALUE TO THE PAGE 
-                    col-mem-partial[i].append(bufferPool.pageDir[pid])      #ADD PAGE TO PARTIAL PAGES IN MEMORY 
-                    record_location[i] = (pid, offset)                      #SAVE THE LOCATION FOR THIS COLUMN 
-
-        key_location[columns[0][0]] = [record_location]                     #INDEX THE LOCATION OF THE BASE RECORD EX: [((P-2, 0), (P-3, 3), (P-4, 2))]
+        RID = free RID or nextBaseRID                       #NUMBER THE BASE RECORD
+        for i, value in enumerate(columns[0]):              #LOOP THROUGH COLUMNS
+            basePage(i, RID).writeAt(slot, value)           #THE PAGE AND SLOT FOLLOW FROM THE RID
+        base.indirection = NO_RECORD                        #NO TAIL RECORDS YET
+        base.schema = 0
+        key_location[columns[0][key]] = RID                 #INDEX THE RID OF THE BASE RECORD
         """
+        if not self._validRow(columns[0]): #checked before anything is written, so a bad value can't leave half a record
+            return False
         _key = int(columns[0][self.key])
         if not self.lockManager.hasLock(_key):
             self.lockManager.addLock(_key)
         
         if not self.lockManager.acquireWLock(_key):
-            return
-        #print("\n\n========== Insert ==========")
-        #print(f"[Table.insert] columns: {columns}")
-        record_location = [[]]*self.num_columns
-        #print(f"[Table.insert] record_location: {record_location}")
-        #print(f"[Table.insert] Looping through columns[0]: {columns[0]}")
-        for i, value in enumerate(columns[0]): 
-            #print(f"[Table.insert] column i: {i} value: {value}")
-            index = None   
-            #print(f"[Table.insert] Check if there are partial pages in bufferpool")
-            #print(f"[Table.insert] {len(self.bufferPool.partialMemPages[i]) > 0}")
-            if(len(self.bufferPool.partialMemPages[i]) > 0):
-                #print(f"[Table.insert] There are partial pages. Fetching Page")
-                page = self.bufferPool.partialMemPages[i][0]
-                #print(f"[Table.insert] Got a partial page from memory. Page: {page.pageID}")
-                #print(f"[Table.insert] Calling page.write to write value ({value}) to page...")
-                index = page.write(value)
-                #print(f"[Table.insert] Write Complete! index: {index} - number of open spots left: {len(page.availableOffsets)}")
-                #print(f"[Table.insert] Wrote: {page.data[index: (index+8)]}")
-                #print(f"[Table.insert] <debug>: reading that data from the page...") 
-                data = page.read(index)
-                #print(f"[Table.insert] <debug>: Returned data: {data} {page.pageID} {index}")   
-                #print(f"[Table.insert] Adding (PID, idx): {(page.pageID)}, {index}") 
-                record_location[i] = (page.pageID, index)
-                #print(f"[Table.insert] updated record_location: {record_location[i]}")
-                #print(f"[Table.insert] Check if the page has capacity.")
-                #print(f"[Table.insert]     page.capacity: {page.hasCapacity()} - ")            
-                if not page.hasCapacity():
-                    #print(f"[Table.insert] The page has no open spots. Appending to full...")                                         #IF THE PAGE IS FULL AFTER INSERT 
-                    self.bufferPool.fullMemPages[i].append(page)
-                    #print(f"[Table.insert] Removing page from partial mem...")  
-                    self.bufferPool.partialMemPages[i].remove(page)
-                    #print(f"[Table.insert] removed Page.") 
-                    index = list(self.bufferPool.pageDirectory[page.pageID]) 
-                    index[0] = 1
-                    self.bufferPool.pageDirectory[page.pageID] = tuple(index)
-            else: #no partials in memory
-                #print(f"[Table.insert] No partials in memory. Checking if there is a partial page on disk...")
-                if(len(self.bufferPool.partialDiskPages[i]) > 0):
-                    #print(f"[Table.insert] Disk has a partial! Calling BP.getPage with PID: {page.pageID} - column: {i}")
-                    page = self.bufferPool.getPage(self.bufferPool.partialDiskPages[0].pageID, i)
-                    #print(f"[Table.insert] Returned page ({page.pageID}) - writing {value}...")
-                    index = page.write(value)
-                    #print(f"[Table.insert] <debug>: reading that data at index {index} from the page...") 
-                    data = page.read(index)
-                    #print(f"[Table.insert] <debug>: Returned data: {data} {page.pageID} {index}")   
-                    #print(f"[Table.insert] Adding location (PID, idx): ({(page.pageID)}, {index})") 
-                    record_location[i] = (page.pageID, index)
-                    #print(f"[Table.insert] updated record_location: {record_location[i]}")    
-                    #print(f"[Table.insert] Checking if the page is full...")                                          
-                    if(not page.hasCapacity()):
-                        #print(f"[Table.insert] The page has no open spots. Appending to full...")                                         #IF THE PAGE IS FULL AFTER INSERT 
-                        self.bufferPool.fullMemPages[i].append(page)
-                        #print(f"[Table.insert] Removing page from partial mem...")  
-                        self.bufferPool.partialMemPages[i].remove(page)
-                        #print(f"[Table.insert] removed Page.")
-                        index = list(self.bufferPool.pageDirectory[page.pageID]) 
-                        index[0] = 1
-                        self.bufferPool.pageDirectory[page.pageID] = tuple(index)
-                else:
-                    #print(f"[Table.insert] No partials available. Creating new page for column: {i}")
-                    page = self.bufferPool.getPage(columnIdx=i)
-                    #print(f"[Table.insert] Returned page ({page.pageID}) - writing {value}...")
-                    index = page.write(value)
-                    #print(f"[Table.insert] <debug>: reading that data at index {index} from the page...") 
-                    data = page.read(index)
-                    #print(f"[Table.insert] <debug>: Returned data: {data} {page.pageID} {index}")   
-                    #print(f"[Table.insert] Adding location (PID, idx): ({(page.pageID)}, {index})") 
-                    record_location[i] = (page.pageID, index)
-                    #print(f"[Table.insert] updated record_location: {record_location[i]}. Checking if the page has capacity.")            
-                    if not page.hasCapacity():
-                        #print(f"[Table.insert] Page is full appending to the full list") 
-                        self.bufferPool.fullMemPages[i].append(page)
-                        #print(f"[Table.insert] Removing page from partial list") 
-                        self.bufferPool.partialMemPages[i].remove(page)
-                        #print(f"[Table.insert] Page Removed")
-                        index = list(self.bufferPool.pageDirectory[page.pageID]) 
-                        index[0] = 1
-                        self.bufferPool.pageDirectory[page.pageID] = tuple(index)
-                    #print(f"[Table.insert] Done creating page!")
-                #print(f"[Table.insert] Done eith fetching page from memory or creating page")
-            #print(f"[Table.insert] Finished insert!")     
-        #print(f"[Table.insert] Updating PKL index with new record. ")
-        record_location = [(tuple([tuple(x) for x in record_location]))]
-       
-        
-        #print(f"[Table.insert] Record to insert: {record_location} primary key: {columns[0][0]}")
-        if(int(columns[0][self.key]) in self.index.pkl_index):
-            #print(f"[Table.insert] Base record exists. Something is wrong since you are trying to insert a dup.")
-            self.index.pkl_index[int(columns[0][self.key])].append(record_location[0])
-        else:
-            self.index.pkl_index[int(columns[0][self.key])] = record_location
-        #print(f"[Table.insert] Complete!")
-        #print("============================")
-        self.lockManager.releaseWLock(_key)
+            return False
+        try:
+            if _key in self.index.pkl_index: #a duplicate
+                return False
+            RID = self._newBaseRID()
+            try:
+                for i, value in enumerate(columns[0]): 
+                    self._writeCell(self.baseLocation(i, RID, create=True), value)
+            except Exception:
+                with self.directoryLock:
+                    self.freeRIDs.append(RID)
+                raise
+            self._writeCell(self.baseLocation(self.indirectionColumn, RID, create=True), NO_RECORD)
+            self._writeCell(self.baseLocation(self.schemaColumn, RID, create=True), 0)
+            if self.index.pkl_index.setdefault(_key, RID) != RID: #insert_many indexed the key first
+                self._freeBaseRecord(RID)
+                return False
+            return True
+        finally:
+            self.lockManager.releaseWLock(_key)
+
+    def insert_many(self, rows=None, columns=None):
+        """
+        Description: Bulk insert. The records get a contiguous run of RIDs, so each column is written a page at a
+                     time (one latch and one pack_into per page, see Page.writeRun), and the index entries are added
+                     in one pass at the end. No record locks are taken: nobody can see the records before that.
+        Inputs:
+            rows (list): The records, each a sequence of num_columns values.
+            columns (list): Or the records as one sequence per column (e.g., lists or arrays of the same length).
+        Outputs:
+            The number of records inserted. A record whose key is already in the table (or earlier in the batch)
+            is skipped, like insert() of a duplicate, and so is one that insert() would reject (see _validRow).
+        """
+        if rows is not None:
+            rows = [row for row in rows if len(row) == self.num_columns] #zip would cut every row to the shortest
+            columns = list(zip(*rows)) if len(rows) else [()]*self.num_columns
+        if columns is None or len(columns) != self.num_columns or len(set(map(len, columns))) > 1:
+            raise TypeError(f"ERROR: insert_many takes <rows> or <columns> of a table with {self.num_columns} columns.")
+        invalid = set()
+        for column, (low, high) in zip(columns, self.columnRanges):
+            invalid.update(i for i, value in enumerate(column) if not (isinstance(value, int) and low <= value <= high))
+        keys = [key if i not in invalid else None for i, key in enumerate(columns[self.key])]
+        seen = set()
+        keep = [i for i, key in enumerate(keys) if not (i in invalid or key in seen or key in self.index.pkl_index or seen.add(key))]
+        if len(keep) < len(keys): #drop the duplicates so the rest stays one run
+            keys = [keys[i] for i in keep]
+            columns = [[column[i] for i in keep] for column in columns]
+        n = len(keys)
+        if n == 0:
+            return 0
+        with self.directoryLock:
+            start = self.nextBaseRID
+            self.nextBaseRID += n
+        try:
+            for i, column in enumerate(columns):
+                self._writeRun(i, start, column)
+        except Exception:
+            with self.directoryLock:
+                self.freeRIDs.extend(range(start, start + n))
+            raise
+        self._writeRun(self.indirectionColumn, start, [NO_RECORD]*n)
+        self._writeRun(self.schemaColumn, start, [0]*n)
+
+        inserted = 0
+        setdefault = self.index.pkl_index.setdefault
+        for RID, key in enumerate(keys, start):
+            if setdefault(key, RID) == RID:
+                inserted += 1
+            else: #a concurrent insert() of the key won
+                self._freeBaseRecord(RID)
+        return inserted
+
+    def _writeRun(self, columnIdx, start, values):
+        """
+        Writes <values> to bufferpool column <columnIdx> of the base records <start>, <start> + 1, ..., a page at a time.
+        """
+        perPage = self.recordsPerPage[columnIdx]
+        i = 0
+        while i < len(values):
+            RID = start + i
+            run = min(perPage - RID % perPage, len(values) - i) #the rest of this page
+            PID, offset = self.baseLocation(columnIdx, RID, create=True)
+            with self.bufferPool.getPage(PID) as page:
+                with page.latch.exclusive:
+                    page.writeRun(offset, values[i : i + run])
+            i += run
+
+    def _validRow(self, row):
+        """
+        Returns True if <row> has one value per column and each is an int its column's type can hold.
+        """
+        if len(row) != self.num_columns:
+            return False
+        for value, (low, high) in zip(row, self.columnRanges):
+            if not isinstance(value, int) or not low <= value <= high:
+                return False
+        return True
+
+    def _newBaseRID(self):
+        with self.directoryLock:
+            if self.freeRIDs:
+                return self.freeRIDs.pop()
+            RID = self.nextBaseRID
+            self.nextBaseRID += 1
+            return RID
         
     def delete(self, primary_key):
-        for loc in self.index.pkl_index[primary_key]:
-             #loc = ((pid, idx) () () ())
-             for i, pid in enumerate(loc):
-                page = self.bufferPool.getPage(pid[0])
-                data = page.read(pid[1]) 
-                page.remove(pid[1]) 
-                #for version in self.index.vk_index[i][data]: 
-                    #if primary_key in self.index.vk_index[i][data][version]:
-                        #self.index.vk_index[i][data][version].remove(primary_key)
-      
-        del self.index.pkl_index[primary_key] 
+        """
+        RID = key_location.pop(primary_key)                 #READERS CAN'T FIND THE RECORD ANYMORE
+        tombstones.append(RID)                              #THE VACUUM REMOVES ITS CELLS LATER
+
+        Returns None, or False if the key doesn't exist or its record is locked.
+        """
+        if not self.lockManager.hasLock(primary_key):
+            self.lockManager.addLock(primary_key)
+        if not self.lockManager.acquireWLock(primary_key):
+            return False
+        try:
+            baseRID, latch = self._latchRecord(primary_key)
+            if baseRID is None: #deleted before we got the lock
+                return False
+            try:
+                del self.index.pkl_index[primary_key]
+                with self.directoryLock:
+                    self.tombstones.append(baseRID)
+            finally:
+                latch.releaseShared()
+        finally:
+            self.lockManager.releaseWLock(primary_key)
+
+    def _latchRecord(self, primary_key):
+        """
+        Returns (base RID, latch) of <primary_key> with the latch of its block held shared, so the vacuum can't move
+        the record until it's released (latch.releaseShared()). (None, None) if the key doesn't exist.
+        """
+        while True:
+            baseRID = self.index.pkl_index.get(primary_key)
+            if baseRID is None:
+                return None, None
+            latch = self.recordLatches[baseRID // self.blockSize % RECORD_LATCHES]
+            latch.acquireShared()
+            if self.index.pkl_index.get(primary_key) == baseRID:
+                return baseRID, latch
+            latch.releaseShared() #moved meanwhile
+
+    def _freeBaseRecord(self, RID):
+        for i in range(self.num_columns + BASE_META_COLUMNS):
+            self._removeCell(self.baseLocation(i, RID))
+        with self.directoryLock:
+            self.freeRIDs.append(RID)
 
     def update(self, primary_key, *columns):
         """
-        latest_update_loc = key_location[primary_key][-1]   #GET THE LOCATION OF THE LATEST TAIL RECORD FOR THER KEY
-        record_location = latest_update_loc                 #COPY THE LOCATION 
+        base = key_location[primary_key]                    #GET THE BASE RID OF THE KEY
+        RID = nextTailRID                                   #NUMBER THE NEW TAIL RECORD
         for i,value in enumerate(columns):                  #LOOP THROUGH THE COLUMNS 
             if value != None:                               #IF COLUMN IS GETTING UPDATED 
-                insert column logic                         #FOLLOW THE INSERT LOGIN FOR THAT COLUMN 
-                record_location[i] = (page.pageID, offset)  #CHANGE RECORD LOCATION FOR THAT COLUMN TO UPDATED LOCATION 
-        
-        key_location[primary_key].append(record_location)   #APPEND TO LIST OF LOCATIONS, ONLY UPDATED COLUMNS WILL HAVE NEW LOCATION
+                tailPage(i, RID).writeAt(slot, value)       #WRITE ONLY THAT COLUMN TO THE TAIL RECORD
+        tail.schema = updated columns                       #WHICH COLUMNS THE TAIL RECORD HOLDS
+        tail.indirection = base.indirection                 #LINK IT TO THE PREVIOUS TAIL RECORD
+        base.indirection = RID                              #THE BASE RECORD NOW POINTS AT THE LATEST VERSION
+        base.schema |= updated columns                      #COLUMNS THAT HAVE A NEWER VALUE THAN THE BASE RECORD
 
         """
         
         if primary_key not in self.index.pkl_index:
-            return
+            return False
+        if len(columns) != self.num_columns or not self._validRow([0 if value is None else value for value in columns]):
+            return False
+        newKey = columns[self.key]
+        rekey = newKey is not None and newKey != primary_key
+        if rekey and newKey in self.index.pkl_index:
+            return False #the new key is taken
 
-        if primary_key != columns[0]:
-            self.index.pkl_index[columns[0]] = self.index.pkl_index[primary_key] 
-            del self.index.pkl_index[primary_key] 
-            primary_key = columns[0]
-        
-        latest_update_loc = self.index.pkl_index[primary_key][-1] 
-        newColumns = []
-        for i in range(self.num_columns):
-            page = self.bufferPool.getPage(latest_update_loc[i][0], i) 
-            data = page.read(latest_update_loc[i][1])
-            newColumns.append(data)
-        
-        for i, value in enumerate(columns):
-            if value != None:
-                newColumns[i] = value 
+        if not self.lockManager.hasLock(primary_key):
+            self.lockManager.addLock(primary_key)
+        if not self.lockManager.acquireWLock(primary_key):
+            return False
+        try:
+            updated = 0
+            for i, value in enumerate(columns):
+                if value is not None:
+                    updated |= 1 << i
+            if updated == 0:
+                return primary_key in self.index.pkl_index
+            if rekey: #the new key is locked too: no insert, delete or read of it until the record has it
+                if not self.lockManager.hasLock(newKey):
+                    self.lockManager.addLock(newKey)
+                if not self.lockManager.acquireWLock(newKey):
+                    return False
+            try:
+                baseRID, latch = self._latchRecord(primary_key)
+                if baseRID is None: #deleted before we got the lock
+                    return False
+                try:
+                    #Claim the new key before anything is written: insert_many takes no record locks, so a batch
+                    #may have indexed it since the check above
+                    if rekey and self.index.pkl_index.setdefault(newKey, baseRID) != baseRID:
+                        return False
+                    try:
+                        return self._update(primary_key, columns, updated, baseRID)
+                    except Exception:
+                        if rekey:
+                            del self.index.pkl_index[newKey]
+                        raise
+                finally:
+                    latch.releaseShared()
+            finally:
+                if rekey:
+                    self.lockManager.releaseWLock(newKey)
+        finally:
+            self.lockManager.releaseWLock(primary_key)
+
+    def _update(self, primary_key, columns, updated, baseRID):
+        """
+        Appends the tail record of update() and links it. The caller holds the record's lock and block latch and, if
+        the update changes the key, has indexed the new key already.
+        """
+        newKey = columns[self.key]
+        indirection = self.baseLocation(self.indirectionColumn, baseRID)
+        with self.directoryLock:
+            RID = self.nextTailRID
+            self.nextTailRID += 1
+            self.pendingTails.add(RID) #the merge stops below it until it's linked
+
+        #Step-01: Write the tail record: only the changed columns, then its base RID, schema encoding and indirection
+        for i in self._columnsOf(updated):
+            self._writeCell(self._tailLocation(i, RID, create=True), columns[i])
+        self._writeCell(self._tailLocation(self.baseRIDColumn, RID, create=True), baseRID)
+        self._writeCell(self._tailLocation(self.schemaColumn, RID, create=True), updated)
+        self._writeCell(self._tailLocation(self.indirectionColumn, RID, create=True), self._readCell(indirection))
+
+        #Step-02: Point the base record at it. Readers follow the indirection, so they see the whole tail record or none of it.
+        self._writeCell(indirection, RID)
+        schemaLocation = self.baseLocation(self.schemaColumn, baseRID)
+        schema = self._readCell(schemaLocation)
+        if schema | updated != schema:
+            self._writeCell(schemaLocation, schema | updated)
+
+        with self.directoryLock:
+            self.pendingTails.discard(RID)
 
-        ##print("OLD, NEW", columns, newColumns)    
-        # Locking is taken care of in insert
-        self.insert(tuple(newColumns)) 
+        if newKey is not None and newKey != primary_key:
+            del self.index.pkl_index[primary_key]
+        return True
+
+    def readRecord(self, primary_key, relative_version=0, columns=None, baseRID=None):
+        """
+        Returns the values of the record's columns as of <relative_version> (0: the latest version, -1: the one
+        before it, ...; versions older than the base record give the base record). Only the columns in <columns>
+        (default: all) are read, the others are None. Follows the indirection from the base record.
+        Returns None if the key doesn't exist. Scans pass the <baseRID> they found instead: it stays readable while
+        they are in an epoch, even if the record is deleted or moved meanwhile.
+        """
+        epoch = self.epochs.enter() #the pages it reads aren't freed before it exits
+        try:
+            if baseRID is None:
+                baseRID = self.index.pkl_index.get(primary_key)
+                if baseRID is None:
+                    return None
+            wanted = range(self.num_columns) if columns is None else columns
+            values = [None]*self.num_columns
+            missing = 0
+            for i in wanted:
+                missing |= 1 << i
+            missing &= self._readCell(self.baseLocation(self.schemaColumn, baseRID)) #columns that were never updated are in the base record
+            RID = self._readCell(self.baseLocation(self.indirectionColumn, baseRID)) if missing else NO_RECORD
+            for _ in range(-relative_version):
+                if RID == NO_RECORD:
+                    break
+                RID = self._readCell(self._tailLocation(self.indirectionColumn, RID))
+            mergedRID = 0
+            if relative_version == 0 and missing and self.mergedPages: #the latest version: merged pages have it too
+                mergedRID = self.mergedRID #read before the versions: they're at least this new
+            while missing and RID != NO_RECORD:
+                if RID < mergedRID: #this tail record and the older ones are merged
+                    for i in self._columnsOf(missing):
+                        PID, offset = self.baseLocation(i, baseRID)
+                        values[i] = self._readCell((self.mergedPages[PID], offset))
+                    break
+                found = self._readCell(self._tailLocation(self.schemaColumn, RID)) & missing
+                for i in self._columnsOf(found):
+                    values[i] = self._readCell(self._tailLocation(i, RID))
+                missing &= ~found
+                RID = self._readCell(self._tailLocation(self.indirectionColumn, RID))
+            for i in wanted:
+                if values[i] is None:
+                    values[i] = self._readCell(self.baseLocation(i, baseRID))
+        finally:
+            self.epochs.exit(epoch)
+        return values
+
+    def readCells(self, locations, ring=None):
+        """
+        Reads the cells at <locations> ([(PID, offset), ...]) fetching each page once. Returns their values in order.
+        """
+        byPage = {}
+        for i, location in enumerate(locations):
+            byPage.setdefault(location[0], []).append(i)
+        values = [None]*len(locations)
+        for PID, positions in byPage.items():
+            with self.bufferPool.getPage(PID, ring=ring) as page:
+                for i, value in zip(positions, page.readMany([locations[i][1] for i in positions])):
+                    values[i] = value
+        return values
+
+    def _columnsOf(self, schema):
+        return [i for i in range(self.num_columns) if schema >> i & 1]
+
+    def baseLocation(self, columnIdx, RID, create=False):
+        """
+        Returns (PID, offset) of base record <RID>'s cell in bufferpool column <columnIdx>, creating the page
+        if <create> is set (else PID is None if it doesn't exist).
+        """
+        return self._location(self.basePages, columnIdx, RID, create)
+
+    def _tailLocation(self, columnIdx, RID, create=False):
+        return self._location(self.tailPages, columnIdx, RID, create)
+
+    def _location(self, directory, columnIdx, RID, create):
+        pageNo, slot = divmod(RID, self.recordsPerPage[columnIdx])
+        PID = directory.get((columnIdx, pageNo))
+        if PID is None and create:
+            with self.directoryLock:
+                PID = directory.get((columnIdx, pageNo))
+                if PID is None:
+                    with self.bufferPool.allocatePage(columnIdx) as page:
+                        PID = page.pageID
+                    directory[(columnIdx, pageNo)] = PID
+        return (PID, slot * self.bufferPool.columnSizes[columnIdx])
+
+    def _readCell(self, location):
+        with self.bufferPool.getPage(location[0]) as page:
+            return page.read(location[1])
+
+    def _writeCell(self, location, value):
+        with self.bufferPool.getPage(location[0]) as page:
+            with page.latch.exclusive:
+                page.writeAt(location[1], value)
+
+    def _removeCell(self, location):
+        with self.bufferPool.getPage(location[0]) as page:
+            with page.latch.exclusive:
+                page.remove(location[1])
+
+    def _removeCells(self, locations):
+        """
+        Removes the cells at <locations> ([(PID, offset), ...]) latching each page once. Returns the PIDs of the
+        pages that are empty now.
+        """
+        byPage = {}
+        for PID, offset in locations:
+            byPage.setdefault(PID, []).append(offset)
+        emptied = set()
+        for PID, offsets in byPage.items():
+            with self.bufferPool.getPage(PID) as page:
+                with page.latch.exclusive:
+                    for offset in offsets:
+                        page.remove(offset)
+                    if page.numRecords() == 0:
+                        emptied.add(PID)
+        return emptied
     
+    def metrics(self):
+        """
+        Returns a snapshot of the table's bufferpool metrics (see lstore.metrics; compare snapshots with metrics.diff)
+        """
+        return self.bufferPool.metrics.snapshot()
+
     def save(self): 
         """
         save mem pages to disk: 
 
         """
         #print(f"[Table.save] Save called saving table to disk. path: {self.path}")
+        with self.mergeLock:
+            self.reclaim()
         for page in self.bufferPool.getMemPages():
             self.bufferPool.savePage(page[0].pageID)
 
@@ -261,50 +523,400 @@ class Table:
             file.write(f"{self.num_columns}\n")
             #print(f"[Table.save] Writing data to file. self.key: {self.key}")
             file.write(f"{self.key}\n")
+            file.write(f"{','.join(self.schema)}\n")
             #print(f"[Table.save] Writing pageDirectory to file.")
-            for key, value in self.bufferPool.pageDirectory.items():
-                file.write(f"{key}:{value}\n")
+            for key, frame in self.bufferPool.frames.items():
+                file.write(f"{key}:({int(frame.isFull)}, {frame.columnIdx}, {int(frame.assigned)})\n")
+            basePages = ','.join(f"{c}.{pageNo}={PID}" for (c, pageNo), PID in self.basePages.items())
+            file.write(f"Base:{self.nextBaseRID}:{basePages}:{','.join(map(str, self.freeRIDs))}\n")
+            tailPages = ','.join(f"{c}.{pageNo}={PID}" for (c, pageNo), PID in self.tailPages.items())
+            file.write(f"Tail:{self.nextTailRID}:{tailPages}\n")
+            file.write(f"Deleted:{','.join(map(str, self.tombstones))}\n")
+            mergedPages = ','.join(f"{basePID}={PID}" for basePID, PID in self.mergedPages.items())
+            file.write(f"Merged:{self.mergedRID}:{mergedPages}\n")
             #print(f"[Table.save] Writing indexing to file.")
             file.write("Index\n") 
             file.write(str(self.index))
         #print(f"[Table.save] Save complete! Wrote data to file. Closing...")
     
     def load(self): 
+        self._convertLegacyPages()
+        with self.mergeLock: #no merge while the tail records and the index are half loaded
+            self._load()
+
+    def _convertLegacyPages(self):
+        """
+        Tables saved by m2 store their pages as <PID>-{full,partial}.bin files. They are rewritten as .page files
+        (see page.convertLegacyTable) before the table is loaded, then _convertRecords copies the records.
+        """
+        if not any(name.endswith(".bin") for name in os.listdir(self.path)):
+            return
+        failed = convertLegacyTable(self.path, PAGE_CAPACITY)
+        if failed:
+            raise IOError(f"ERROR: Could not convert the m2 pages {', '.join(failed)} of {self.path}. Their .bin files are kept.")
+
+    def _load(self):
         with open(f"{self.path}{self.name}.meta", "r") as file:
             self.num_columns = int(file.readline().strip('\n')) 
             self.key = int(file.readline().strip('\n'))
             line = file.readline() 
+            if not line.startswith("P-") and line != "Index\n": #schema line (missing in tables saved before schemas)
+                self.schema = line.strip('\n').split(',')
+                self.columnRanges = [columnRange(columnType) for columnType in self.schema]
+                line = file.readline()
             while line != "Index\n": 
+                if line.startswith("Base:"): #Base:<next base RID>:<column>.<page number>=<PID>,...:<free RID>,...
+                    _, nextBaseRID, basePages, freeRIDs = line.strip('\n').split(":")
+                    self.nextBaseRID = int(nextBaseRID)
+                    self._loadDirectory(self.basePages, basePages)
+                    self.freeRIDs = [int(RID) for RID in filter(None, freeRIDs.split(','))]
+                    line = file.readline()
+                    continue
+                if line.startswith("Tail:"): #Tail:<next tail RID>:<column>.<tail page number>=<PID>,...
+                    _, nextTailRID, tailPages = line.strip('\n').split(":")
+                    self.nextTailRID = int(nextTailRID)
+                    self._loadDirectory(self.tailPages, tailPages)
+                    line = file.readline()
+                    continue
+                if line.startswith("Deleted:"): #Deleted:<tombstoned base RID>,...
+                    self.tombstones = [int(RID) for RID in filter(None, line.strip('\n')[len("Deleted:"):].split(','))]
+                    line = file.readline()
+                    continue
+                if line.startswith("Merged:"): #Merged:<merged tail RID>:<base PID>=<PID of its newest version>,...
+                    _, mergedRID, mergedPages = line.strip('\n').split(":")
+                    self.mergedRID = int(mergedRID)
+                    for entry in filter(None, mergedPages.split(',')):
+                        basePID, PID = entry.split('=')
+                        self.mergedPages[basePID] = PID
+                    line = file.readline()
+                    continue
                 key, value = line.split(":") 
             
                 tuple_of_integers = tuple([int(x) for x in value[:-1].strip('()').split(',')])
-                self.bufferPool.pageDirectory[key] = tuple_of_integers 
-                colIdx = tuple_of_integers[2]
-                if tuple_of_integers[0]: 
-                    self.bufferPool.colDiskFull[colIdx].append(key) 
-                else:
-                    self.bufferPool.partialDiskPages[colIdx].append(key)
+                if len(tuple_of_integers) == 4: #m2: (isFull, inMem, colIdx, pageIdx)
+                    isFull, colIdx, assigned = tuple_of_integers[0], tuple_of_integers[2], 0
+                else: #(isFull, colIdx) or (isFull, colIdx, assigned)
+                    isFull, colIdx, assigned = (tuple_of_integers + (0,))[:3]
+                self.bufferPool.addDiskPage(key, colIdx, isFull, assigned)
                 line = file.readline()
             pkl_str = file.readline()   
             vk_str = file.readline() 
             self.index.load(pkl_str, vk_str)
+        self._convertRecords()
+        self._addBaseRIDs()
+
+    def _addBaseRIDs(self):
+        """
+        Tables saved before tail records had a base RID cell: gives their unmerged tail records one (walking the chain
+        of every record once), so merge() can find their base records.
+        """
+        perPage = self.recordsPerPage[self.indirectionColumn] #the same as the base RID column's: both are int64
+        if all((self.baseRIDColumn, pageNo) in self.tailPages for c, pageNo in self.tailPages
+               if c == self.indirectionColumn and (pageNo + 1) * perPage > self.mergedRID):
+            return
+        for baseRID in self.index.pkl_index.values():
+            RID = self._readCell(self.baseLocation(self.indirectionColumn, baseRID))
+            while RID >= self.mergedRID:
+                self._writeCell(self._tailLocation(self.baseRIDColumn, RID, create=True), baseRID)
+                RID = self._readCell(self._tailLocation(self.indirectionColumn, RID))
 
-    def __merge(self):
-        ##print("merge is happening")
+    def _loadDirectory(self, directory, entries):
+        for entry in filter(None, entries.split(',')): #<column>.<page number>=<PID>
+            page, PID = entry.split('=')
+            c, pageNo = page.split('.')
+            directory[(int(c), int(pageNo))] = PID
 
+    def _convertRecords(self):
         """
-        for key in key_loc: 
-            slice key_loc[key] -> [loc1, loc2, loc3, loc4, loc5] -> [loc1, loc2, loc3, loc4],[loc5]
-                for loc in [loc1, loc2, loc3, loc4, loc5]:
-                    lock loc 
-                    delete loc 
+        Tables saved before records had RIDs index a tuple of (PID, offset) cells per record (and before tail records
+        one per version, each a full copy). Every record is copied to a new base record: the cells of its latest
+        tuple and, if the tuple has them, its metadata cells, so its tail records stay linked. The old base pages and
+        their merged versions are deleted after that (the next merge starts over).
+        """
+        old = [(key, records[-1]) for key, records in self.index.pkl_index.items() if not isinstance(records, int)]
+        if not old:
+            return
+        for key, record in old:
+            values = self.readCells(list(record))
+            if len(record) == self.num_columns: #no metadata: saved before tail records
+                values += [NO_RECORD, 0]
+            RID = self._newBaseRID()
+            for i, value in enumerate(values):
+                self._writeCell(self.baseLocation(i, RID, create=True), value)
+            self.index.pkl_index[key] = RID
+        for frame in list(self.bufferPool.frames.values()):
+            if not frame.assigned:
+                self.bufferPool.deletePage(frame.pid)
+        for PID in self.mergedPages.values():
+            self.bufferPool.deletePage(PID)
+        self.mergedPages = {}
+        self.mergedRID = 0
+
+    def merge(self):
+        """
+        for each tail record in the full tail pages that aren't merged:                #NEWEST FIRST
+            for each column it updates that a newer one of its base record didn't:
+                latest[base page of its base record][offset] = its value              #PER BASE PAGE, ONLY THE NEWEST VALUE
+        for page, values in latest:
+            copy = the newest version of page; copy.writeAt(offset, value) for each value
+            mergedPages[page] = (copy, merged up to)                                  #SWAP IT IN
+        delete the versions no reader uses anymore 
+
+        Description: Merges the tail records of the full tail pages (of the indirection column) that have no update
+                     in flight into new versions of the base pages. Called by the BackgroundMerger.
+        Outputs:
+            The number of tail records merged.
+        """
+        with self.mergeLock:
+            with self.directoryLock:
+                high = min(self.pendingTails, default=self.nextTailRID)
+            high -= high % self.recordsPerPage[self.indirectionColumn] #full tail pages only
+            low = self.mergedRID
+            if high <= low:
+                return 0
+
+            #Step-01: Read the tail records in [low, high) a page at a time and, newest to oldest, keep the newest
+            #value of each column of each base record
+            tails = [(RID, baseRID) for RID, baseRID in zip(range(low, high), self._tailBaseRIDs(low, high)) if baseRID is not None]
+            schemas = self.readCells([self._tailLocation(self.schemaColumn, RID) for RID, _ in tails])
+            taken = {} #base RID -> the columns a newer tail record of it had
+            cells = [] #(column, base RID, tail RID) of each value to merge
+            for (RID, baseRID), schema in zip(reversed(tails), reversed(schemas)):
+                found = schema & ~taken.get(baseRID, 0)
+                if found:
+                    taken[baseRID] = taken.get(baseRID, 0) | found
+                    cells += [(i, baseRID, RID) for i in self._columnsOf(found)]
+            values = self.readCells([self._tailLocation(i, RID) for i, _, RID in cells])
+            latest = {} #(column, base PID) -> {offset: value}
+            for (i, baseRID, _), value in zip(cells, values):
+                PID, offset = self.baseLocation(i, baseRID)
+                latest.setdefault((i, PID), {})[offset] = value
+
+            #Step-02: Write them into a copy of the page's current version and swap it in
+            retired = self._installVersions(latest)
+            self.mergedRID = high #after the versions: readers that see it find them
+            self.epochs.retire(retired)
+            self.reclaim()
+            return high - low
+
+    def _tailBaseRIDs(self, low, high):
+        """
+        Returns the base RID of each tail record in [low, high), a page at a time. None for the tail records the
+        vacuum removed (their records were deleted). Hold mergeLock.
+        """
+        c = self.baseRIDColumn
+        perPage = self.recordsPerPage[c]
+        size = self.bufferPool.columnSizes[c]
+        baseRIDs = []
+        for pageNo in range(low // perPage, (high - 1) // perPage + 1):
+            RIDs = range(max(low, pageNo * perPage), min(high, (pageNo + 1) * perPage))
+            PID = self.tailPages.get((c, pageNo))
+            if PID is None: #every tail record of the page was removed
+                baseRIDs += [None]*len(RIDs)
+                continue
+            offsets = [RID % perPage * size for RID in RIDs]
+            with self.bufferPool.getPage(PID) as page:
+                baseRIDs += [baseRID if page.isSet(offset) else None for offset, baseRID in zip(offsets, page.readMany(offsets))]
+        return baseRIDs
+
+    def _installVersions(self, latest):
         """
-        for key in self.index.pkl_index: 
-            deletedUpdates = self.self.index.pkl_index[key][:-1] 
-            newLocs = [self.key_rid[key][-1]] 
-            self.key_rid[key] =  newLocs 
-            for loc in deletedUpdates:
-                self.delete_version(loc)
-        pass
+        Writes <latest> ((column, base PID) -> {offset: value}) into a copy of each base page's current version and
+        swaps the copies into mergedPages. Returns the PIDs of the versions they replace. Hold mergeLock.
+        """
+        retired = []
+        for (i, basePID), values in latest.items():
+            current = self.mergedPages.get(basePID)
+            with self.bufferPool.getPage(current or basePID) as source:
+                with self.bufferPool.allocatePage(i) as page:
+                    with source.latch.shared, page.latch.exclusive:
+                        page.copyFrom(source)
+                        for offset, value in values.items():
+                            page.writeAt(offset, value)
+            self.mergedPages[basePID] = page.pageID
+            if current is not None:
+                retired.append(current)
+        return retired
+
+    def vacuum(self):
+        """
+        for each tombstone:                                              #RECORDS DELETED SINCE THE LAST VACUUM
+            remove the cells of its tail records and base record         #ONE LATCH PER PAGE
+        delete the tail pages that are empty now
+        for each base block with fewer than COMPACT_BELOW live records:
+            move its records to free slots of the other blocks           #COPY THE CELLS, POINT THE INDEX AT THE COPY
+            delete the block's pages
+        free the RIDs and pages once no reader can use them              #(see latch.Epochs)
+
+        Description: Reclaims the records delete() left tombstones for. Called by the BackgroundMerger after
+                     each merge.
+        Outputs:
+            The number of deleted records reclaimed.
+        """
+        with self.mergeLock: #the merge reads the tail records this removes and the base records this moves
+            self.reclaim()
+            with self.directoryLock:
+                tombstones, self.tombstones = self.tombstones, []
+                high = min(self.pendingTails, default=self.nextTailRID)
+                compact, self.compactPending = self.compactPending, False
+            if not tombstones and not compact: #compaction only pays off once deletes freed slots to move records to
+                return 0
+            retired = self._removeRecords(tombstones, high)
+            blockSize = self.blockSize
+            handled, blockRetired = self._compact(set(tombstones), blockSize)
+            retired += blockRetired
+            retired += [RID for RID in tombstones if RID // blockSize not in handled]
+            self.epochs.retire(retired)
+            self.reclaim()
+        return len(tombstones)
+
+    def _removeRecords(self, baseRIDs, high):
+        """
+        Removes the cells of the base records <baseRIDs> and of their tail records. Returns the tail pages below
+        tail record <high> that are empty now (whole pages of deleted tail records) as (column, tail page number).
+        """
+        locations = []
+        for baseRID in baseRIDs:
+            RID = self._readCell(self.baseLocation(self.indirectionColumn, baseRID))
+            while RID != NO_RECORD:
+                schema = self._readCell(self._tailLocation(self.schemaColumn, RID))
+                for i in self._columnsOf(schema) + [self.indirectionColumn, self.schemaColumn, self.baseRIDColumn]:
+                    locations.append(self._tailLocation(i, RID))
+                RID = self._readCell(self._tailLocation(self.indirectionColumn, RID))
+            locations += [self.baseLocation(i, baseRID) for i in range(self.num_columns + BASE_META_COLUMNS)]
+        emptied = self._removeCells([location for location in locations if location[0] is not None]) #tail records merged before they had base RIDs have none
+        with self.directoryLock:
+            return [(c, pageNo) for (c, pageNo), PID in self.tailPages.items()
+                    if PID in emptied and (pageNo + 1) * self.recordsPerPage[c] <= high] #no update in flight can write to it
+
+    def _compact(self, removed, blockSize):
+        """
+        Empties the base blocks (<blockSize> RIDs: whole pages of every column) that have fewer than COMPACT_BELOW
+        live records, as long as the other blocks have free slots for them. <removed> are the base RIDs of the
+        records this vacuum just removed. Blocks with an insert in flight and the last block are left alone.
+        Returns the blocks it took the <removed> RIDs of into account and what to retire: the RIDs (a range per
+        block, see reclaim) of the emptied blocks and the <removed> RIDs of the others it tried.
+        """
+        with self.directoryLock:
+            end = self.nextBaseRID
+            blocks = {pageNo * self.recordsPerPage[c] // blockSize for c, pageNo in self.basePages}
+            free = set(self.freeRIDs)
+        keyOf = {RID: key for key, RID in self.index.pkl_index.copy().items()}
+        free |= removed
+        sparse = []
+        for block in blocks:
+            RIDs = range(block * blockSize, (block + 1) * blockSize)
+            if RIDs.stop > end:
+                continue
+            live = [RID for RID in RIDs if RID in keyOf]
+            if len(live) < COMPACT_BELOW * blockSize and all(RID in keyOf or RID in free for RID in RIDs):
+                sparse.append((len(live), block, live))
+        if not sparse:
+            return set(), []
+        sparse.sort()
+
+        #Reserve the targets (free slots of the other blocks) and the free slots of the blocks to empty
+        sparseBlocks = {block for _, block, _ in sparse}
+        chosen = []
+        with self.directoryLock:
+            current = set(self.freeRIDs)
+            targets = [RID for RID in self.freeRIDs if RID // blockSize in blocks and RID // blockSize not in sparseBlocks]
+            for count, block, live in sparse:
+                if count > len(targets):
+                    break
+                RIDs = range(block * blockSize, (block + 1) * blockSize)
+                if all(RID in keyOf or RID in current or RID in removed for RID in RIDs): #no insert took a slot since
+                    chosen.append((block, list(zip(live, targets[len(targets) - count:]))))
+                    del targets[len(targets) - count:]
+            reserved = set()
+            for block, moves in chosen:
+                reserved.update(range(block * blockSize, (block + 1) * blockSize))
+                reserved.update(new for _, new in moves)
+            self.freeRIDs = [RID for RID in self.freeRIDs if RID not in reserved]
+
+        retired = []
+        for block, moves in chosen:
+            if self._moveRecords(block, [(keyOf[old], old, new) for old, new in moves]):
+                retired.append(range(block * blockSize, (block + 1) * blockSize)) #its pages go with its RIDs (see reclaim)
+            else: #a record changed since the snapshot: give the slots back and try again next time
+                with self.directoryLock:
+                    self.freeRIDs += [RID for RID in range(block * blockSize, (block + 1) * blockSize) if RID not in keyOf and RID not in removed]
+                    self.freeRIDs += [new for _, new in moves]
+                    self.compactPending = True
+                retired += [RID for RID in removed if RID // blockSize == block]
+        return {block for block, _ in chosen}, retired
+
+    def _moveRecords(self, block, moves):
+        """
+        Moves the base records of <moves> ([(key, old RID, new RID), ...], all in base block <block>) with their
+        merged values, points their unmerged tail records at the copies (see merge) and points the index at the
+        copies. Holds the block's latch exclusive, so updates and deletes of the records wait instead of failing. Returns False (and moves nothing) if one was deleted or re-keyed since.
+        """
+        with self.recordLatches[block % RECORD_LATCHES].exclusive:
+            for key, old, new in moves:
+                if self.index.pkl_index.get(key) != old:
+                    return False
+            latest = {}
+            for key, old, new in moves:
+                values = self.readCells([self.baseLocation(i, old) for i in range(self.num_columns + BASE_META_COLUMNS)])
+                for i, value in enumerate(values):
+                    self._writeCell(self.baseLocation(i, new, create=True), value)
+                RID = values[self.indirectionColumn]
+                while RID >= self.mergedRID:
+                    self._writeCell(self._tailLocation(self.baseRIDColumn, RID), new)
+                    RID = self._readCell(self._tailLocation(self.indirectionColumn, RID))
+                for i in self._columnsOf(values[self.schemaColumn]):
+                    PID, offset = self.baseLocation(i, old)
+                    if PID in self.mergedPages:
+                        newPID, newOffset = self.baseLocation(i, new)
+                        latest.setdefault((i, newPID), {})[newOffset] = self._readCell((self.mergedPages[PID], offset))
+            self.epochs.retire(self._installVersions(latest)) #before the index: readers of the copies need them
+            for key, old, new in moves:
+                self.index.pkl_index[key] = new
+            return True
+
+    def reclaim(self):
+        """
+        Description: Frees what no reader can still be using: the page versions the merge superseded and the
+                     pages and base RIDs the vacuum retired. Hold mergeLock: the merge reads tail pages the vacuum
+                     retired (of deleted records) without entering an epoch.
+        """
+        for item in self.epochs.reclaimable():
+            if isinstance(item, range): #an emptied base block: its pages, then its RIDs (reused after the ones in live pages)
+                block = item.start // self.blockSize
+                with self.directoryLock:
+                    pages = [page for page in self.basePages if page[1] * self.recordsPerPage[page[0]] // self.blockSize == block]
+                    PIDs = [self.basePages.pop(page) for page in pages]
+                for PID in PIDs:
+                    version = self.mergedPages.pop(PID, None)
+                    if version is not None:
+                        self.bufferPool.deletePage(version)
+                    self.bufferPool.deletePage(PID)
+                with self.directoryLock:
+                    self.freeRIDs[:0] = item
+            elif isinstance(item, tuple): #an empty tail page: (column, tail page number)
+                with self.directoryLock:
+                    PID = self.tailPages.pop(item)
+                self.bufferPool.deletePage(PID)
+            elif isinstance(item, int): #a deleted record's base RID
+                with self.directoryLock:
+                    self.freeRIDs.append(item)
+                    self.compactPending = True
+            else: #a page version the merge superseded
+                self.bufferPool.deletePage(item)
+
+    def startMerger(self, interval=1.0):
+        """
+        Description: Starts a BackgroundMerger that merges the table every <interval> seconds (see merger.py).
+        """
+        if(self.merger is None):
+            self.merger = BackgroundMerger(self, interval)
+            self.merger.start()
+
+    def stopMerger(self):
+        if(self.merger is not None):
+            self.merger.stop()
+            self.merger = None
+
     
  
@@ -0,0 +1,88 @@
+from lstore.db import Database
+from lstore.query import Query
+
+from random import choice, randint, seed
+import shutil
+
+# The merge writes the latest values of full tail pages into new versions of the base pages. Reads and aggregates
+# must give the same results before and after a merge, for the latest version and the older ones.
+shutil.rmtree('./MergeTest', ignore_errors=True)
+try:
+    db = Database(mergeInterval=0) #merged by hand below, then by the background merger
+    db.open('./MergeTest')
+    grades_table = db.create_table('Grades', 5, 0)
+    query = Query(grades_table)
+
+    number_of_records = 2000
+    number_of_updates = 4
+    seed(3562901)
+
+    records = {}
+    history = {}
+    query.insert_batch([[92106429 + i, randint(0, 20), randint(0, 20), randint(0, 20), randint(0, 20)] for i in range(0, number_of_records)])
+    for i in range(0, number_of_records):
+        key = 92106429 + i
+        records[key] = query.select(key, 0, [1, 1, 1, 1, 1])[0].columns
+        history[key] = [list(records[key])]
+    keys = sorted(records)
+
+    def version(key, relative_version):
+        return history[key][max(0, len(history[key]) - 1 + relative_version)]
+
+    def sums(query):
+        return [query.sum_version(keys[0], keys[-1], column, relative_version)
+                for column in range(0, grades_table.num_columns) for relative_version in (0, -1, -2)]
+
+    def check(query, label):
+        correct = [sum(version(key, relative_version)[column] for key in keys)
+                   for column in range(0, grades_table.num_columns) for relative_version in (0, -1, -2)]
+        if sums(query) != correct:
+            print('sum error', label, ':', sums(query), ', correct:', correct)
+        for key in keys[::7]:
+            for relative_version in (0, -1, -2):
+                record = query.select_version(key, 0, [1, 1, 1, 1, 1], relative_version)[0]
+                if record.columns != version(key, relative_version):
+                    print('select error', label, 'on', key, 'version', relative_version, ':', record.columns, ', correct:', version(key, relative_version))
+        for value in (0, 10, 20):
+            found = sorted(record.columns[0] for record in query.select(value, 1, [1, 1, 1, 1, 1]))
+            if found != [key for key in keys if records[key][1] == value]:
+                print('select by value error', label, 'on', value)
+
+    for _ in range(number_of_updates):
+        for key in keys:
+            updated_columns = [None] + [choice([None, randint(0, 20)]) for _ in range(1, grades_table.num_columns)]
+            query.update(key, *updated_columns)
+            for i, value in enumerate(updated_columns):
+                if value is not None:
+                    records[key][i] = value
+            if updated_columns != [None]*grades_table.num_columns: #updates that change nothing don't add a version
+                history[key].append(list(records[key]))
+        check(query, 'before merge')
+        merged = grades_table.merge()
+        if merged == 0:
+            print('merge merged nothing')
+        check(query, 'after merge')
+    print("Merge finished")
+
+    # The background merger merges while updates go on
+    grades_table.startMerger(0.01)
+    for key in keys:
+        query.update(key, None, None, None, None, key % 20)
+        records[key][4] = key % 20
+        history[key].append(list(records[key]))
+    grades_table.stopMerger()
+    check(query, 'after background merges')
+    print("Background merge finished")
+    db.close()
+
+    db = Database(mergeInterval=0)
+    db.open('./MergeTest')
+    grades_table = db.get_table('Grades')
+    query = Query(grades_table)
+    check(query, 'after reopen')
+    grades_table.merge()
+    check(query, 'after merge after reopen')
+    db.close()
+    print("Reopen finished")
+finally:
+    shutil.rmtree('./MergeTest', ignore_errors=True) #don't leave the test database behind
@@ -0,0 +1,92 @@
+from lstore.db import Database
+from lstore.query import Query
+
+from random import choice, randint, seed
+import shutil
+
+# Updates are stored as tail records: every older version stays readable with select_version / sum_version,
+# also after the database is closed and reopened.
+shutil.rmtree('./VersionTest', ignore_errors=True)
+try:
+    db = Database(mergeInterval=0) #no merges: every read follows the tail records
+    db.open('./VersionTest')
+    grades_table = db.create_table('Grades', 5, 0)
+    query = Query(grades_table)
+
+    number_of_records = 1000
+    number_of_updates = 3
+    seed(3562901)
+
+    records = {}
+    history = {} #key -> every version of the record, oldest first
+    for i in range(0, number_of_records):
+        key = 92106429 + i
+        records[key] = [key, randint(0, 20), randint(0, 20), randint(0, 20), randint(0, 20)]
+        history[key] = [list(records[key])]
+        query.insert(*records[key])
+    keys = sorted(records)
+
+    for _ in range(number_of_updates):
+        for key in keys:
+            updated_columns = [None] + [choice([None, randint(0, 20)]) for _ in range(1, grades_table.num_columns)]
+            if not query.update(key, *updated_columns):
+                print('update error on', key)
+            for i, value in enumerate(updated_columns):
+                if value is not None:
+                    records[key][i] = value
+            if updated_columns != [None]*grades_table.num_columns: #updates that change nothing don't add a version
+                history[key].append(list(records[key]))
+    print("Update finished")
+
+    def version(key, relative_version):
+        return history[key][max(0, len(history[key]) - 1 + relative_version)]
+
+    def check(query):
+        for key in keys:
+            for relative_version in (0, -1, -2, -3, -10):
+                record = query.select_version(key, 0, [1, 1, 1, 1, 1], relative_version)[0]
+                if record.columns != version(key, relative_version):
+                    print('select error on', key, 'version', relative_version, ':', record.columns, ', correct:', version(key, relative_version))
+            record = query.select_version(key, 0, [0, 1, 0, 1, 0], -1)[0]
+            if record.columns != [version(key, -1)[1], version(key, -1)[3]]:
+                print('projected select error on', key, ':', record.columns)
+        for value in (0, 10, 20):
+            for relative_version in (0, -1, -2):
+                found = sorted(record.columns for record in query.select_version(value, 1, [1, 1, 1, 1, 1], relative_version))
+                correct = sorted(version(key, relative_version) for key in keys if version(key, relative_version)[1] == value)
+                if found != correct:
+                    print('select by value error on', value, 'version', relative_version, ':', len(found), 'records, correct:', len(correct))
+        print("Select of versions finished")
+        for column in range(0, grades_table.num_columns):
+            for relative_version in (0, -1, -2):
+                result = query.sum_version(keys[10], keys[-10], column, relative_version)
+                correct = sum(version(key, relative_version)[column] for key in keys[10:-9])
+                if result != correct:
+                    print('sum error on column', column, 'version', relative_version, ':', result, ', correct:', correct)
+        print("Aggregate of versions finished")
+
+    check(query)
+
+    # Changing the key moves the index entry but keeps the history
+    key = keys[-1]
+    new_key = key + number_of_records
+    if not query.update(key, new_key, None, None, None, None) or query.update(keys[0], new_key, None, None, None, None):
+        print('update of the key failed')
+    records[new_key] = records.pop(key)
+    records[new_key][0] = new_key
+    history[new_key] = history.pop(key) + [list(records[new_key])]
+    keys = sorted(records)
+    if query.select(key, 0, [1, 1, 1, 1, 1]) != []:
+        print('old key still selects a record')
+    check(query)
+    db.close()
+
+    db = Database(mergeInterval=0)
+    db.open('./VersionTest')
+    grades_table = db.get_table('Grades')
+    query = Query(grades_table)
+    check(query)
+    db.close()
+    print("Reopen finished")
+finally:
+    shutil.rmtree('./VersionTest', ignore_errors=True) #don't leave the test database behind